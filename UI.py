@@ -1,8 +1,17 @@
 import streamlit as st
-import google.generativeai as genai
 from dotenv import load_dotenv
 import os
+import base64
 import tempfile
+import threading
+import google.generativeai as genai
+
+from image_cache import (
+    DESCRIPTION_MAX_TOKENS, VISION_CACHE_ENABLED, description_context, description_messages,
+    image_fingerprint, vision_cache,
+)
+from intent import classify_local
+from model_router import ModelRouter, tiers_from_env
 
 
 # ---------------------------
@@ -15,10 +24,76 @@ API_KEY = os.getenv("GEMINI_API_KEY")
 # Load .env
 load_dotenv()
 API_KEY = os.getenv("GEMINI_API_KEY")
+genai.configure(api_key=API_KEY)  # File API uploads (PDFs, see file_part)
+
+# Gemini models per tier (UI_MODEL_FAST / _SMART / _VISION); calls go
+# through the LLM gateway: deadline, retries, breaker, catalog fallback
+router = ModelRouter(
+    "ui",
+    tiers_from_env(
+        "UI",
+        fast="gemini:gemini-2.5-flash-lite",
+        smart="gemini:gemini-2.5-flash",
+        vision="gemini:gemini-2.5-flash",
+    ),
+)
 
-# Configure Gemini
-genai.configure(api_key=API_KEY)
-model = genai.GenerativeModel("gemini-2.5-flash")
+
+def generate(prompt: str, query: str, part: dict = None):
+    content = prompt
+    if part is not None:
+        # File + prompt together
+        content = [{"type": "text", "text": prompt}, part]
+    history = st.session_state.get("messages", [])[:-1]
+    return router.complete_sync(
+        [{"role": "user", "content": content}],
+        intent=classify_local(query, history),
+        has_image=part is not None,
+        fallback_query=query,
+    )
+
+
+def file_part(uploaded_file, file_bytes: bytes, sha: str) -> dict:
+    """
+    Images are sent inline. Other files (PDF menus can be large) go through
+    the Gemini File API, once per file and session, when the vision tier is
+    a Gemini model.
+    """
+    mime_type = uploaded_file.type
+    if mime_type.startswith("image/") or router.route(has_image=True).provider != "gemini":
+        b64 = base64.b64encode(file_bytes).decode()
+        return {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{b64}"}}
+
+    gemini_files = st.session_state.setdefault("gemini_files", {})
+    if sha not in gemini_files:
+        # Save to temporary file for Gemini upload
+        suffix = os.path.splitext(uploaded_file.name)[1]
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+            tmp.write(file_bytes)
+            tmp_path = tmp.name
+        try:
+            gemini_files[sha] = genai.upload_file(path=tmp_path, mime_type=mime_type)
+        finally:
+            # Clean up temp file
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return {"type": "file", "file": gemini_files[sha]}
+
+
+def describe_in_background(file_bytes: bytes, mime_type: str, vision_key):
+    """Caches a question-independent description of a re-asked image, off the answer path."""
+    def run():
+        completion = router.complete_sync(
+            description_messages(file_bytes, mime_type),
+            has_image=True,
+            fallback=lambda _: "",
+            temperature=0,
+            max_tokens=DESCRIPTION_MAX_TOKENS,
+        )
+        if completion.source == "llm" and completion.text.strip():
+            vision_cache.put(vision_key, completion.text.strip())
+
+    threading.Thread(target=run, name="describe-image", daemon=True).start()
 
 
 # Streamlit Page Settings
@@ -92,8 +167,7 @@ if user_input:
     # AI Response
     # ---------------------------
     try:
-        response = model.generate_content(prompt)
-        answer = response.text
+        answer = generate(prompt, user_input).text
     except Exception as e:
         answer = "⚠️ Sorry, something went wrong while generating the response."
 
@@ -150,8 +224,7 @@ if user_input:
     New user message: {user_input}
     """
 
-    response = model.generate_content(prompt)
-    answer = response.text
+    answer = generate(prompt, user_input).text
 
     # Append assistant message
     st.session_state["messages"].append({"role": "assistant", "content": answer})
@@ -162,29 +235,27 @@ if user_input:
         with st.spinner("Thinking..."):
             # 3) If file is uploaded, use it as extra context
             try:
+                image_description = None
+                part = None
                 if uploaded_file is not None:
-                    # Save to temporary file for Gemini upload
-                    suffix = os.path.splitext(uploaded_file.name)[1]
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-                        tmp.write(uploaded_file.read())
-                        tmp_path = tmp.name
-
-                    try:
-                        gemini_file = genai.upload_file(
-                            path=tmp_path,
-                            mime_type=uploaded_file.type
-                        )
-                        # File + prompt together
-                        response = model.generate_content([gemini_file, base_prompt])
-                    finally:
-                        # Clean up temp file
-                        if os.path.exists(tmp_path):
-                            os.remove(tmp_path)
+                    file_bytes = uploaded_file.getvalue()
+                    vision_key = image_fingerprint(file_bytes)
+                    if VISION_CACHE_ENABLED and uploaded_file.type.startswith("image/"):
+                        # Asked about once: sent inline. Asked about again: described
+                        # in the background, later questions use the description
+                        image_description = vision_cache.get(vision_key)
+                        if image_description is None and vision_cache.seen_before(vision_key):
+                            describe_in_background(file_bytes, uploaded_file.type, vision_key)
+                    if image_description is None:
+                        part = file_part(uploaded_file, file_bytes, vision_key[0])
+
+                if image_description:
+                    completion = generate(f"{base_prompt}\n    {description_context(image_description)}\n", user_input)
                 else:
-                    # Text-only chat
-                    response = model.generate_content(base_prompt)
+                    # Text-only chat, or file + prompt together
+                    completion = generate(base_prompt, user_input, part)
 
-                answer = response.text
+                answer = completion.text
 
             except Exception as e:
                 answer = f"Sorry, something went wrong while processing your request: `{e}`"
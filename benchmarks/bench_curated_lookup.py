@@ -0,0 +1,87 @@
+"""
+Curated lookup benchmark: BM25 inverted index and the vector index vs
+the old linear scan.
+
+Synthesizes a catalog of N restaurants from Files/Res_List.json and
+times each approach per query, plus an incremental re-index and the
+vector index's first build vs a memory-mapped reload.
+
+    python benchmarks/bench_curated_lookup.py --size 20000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_index import RestaurantIndex
+from vector_index import VectorIndex
+
+QUERIES = ["italian", "any cozy italian in makati?", "sushi alabang", "filipino comfort food", "lounge vibes"]
+
+
+def synth_catalog(size: int):
+    with open(os.path.join("Files", "Res_List.json"), "r", encoding="utf-8") as f:
+        base = json.load(f)
+    return [{**r, "name": f"{r['name']} {i}"} for i in range(size // len(base) + 1) for r in base][:size]
+
+
+def linear_scan(restaurants, message):
+    # Old chatbot.py behaviour: rebuild the haystack for every restaurant
+    return [r for r in restaurants if message.lower() in " ".join([r["name"], r["category"], r["description"]]).lower()][:3]
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    restaurants = synth_catalog(args.size)
+    index = RestaurantIndex()
+
+    start = time.perf_counter()
+    index.update(restaurants)
+    print(f"index build: {len(index)} restaurants in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    directory = tempfile.mkdtemp(prefix="vector_index_")
+    start = time.perf_counter()
+    vectors = VectorIndex(directory=directory)
+    vectors.update(restaurants)
+    print(f"vector build: {len(vectors)} restaurants in {(time.perf_counter() - start) * 1000:.1f} ms")
+    start = time.perf_counter()
+    vectors = VectorIndex(directory=directory)
+    vectors.update(restaurants)
+    print(f"vector reload ({vectors.source}, mmap): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    print(f"{'query':<30} {'linear ms':>10} {'index ms':>10} {'vector ms':>10} {'hits (linear/index)':>20}")
+    for q in QUERIES:
+        lin = timed(lambda: linear_scan(restaurants, q), args.repeat)
+        idx = timed(lambda: index.search(q, k=3), args.repeat)
+        vec = timed(lambda: vectors.search(q, k=3), args.repeat)
+        hits = f"{len(linear_scan(restaurants, q))}/{len(index.search(q, k=3))}"
+        print(f"{q:<30} {lin:>10.3f} {idx:>10.3f} {vec:>10.3f} {hits:>20}")
+
+    edited = list(restaurants)
+    edited[0] = {**edited[0], "description": edited[0]["description"] + " Now open late."}
+    start = time.perf_counter()
+    stats = index.update(edited)
+    print(f"incremental update: {stats} in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
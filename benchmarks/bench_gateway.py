@@ -0,0 +1,104 @@
+"""
+LLM gateway under injected faults: latency and fallback rate per phase.
+
+Runs concurrent requests through LLMGateway against FaultInjectingBackend
+in phases (healthy, flaky, full outage, recovery) and reports
+p50/p99 latency, how many answers came from the local fallback and the
+breaker state at the end of each phase. During the outage p99 should sit
+near the fallback cost, not the deadline.
+
+    python benchmarks/bench_gateway.py --requests 200 --deadline 2
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+PHASES = [
+    # name, error_rate, hang_rate, outage
+    ("healthy", 0.0, 0.0, False),
+    ("flaky", 0.3, 0.1, False),
+    ("outage", 0.0, 0.0, True),
+    ("recovery", 0.0, 0.0, False),  # first wave after the cooldown: one probe, the rest fall back
+    ("recovered", 0.0, 0.0, False),
+]
+
+QUERIES = ["cozy italian in makati", "sushi alabang", "filipino comfort food", "date night bgc"]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def run_phase(gateway, backend, phase, requests, concurrency):
+    name, error_rate, hang_rate, outage = phase
+    backend.error_rate, backend.hang_rate, backend.outage = error_rate, hang_rate, outage
+    sem = asyncio.Semaphore(concurrency)
+    latencies, sources = [], []
+
+    async def one(i):
+        async with sem:
+            query = QUERIES[i % len(QUERIES)]
+            start = time.perf_counter()
+            completion = await gateway.complete([{"role": "user", "content": query}], model="fake")
+            latencies.append((time.perf_counter() - start) * 1000)
+            sources.append(completion.source)
+
+    await asyncio.gather(*[one(i) for i in range(requests)])
+    return {
+        "phase": name,
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "max_ms": round(max(latencies), 1),
+        "fallback_pct": round(100 * sources.count("fallback") / len(sources), 1),
+        "breaker": gateway.breaker.state,
+    }
+
+
+async def main_async(args):
+    from llm_client import FaultInjectingBackend
+    from llm_gateway import LLMGateway
+    from search_index import get_restaurant_index
+
+    get_restaurant_index()  # build the index outside the timed phases
+    backend = FaultInjectingBackend(latency_ms=args.latency_ms, seed=args.seed)
+    gateway = LLMGateway(lambda: backend)
+
+    results = []
+    for phase in PHASES:
+        if phase[0] == "recovery":
+            await asyncio.sleep(args.cooldown)  # let the breaker half-open
+        results.append(await run_phase(gateway, backend, phase, args.requests, args.concurrency))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--deadline", type=float, default=2.0, help="LLM_DEADLINE for this run")
+    parser.add_argument("--cooldown", type=float, default=1.0, help="LLM_BREAKER_COOLDOWN for this run")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    os.environ.update({
+        "LLM_DEADLINE": str(args.deadline),
+        "LLM_BREAKER_COOLDOWN": str(args.cooldown),
+    })
+    results = asyncio.run(main_async(args))
+
+    print(f"{'phase':<10} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'fallback %':>11} {'breaker':>10}")
+    for r in results:
+        print(f"{r['phase']:<10} {r['p50_ms']:>8} {r['p99_ms']:>8} {r['max_ms']:>8} "
+              f"{r['fallback_pct']:>11} {r['breaker']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Concurrency benchmark for the /chat completion path (offline).
+
+Runs N concurrent `process_chat_file` calls against the local fake
+backend, once with a blocking sleep (the old sync-client behaviour)
+and once with the async backend, and prints wall time for each.
+
+    python benchmarks/bench_llm_concurrency.py --sessions 50 --latency-ms 200
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LLM_BACKEND", "fake")
+# Every session must reach the backend: no response cache or coalescing
+os.environ.setdefault("RESPONSE_CACHE", "0")
+os.environ.setdefault("COALESCE", "0")
+
+import chatbot
+from llm_client import FakeBackend, set_backend
+
+
+async def run(sessions: int, latency_ms: float, blocking: bool, concurrency: int) -> float:
+    set_backend(FakeBackend(latency_ms=latency_ms, blocking=blocking, max_concurrency=concurrency))
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        chatbot.process_chat_file(f"bench-{blocking}-{i}", "cozy italian in makati")
+        for i in range(sessions)
+    ])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    for blocking in (True, False):
+        elapsed = asyncio.run(run(args.sessions, args.latency_ms, blocking, args.concurrency))
+        label = "blocking (sync client)" if blocking else "async backend"
+        print(f"{label:<24} {args.sessions} sessions in {elapsed:.2f}s "
+              f"({args.sessions / elapsed:.1f} req/s)")
+
+
+if __name__ == "__main__":
+    main()
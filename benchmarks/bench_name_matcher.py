@@ -0,0 +1,98 @@
+"""
+Restaurant-name extraction benchmark: Aho-Corasick matcher vs the old
+per-restaurant substring scan.
+
+Synthesizes N unique names from Files/Res_List.json and times both on
+replies that mention a few of them.
+
+    python benchmarks/bench_name_matcher.py --size 10000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from name_matcher import build_matcher
+
+FILLER = (
+    "Great choice! For something cozy and familiar, I recommend {0} in Rockwell — "
+    "modern Filipino with a classy touch. If you want casual, {1} serves some of the "
+    "best contemporary dishes, and {2} is perfect for date night. Craving dessert? "
+    "{3} has a tiramisu people line up for. Which one speaks to your vibe today?"
+)
+
+
+def synth_names(size: int):
+    with open(os.path.join("Files", "Res_List.json"), "r", encoding="utf-8") as f:
+        base = [r["name"] for r in json.load(f)]
+    return [{"name": f"{name} {i}"} for i in range(size // len(base) + 1) for name in base][:size]
+
+
+def linear_scan(restaurants, reply):
+    # Old bot.py behaviour: lowercase the reply once per restaurant, first hit only
+    for r in restaurants:
+        if r["name"].lower() in reply.lower():
+            return r["name"]
+    return None
+
+
+def linear_scan_all(restaurants, reply):
+    # What finding every mention would cost with the old approach
+    return [r["name"] for r in restaurants if r["name"].lower() in reply.lower()]
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=10000)
+    parser.add_argument("--replies", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    restaurants = synth_names(args.size)
+    start = time.perf_counter()
+    matcher = build_matcher(restaurants)
+    print(f"matcher build: {len(matcher)} names in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    rng = random.Random(7)
+    replies = []
+    for _ in range(args.replies):
+        picks = [r["name"] for r in rng.sample(restaurants, 4)]
+        picks[1] = picks[1].upper()  # case / accents must not matter
+        replies.append(FILLER.format(*picks))
+
+    no_names = FILLER.format("Aya", "Automat", "Pablo", "Chingolo")
+
+    def run(fn, texts):
+        return statistics.median(timed(lambda: fn(t), args.repeat) for t in texts)
+
+    rows = [
+        ("linear, first hit", run(lambda t: linear_scan(restaurants, t), replies),
+         run(lambda t: linear_scan(restaurants, t), [no_names]), "<= 1"),
+        ("linear, all hits", run(lambda t: linear_scan_all(restaurants, t), replies),
+         run(lambda t: linear_scan_all(restaurants, t), [no_names]),
+         f"{statistics.mean(len(linear_scan_all(restaurants, r)) for r in replies):.1f}"),
+        ("aho-corasick", run(matcher.find_all, replies), run(matcher.find_all, [no_names]),
+         f"{statistics.mean(len(matcher.find_all(r)) for r in replies):.1f}"),
+    ]
+    print(f"{'method':<18} {'ms / reply':>10} {'ms / no-hit':>12} {'names found':>12}")
+    for name, hit_ms, miss_ms, found in rows:
+        print(f"{name:<18} {hit_ms:>10.3f} {miss_ms:>12.3f} {found:>12}")
+
+
+if __name__ == "__main__":
+    main()
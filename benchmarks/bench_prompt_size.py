@@ -0,0 +1,46 @@
+"""
+Prompt size benchmark: full catalog inlined vs retrieval-scoped context.
+
+    python benchmarks/bench_prompt_size.py --sizes 24 1000 5000
+"""
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import search_index
+from search_index import RestaurantIndex
+from retrieval import retrieve_context, format_restaurant
+from tokens import count_tokens
+
+QUERY = "any cozy italian in makati?"
+
+
+def synth_catalog(size: int):
+    with open(os.path.join("Files", "Res_List.json"), "r", encoding="utf-8") as f:
+        base = json.load(f)
+    return [{**r, "name": f"{r['name']} {i}"} for i in range(size // len(base) + 1) for r in base][:size]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[24, 1000, 5000])
+    args = parser.parse_args()
+
+    print(f"{'restaurants':>12} {'full tokens':>12} {'scoped tokens':>14}")
+    for size in args.sizes:
+        catalog = synth_catalog(size)
+        index = RestaurantIndex()
+        index.update(catalog)
+        search_index._index = index
+
+        full = count_tokens("\n".join(format_restaurant(r, set()) for r in catalog))
+        _, stats = retrieve_context(QUERY, [])
+        print(f"{size:>12} {full:>12} {stats['context_tokens']:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+QR render microbenchmark: cost and payload size per format / setting.
+
+    python benchmarks/bench_qr_render.py --repeat 50
+"""
+import os
+import sys
+import time
+import uuid
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import qrcode
+from io import BytesIO
+from qr_code import qr_url, render_qr
+
+
+def legacy_png(data: str) -> bytes:
+    # Previous behaviour: qrcode.make defaults (box 10, border 4, ECC M)
+    buffer = BytesIO()
+    qrcode.make(data).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+VARIANTS = [
+    ("legacy png (box 10, border 4, M)", legacy_png),
+    ("png box 4, border 2, L", lambda d: render_qr(d, "png", 4, 2, "L")),
+    ("png box 6, border 2, M", lambda d: render_qr(d, "png", 6, 2, "M")),
+    ("svg runs, L", lambda d: render_qr(d, "svg", 4, 2, "L")),
+    ("svg runs, M", lambda d: render_qr(d, "svg", 4, 2, "M")),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'variant':<34} {'median ms':>10} {'bytes':>7} {'base64':>7}")
+    for label, fn in VARIANTS:
+        samples, size = [], 0
+        for _ in range(args.repeat):
+            data = qr_url(str(uuid.uuid4()))
+            start = time.perf_counter()
+            size = len(fn(data))
+            samples.append((time.perf_counter() - start) * 1000)
+        print(f"{label:<34} {statistics.median(samples):>10.2f} {size:>7} {(size + 2) // 3 * 4:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+In-process load test for /chat against the deterministic fake LLM.
+
+Drives `main.app` through httpx's ASGI transport (no network) with a
+mix of sessions:
+  - text:   discovery turn + follow-up
+  - upload: multipart image upload (menu photo)
+  - qr:     promo turn, item pick + "yes" confirmation (QR generation)
+
+For every session count it reports p50/p95/p99 latency (overall and per
+kind), throughput, event-loop lag and process memory growth. The client
+shares the process (and the CPU) with the app: on a machine with few
+cores, lag also includes time the loop waited for worker threads.
+
+    python benchmarks/load_chat.py --sessions 50 200 800 --latency-ms 50
+"""
+import gc
+import io
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import resource
+import tempfile
+import contextlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+KINDS = ("text", "upload", "qr")
+
+
+def percentile(samples, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # peak, not current
+
+
+def make_image(seed: int, size=(1600, 1200)) -> bytes:
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGB", size, (240, 230, 210))
+    draw = ImageDraw.Draw(img)
+    for row in range(0, size[1], 60):  # "menu lines"
+        draw.rectangle([80, row + 20, 80 + (row * 7 + seed * 13) % (size[0] - 160), row + 40], fill=(40, 30, 20))
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=90)
+    return out.getvalue()
+
+
+class LoopLagMonitor:
+    """Samples how late a periodic sleep wakes up: time the loop spent blocked."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - start - self.interval) * 1000)
+
+    def start(self):
+        self.samples = []
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+async def run_session(client, kind: str, sid: str, image: bytes, latencies):
+    async def post(data, files=None):
+        start = time.perf_counter()
+        resp = await client.post("/chat", data=data, files=files)
+        latencies[kind].append((time.perf_counter() - start) * 1000)
+        resp.raise_for_status()
+        return resp.json()
+
+    if kind == "text":
+        await post({"session_id": sid, "message": "cozy italian in makati"})
+        await post({"session_id": sid, "message": "what about desserts there?"})
+    elif kind == "upload":
+        await post({"session_id": sid, "message": "what's good on this menu?"},
+                   files={"file": ("menu.jpg", image, "image/jpeg")})
+    else:
+        await post({"session_id": sid, "message": "any promo deals at Fresca Trattoria?"})
+        await post({"session_id": sid, "message": "the pasta"})
+        reply = await post({"session_id": sid, "message": "yes"})
+        if "Token:" not in reply["reply"]:
+            raise RuntimeError(f"QR flow failed for {sid}")
+
+
+async def run_round(client, sessions: int, concurrency: int, tag: str, images):
+    latencies = {k: [] for k in KINDS}
+    sem = asyncio.Semaphore(concurrency)
+    monitor = LoopLagMonitor()
+
+    async def one(i):
+        async with sem:
+            kind = KINDS[i % len(KINDS)]
+            await run_session(client, kind, f"{tag}-{i}", images[i % len(images)], latencies)
+
+    gc.collect()
+    rss_before = rss_bytes()
+    monitor.start()
+    start = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(sessions)])
+    elapsed = time.perf_counter() - start
+    await monitor.stop()
+    gc.collect()
+    rss_after = rss_bytes()
+
+    everything = [x for k in KINDS for x in latencies[k]]
+    return {
+        "sessions": sessions,
+        "requests": len(everything),
+        "seconds": round(elapsed, 3),
+        "rps": round(len(everything) / elapsed, 1),
+        "p50_ms": round(percentile(everything, 50), 2),
+        "p95_ms": round(percentile(everything, 95), 2),
+        "p99_ms": round(percentile(everything, 99), 2),
+        "by_kind": {
+            k: {p: round(percentile(latencies[k], int(p[1:3])), 2) for p in ("p50_ms", "p95_ms", "p99_ms")}
+            for k in KINDS
+        },
+        "loop_lag_p99_ms": round(percentile(monitor.samples, 99), 2),
+        "loop_lag_max_ms": round(max(monitor.samples, default=0.0), 2),
+        "rss_mb": round(rss_after / 2**20, 1),
+        "rss_growth_kb_per_session": round((rss_after - rss_before) / 1024 / sessions, 2),
+    }
+
+
+async def run(args):
+    import httpx
+
+    import main
+    from llm_client import FakeBackend, set_backend
+
+    set_backend(FakeBackend(latency_ms=args.latency_ms, max_concurrency=args.concurrency))
+    images = [make_image(i) for i in range(args.unique_images)]
+
+    await main.app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            # Warm-up: imports, catalog / index build, executors
+            await run_round(client, len(KINDS), len(KINDS), "warmup", images)
+            return [
+                await run_round(client, n, args.concurrency, f"s{n}", images)
+                for n in args.sessions
+            ]
+    finally:
+        await main.app.router.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, nargs="+", default=[50, 200, 800])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=50, help="fake LLM latency per call")
+    parser.add_argument("--unique-images", type=int, default=8,
+                        help="distinct upload images (repeats hit the vision cache)")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's own prints (upload stats, ...)")
+    args = parser.parse_args()
+
+    # Isolated, deterministic state: fake LLM, throwaway promo DB and QR folder
+    tmp = tempfile.mkdtemp(prefix="choosie-bench-")
+    os.environ.update({
+        "LLM_BACKEND": "fake",
+        "SESSION_BACKEND": "memory",
+        "PROMO_DB_PATH": os.path.join(tmp, "promos.db"),
+        "QR_FOLDER": os.path.join(tmp, "qr_codes"),
+    })
+
+    with contextlib.redirect_stdout(sys.stdout if args.verbose else open(os.devnull, "w")):
+        results = asyncio.run(run(args))
+
+    print(f"{'sessions':>8} {'reqs':>6} {'req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8} "
+          f"{'lag p99':>8} {'lag max':>8} {'RSS MB':>7} {'KB/sess':>8}")
+    for r in results:
+        print(f"{r['sessions']:>8} {r['requests']:>6} {r['rps']:>7} {r['p50_ms']:>8} {r['p95_ms']:>8} "
+              f"{r['p99_ms']:>8} {r['loop_lag_p99_ms']:>8} {r['loop_lag_max_ms']:>8} {r['rss_mb']:>7} "
+              f"{r['rss_growth_kb_per_session']:>8}")
+    print("\nper kind (p50 / p95 / p99 ms):")
+    for r in results:
+        kinds = "  ".join(f"{k}: {v['p50_ms']}/{v['p95_ms']}/{v['p99_ms']}" for k, v in r["by_kind"].items())
+        print(f"{r['sessions']:>8}  {kinds}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Multi-process load test for /chat with shared SQLite state.
+
+Starts `uvicorn main:app --workers N` for each worker count against the
+fake LLM backend and a shared SQLite session store, then drives it with
+concurrent sessions. Every session runs a promo turn followed by a "yes"
+confirmation, which only works if the pending offer is visible to
+whichever worker receives the follow-up.
+
+    python benchmarks/load_multiworker.py --workers 1 2 4 --sessions 200
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_server(workers: int, port: int, db_path: str, latency_ms: float) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "LLM_BACKEND": "fake",
+        "LLM_FAKE_LATENCY_MS": str(latency_ms),
+        "SESSION_BACKEND": "sqlite",
+        "SESSION_DB_PATH": db_path,
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+
+
+async def wait_ready(base_url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(f"{base_url}/docs")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def run_session(client: httpx.AsyncClient, base_url: str, sid: str) -> bool:
+    await client.post(f"{base_url}/chat", data={"session_id": sid, "message": "any promo deals in makati?"})
+    resp = await client.post(f"{base_url}/chat", data={"session_id": sid, "message": "yes"})
+    return "Token:" in resp.json()["reply"]
+
+
+async def drive(base_url: str, sessions: int, concurrency: int, tag: str):
+    limits = httpx.Limits(max_connections=concurrency)
+    sem = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        async def one(i):
+            async with sem:
+                return await run_session(client, base_url, f"{tag}-{i}")
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*[one(i) for i in range(sessions)])
+        elapsed = time.perf_counter() - start
+    return elapsed, sum(results)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'requests':>9} {'seconds':>8} {'req/s':>8} {'QR confirmations ok':>20}")
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "sessions.db")
+            base_url = f"http://127.0.0.1:{args.port}"
+            proc = start_server(workers, args.port, db_path, args.latency_ms)
+            try:
+                asyncio.run(wait_ready(base_url))
+                elapsed, ok = asyncio.run(drive(base_url, args.sessions, args.concurrency, f"w{workers}"))
+            finally:
+                proc.terminate()
+                proc.wait()
+        requests = args.sessions * 2
+        print(f"{workers:>8} {requests:>9} {elapsed:>8.2f} {requests / elapsed:>8.1f} {ok:>14}/{args.sessions}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Redemption load test: concurrent validations must never double-spend.
+
+Issues N tokens into a fresh SQLite promo store, then lets several
+processes (each with a thread pool) try to redeem every token at the
+same time. Exactly N redemptions may succeed.
+
+    python benchmarks/load_redemption.py --tokens 2000 --processes 4 --threads 8 --attempts 3
+"""
+import os
+import sys
+import time
+import uuid
+import random
+import argparse
+import tempfile
+from collections import Counter
+from multiprocessing import Pool
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from redemption import PromoTokenStore
+
+_store = None
+
+
+def _init(path: str):
+    global _store
+    _store = PromoTokenStore(path)
+
+
+def _redeem_batch(args):
+    tokens, threads = args
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return Counter(r["status"] for r in pool.map(_store.redeem, tokens))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--attempts", type=int, default=3, help="concurrent redemptions per token, per process")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "promos.db")
+        store = PromoTokenStore(path)
+        tokens = [str(uuid.uuid4()) for _ in range(args.tokens)]
+        for token in tokens:
+            store.issue(token, "Fresca Trattoria · Cook Pasta · ₱220.00 (was ₱232.00)")
+
+        batches = []
+        for _ in range(args.processes):
+            batch = tokens * args.attempts
+            random.shuffle(batch)
+            batches.append((batch, args.threads))
+
+        start = time.perf_counter()
+        with Pool(args.processes, initializer=_init, initargs=(path,)) as pool:
+            totals = sum(pool.map(_redeem_batch, batches), Counter())
+        elapsed = time.perf_counter() - start
+
+    validations = sum(totals.values())
+    print(f"{validations} validations in {elapsed:.2f}s ({validations / elapsed:.0f}/s) "
+          f"with {args.processes} processes x {args.threads} threads")
+    print(f"statuses: {dict(totals)}")
+    double_spends = totals["success"] - args.tokens
+    print(f"successful redemptions: {totals['success']} / {args.tokens} tokens "
+          f"-> double spends: {max(double_spends, 0)}")
+    if totals["success"] != args.tokens:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Microbenchmarks for the per-request hot paths, with a regression gate.
+
+    python benchmarks/microbench.py                          # run all
+    python benchmarks/microbench.py --only qr_png upload_4k  # run some
+    python benchmarks/microbench.py --save baseline.json     # record
+    python benchmarks/microbench.py --compare baseline.json  # exit 1 on regressions
+
+A case regresses when its median is more than --tolerance (default 30%)
+slower than the baseline's.
+"""
+import io
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("PROMO_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="choosie-micro-"), "promos.db"))
+
+QUERIES = ["italian", "any cozy italian in makati?", "sushi alabang", "filipino comfort food", "pizza"]
+
+HISTORY = [
+    {"role": "user" if i % 2 == 0 else "assistant",
+     "content": "cozy italian in makati?" if i % 2 == 0 else "Try **Fresca Trattoria** in Legazpi Village — great pasta."}
+    for i in range(10)
+]
+
+
+def _jpeg(size) -> bytes:
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGB", size, (240, 230, 210))
+    draw = ImageDraw.Draw(img)
+    for row in range(0, size[1], 60):
+        draw.rectangle([80, row + 20, 80 + (row * 7) % (size[0] - 160), row + 40], fill=(40, 30, 20))
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=90)
+    return out.getvalue()
+
+
+# =========================================
+# Cases: name -> (setup() -> fn, iterations)
+# =========================================
+def case_curated_lookup():
+    from search_index import get_restaurant_index
+
+    index = get_restaurant_index()
+    return lambda: [index.search(q, k=3) for q in QUERIES]
+
+
+def case_curated_hybrid():
+    from vector_index import get_vector_index, hybrid_search
+
+    get_vector_index()
+    return lambda: [hybrid_search(q, k=3) for q in QUERIES]
+
+
+def case_curated_geo():
+    from retrieval import rank_candidates
+
+    rank_candidates("warmup", 3)
+    queries = ["cozy italian near BGC", "sushi in alabang", "anything around rockwell", "dessert in makati"]
+    return lambda: [rank_candidates(q, k=3) for q in queries]
+
+
+def case_curated_lookup_20k():
+    from search_index import RestaurantIndex
+    from catalog import get_catalog
+
+    base = list(get_catalog().current().restaurants)
+    index = RestaurantIndex()
+    index.update([{**r, "name": f"{r['name']} {i}"} for i in range(20000 // len(base) + 1) for r in base][:20000])
+    return lambda: [index.search(q, k=3) for q in QUERIES]
+
+
+def case_prompt_chat():
+    import chatbot
+
+    return lambda: chatbot.chat_prompt.build(HISTORY, "what about desserts there?", session_key="micro")
+
+
+def case_prompt_bot():
+    from prompt import BOT_RULES, DATABASE_PROMPT
+    from prompt_assembly import PromptAssembler
+    from retrieval import retrieve_context
+
+    assembler = PromptAssembler("micro_bot", BOT_RULES)
+
+    def build():
+        context, _ = retrieve_context("any dessert promo at fresca?", HISTORY)
+        return assembler.build(HISTORY, "any dessert promo at fresca?",
+                               context=DATABASE_PROMPT.render(context_data=context), session_key="micro")
+    return build
+
+
+def case_qr_png():
+    from qr_code import render_qr
+
+    return lambda: render_qr("https://yourapp.com/promo/redeem?token=0123456789abcdef", "png")
+
+
+def case_qr_svg():
+    from qr_code import render_qr
+
+    return lambda: render_qr("https://yourapp.com/promo/redeem?token=0123456789abcdef", "svg")
+
+
+def _upload_case(size):
+    from starlette.datastructures import Headers, UploadFile
+    from file import prepare_uploaded_file
+
+    data = _jpeg(size)
+    loop = asyncio.new_event_loop()
+
+    def run():
+        upload = UploadFile(io.BytesIO(data), filename="menu.jpg", headers=Headers({"content-type": "image/jpeg"}))
+        return loop.run_until_complete(prepare_uploaded_file(upload))
+    return run
+
+
+def case_upload_small():
+    return _upload_case((800, 600))
+
+
+def case_upload_4k():
+    return _upload_case((4000, 3000))
+
+
+def case_image_fingerprint():
+    from image_cache import image_fingerprint
+
+    data = _jpeg((1536, 1152))
+    return lambda: image_fingerprint(data)
+
+
+def case_name_extraction():
+    from name_matcher import find_restaurants
+
+    reply = "Try **Fresca Trattoria** for pasta, **Ono Kai** for drinks, or Offbeat if you want Filipino twists. " * 3
+    return lambda: find_restaurants(reply)
+
+
+CASES = {
+    "curated_lookup": (case_curated_lookup, 200),
+    "curated_lookup_20k": (case_curated_lookup_20k, 200),
+    "curated_hybrid": (case_curated_hybrid, 200),
+    "curated_geo": (case_curated_geo, 200),
+    "prompt_chat": (case_prompt_chat, 500),
+    "prompt_bot": (case_prompt_bot, 200),
+    "qr_png": (case_qr_png, 30),
+    "qr_svg": (case_qr_svg, 30),
+    "upload_small": (case_upload_small, 20),
+    "upload_4k": (case_upload_4k, 10),
+    "image_fingerprint": (case_image_fingerprint, 20),
+    "name_extraction": (case_name_extraction, 500),
+}
+
+
+def measure(fn, iterations: int):
+    fn()  # warm-up (lazy builds, imports)
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return {
+        "p50_us": round(statistics.median(samples), 1),
+        "p95_us": round(samples[min(len(samples) - 1, int(0.95 * len(samples)))], 1),
+        "ops_per_s": round(1e6 / statistics.mean(samples), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--only", nargs="+", choices=sorted(CASES))
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply iteration counts")
+    parser.add_argument("--save", help="write results as a baseline JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to check against")
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results, regressions = {}, []
+    print(f"{'case':<20} {'p50 us':>10} {'p95 us':>10} {'ops/s':>10} {'vs base':>8}")
+    for name in args.only or CASES:
+        setup, iterations = CASES[name]
+        result = measure(setup(), max(1, int(iterations * args.scale)))
+        results[name] = result
+
+        delta = ""
+        if name in baseline:
+            ratio = result["p50_us"] / baseline[name]["p50_us"]
+            delta = f"{(ratio - 1) * 100:+.0f}%"
+            if ratio > 1 + args.tolerance:
+                regressions.append(name)
+                delta += " !"
+        print(f"{name:<20} {result['p50_us']:>10} {result['p95_us']:>10} {result['ops_per_s']:>10} {delta:>8}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if regressions:
+        print(f"\nRegressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,107 +1,278 @@
 import os
+import time
 from dotenv import load_dotenv
 import json
-from typing import Dict, Optional
-from openai import OpenAI
+from typing import Dict, List, Optional
 
 # Import prompts
-from prompt import get_system_prompt, INTENT_PROMPT, QR_EXTRACTION_PROMPT
+from prompt import BOT_RULES, DATABASE_PROMPT, INTENT_PROMPT, SINGLE_CALL_PROMPT
+from prompt_assembly import PromptAssembler
+from intent import classify_local, parse_intent
+from retrieval import retrieve_context
+from tokens import count_message_tokens
+from session_store import create_store
+from history import HistoryManager
+from name_matcher import find_restaurants
+from offers import advance, after_reply, issued_reply, offer_text
+from qr_code import generate_unique_qr
+from response_cache import prompt_version
+from singleflight import SingleFlight, coalesce_key
+from llm_gateway import request_deadline
+from llm_client import LLM_BACKEND, OFFLINE_BACKENDS
+from model_router import ModelRouter, tiers_from_env
+import metrics
+from metrics import span
 
 # ===============================
 # Load environment variables
 # ===============================
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-if not os.getenv("OPENAI_API_KEY"):
+if not os.getenv("OPENAI_API_KEY") and LLM_BACKEND not in OFFLINE_BACKENDS:
     raise ValueError("OPENAI_API_KEY not found in environment variables")
 
+# Provider + model per turn (BOT_MODEL_FAST / _SMART / _VISION); every
+# call goes through the LLM gateway (deadline, retries, breaker, fallback)
+bot_router = ModelRouter(
+    "bot",
+    tiers_from_env("BOT", fast="openai:gpt-4o-mini", smart="openai:gpt-4o", vision="openai:gpt-4o"),
+)
+
 # ===============================
-# Load static restaurants & menu
+# Restaurants & menus (hot-reloaded, see catalog.py)
 # ===============================
-def load_restaurant_list():
-    path = os.path.join("Files", "Res_List.json")
-    if not os.path.exists(path):
-        return []
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-RESTAURANTS = load_restaurant_list()
 base_url = "http://10.10.12.9:8001"
 
+# "single_call": reply + intent in one structured completion
+# "two_call":    detect_intent, then the reply (legacy behaviour)
+INTENT_MODE = os.getenv("BOT_INTENT_MODE", "single_call")
+LOCAL_INTENT = os.getenv("BOT_LOCAL_INTENT", "1") == "1"
+
 # ===============================
 # In-memory chat state & history
 # ===============================
-chat_state: Dict[int, dict] = {}
-chat_history: Dict[int, list[dict]] = {}
+# Bounded LRU + TTL stores (SESSION_BACKEND=memory|sqlite); history is
+# compacted on write to HISTORY_TOKEN_BUDGET, older turns summarised.
+chat_state = create_store("bot_chat_state")
+chat_history = create_store("bot_chat_history")
+history_manager = HistoryManager(chat_history)
+
+metrics.gauge("choosie_session_store_entries", lambda: len(chat_state),
+              "Entries in a session store", store="bot_chat_state")
+metrics.gauge("choosie_session_store_entries", lambda: len(chat_history),
+              "Entries in a session store", store="bot_chat_history")
 
-def get_chat_history(chat_id: int, limit: int = 15):
-    return chat_history.get(chat_id, [])[-limit:]
+def get_chat_history(chat_id: int):
+    """Running summary (if any) + recent messages, ready for the prompt."""
+    return history_manager.prompt_messages(history_manager.load(chat_id))
 
 def save_chat_message(chat_id: int, role: str, content: str):
-    chat_history.setdefault(chat_id, []).append({"role": role, "content": content})
+    conv = history_manager.load(chat_id)
+    history_manager.append(conv, role, content)
+    history_manager.save(chat_id, conv)
+
+def get_history_usage(chat_id: int):
+    return history_manager.usage(history_manager.load(chat_id))
 
 # ===============================
-# Build system prompt with context
+# Prompt assembly
 # ===============================
-SYSTEM_PROMPT = get_system_prompt(
-    "\n".join([
-        f"Restaurant: {r['name']}\n>>> CURRENT MENU & OFFERS\n" +
-        "\n".join(
-            f"- {item['name']}: ₱{item['price']}" +
-            (f" [PROMO {item['discount']}% OFF]" if item.get("discount", 0) else "")
-            for item in r.get("menu", [])
-        ) + "\n"
-        for r in RESTAURANTS
-    ])
-)
+# Static rules first (cacheable prefix), then history, then the
+# per-message DATABASE, then the user message.
+reply_prompt = PromptAssembler("bot_reply", BOT_RULES)
+single_call_prompt = PromptAssembler("bot_single_call", BOT_RULES, SINGLE_CALL_PROMPT)
+
+for _assembler in (reply_prompt, single_call_prompt):
+    metrics.gauge("choosie_cache_hit_ratio", lambda a=_assembler: a.metrics()["prefix_hit_ratio"],
+                  "Hits / lookups since start", cache=f"{_assembler.name}_prefix")
+
+def build_prompt(chat_id: int, history: list, message: str, single_call: bool = False) -> tuple[list, dict]:
+    """
+    Chat payload scoped to the restaurants relevant to this message,
+    instead of inlining the whole catalog on every request.
+    """
+    context, stats = retrieve_context(message, history)
+    assembler = single_call_prompt if single_call else reply_prompt
+    messages, info = assembler.build(
+        history, message, context=DATABASE_PROMPT.render(context_data=context), session_key=chat_id
+    )
+    return messages, {**stats, **info}
 
 # ===============================
 # Helper functions
 # ===============================
+def extract_restaurants_from_reply(reply: str) -> List[str]:
+    """All catalog restaurants the reply names, in order (one Aho-Corasick pass)."""
+    return list(dict.fromkeys(m.name for m in find_restaurants(reply)))
+
 def extract_restaurant_from_reply(reply: str) -> Optional[str]:
-    for r in RESTAURANTS:
-        if r["name"].lower() in reply.lower():
-            return r["name"]
-    return None
+    mentions = find_restaurants(reply)
+    return mentions[0].name if mentions else None
 
-def detect_intent(history: list, message: str) -> str:
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "system", "content": INTENT_PROMPT}, *history[-5:], {"role": "user", "content": message}],
+# Same message + same recent history in flight at once -> one intent call
+intent_flight = SingleFlight("bot_intent")
+
+def _detect_intent(history: list, message: str) -> str:
+    # Classification is a short, closed-label task: the fast tier handles it
+    # (labels are mapped onto INTENTS, since they route the reply)
+    return parse_intent(bot_router.complete_sync(
+        [{"role": "system", "content": INTENT_PROMPT}, *history, {"role": "user", "content": message}],
+        tier="fast",
+        fallback=lambda _: "general_chat",
         temperature=0
+    ).text)
+
+def detect_intent(history: list, message: str) -> str:
+    recent = history[-5:]
+    # exact keys: dropping stopwords could merge "not interested" with "interested"
+    key = coalesce_key(message, prompt_version(json.dumps(recent, ensure_ascii=False)), mode="exact")
+    return intent_flight.do(key, lambda: _detect_intent(recent, message))
+
+def generate_reply(messages_payload: list, intent: Optional[str] = None) -> str:
+    return bot_router.complete_sync(
+        messages_payload,
+        intent=intent,
+        temperature=0.7,
+        max_tokens=900
+    ).text
+
+def generate_reply_with_intent(messages_payload: list) -> tuple[str, str]:
+    """One round trip: the model returns {"intent": ..., "reply": ...}."""
+    # Intent unknown until the reply comes back: routed to the smart tier
+    completion = bot_router.complete_sync(
+        messages_payload,
+        temperature=0.7,
+        max_tokens=900,
+        json_mode=True
     )
-    return response.choices[0].message.content.strip()
+    if completion.source == "fallback":
+        return completion.text, "general_chat"
+    raw = completion.text
+    try:
+        data = json.loads(raw)
+        return str(data.get("reply", "")).strip(), parse_intent(data.get("intent"))
+    except (json.JSONDecodeError, AttributeError):
+        # Model ignored the format: treat the whole output as the reply
+        return raw, "general_chat"
+
+# ===============================
+# Per-mode latency counters
+# ===============================
+latency_stats: Dict[str, dict] = {}
+
+def record_latency(mode: str, elapsed_ms: float):
+    stats = latency_stats.setdefault(mode, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+    stats["count"] += 1
+    stats["total_ms"] += elapsed_ms
+    stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+def get_latency_stats() -> Dict[str, dict]:
+    return {
+        mode: {**stats, "avg_ms": round(stats["total_ms"] / stats["count"], 2)}
+        for mode, stats in latency_stats.items()
+    }
 
 # ===============================
 # Main chat function
 # ===============================
 def process_chat(chat_id: int, message: str = ""):
+    with metrics.trace("bot") as trace, request_deadline():
+        result = _process_chat(chat_id, message)
+    if trace is not None:
+        result["timings"] = trace.summary()
+    return result
+
+def _process_chat(chat_id: int, message: str) -> dict:
     message = (message or "").strip()
-    history = get_chat_history(chat_id)
-    save_chat_message(chat_id, "user", message)
+    with span("history_load"):
+        history = get_chat_history(chat_id)
+        usage = get_history_usage(chat_id)
+    with span("history_save"):
+        save_chat_message(chat_id, "user", message)
 
-    if chat_id not in chat_state:
-        chat_state[chat_id] = {"restaurant": None, "awaiting_qr_confirmation": False, "pending_offer": None}
+    state = chat_state.get(chat_id) or {"restaurant": None, "pending_offer": None}
 
-    intent = detect_intent(history, message)
+    # Picking a promo item, confirming and declining never reach the LLM (see offers.py)
+    offer = state.get("pending_offer")
+    decision = advance(offer, message) if offer and message else None
+    if decision and decision.action in ("issue", "reply"):
+        return _offer_turn(chat_id, state, decision)
 
-    messages_payload = [{"role": "system", "content": SYSTEM_PROMPT}] + history + [{"role": "user", "content": message}]
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=messages_payload,
-        temperature=0.7,
-        max_tokens=900
-    )
+    started = time.perf_counter()
+    with span("intent_local"):
+        intent = classify_local(message, history) if LOCAL_INTENT else None
+    if intent:
+        mode = "local_intent"
+    elif INTENT_MODE == "single_call":
+        mode = "single_call"
+    else:
+        mode = "two_call"
+
+    with span("prompt_build"):
+        messages, retrieval = build_prompt(chat_id, history, message, single_call=mode == "single_call")
+    prompt_tokens = count_message_tokens(messages)
+    # Same prompt with the full, uncompacted history
+    prompt_tokens_before = prompt_tokens + usage["tokens_before"] - usage["tokens_after"]
+
+    if mode == "single_call":
+        with span("llm"):
+            reply, intent = generate_reply_with_intent(messages)
+    else:
+        if mode == "two_call":
+            with span("llm_intent"):
+                intent = detect_intent(history, message)
+        with span("llm"):
+            reply = generate_reply(messages, intent)
+
+    record_latency(mode, (time.perf_counter() - started) * 1000)
+    metrics.inc("choosie_requests_total", help_text="Chat turns by outcome", path="bot", outcome=mode)
+    with span("history_save"):
+        save_chat_message(chat_id, "assistant", reply)
+
+    with span("name_extraction"):
+        mentioned = extract_restaurants_from_reply(reply)
+    if mentioned:
+        state["restaurant"] = mentioned[0]
+    state["pending_offer"] = after_reply(offer, reply)
+    chat_state.set(chat_id, state)
 
-    reply = response.choices[0].message.content.strip()
-    save_chat_message(chat_id, "assistant", reply)
+    return {
+        "reply": reply,
+        "intent": intent,
+        "intent_mode": mode,
+        "restaurant": state.get("restaurant"),
+        "mentioned_restaurants": mentioned,
+        "prompt_tokens": prompt_tokens,
+        "prompt_tokens_before": prompt_tokens_before,
+        "context_restaurants": retrieval["restaurants"],
+        "prompt_version": retrieval["prompt_version"],
+    }
 
-    restaurant_name = extract_restaurant_from_reply(reply)
-    if restaurant_name:
-        chat_state[chat_id]["restaurant"] = restaurant_name
+def _offer_turn(chat_id: int, state: dict, decision) -> dict:
+    """Answers a promo turn locally; "issue" registers a one-time QR for the offer."""
+    qr = None
+    if decision.action == "issue":
+        with span("qr_generate"):
+            qr = generate_unique_qr(offer_text(decision.offer))
+        reply = issued_reply(decision.offer, qr["token"], "QR: [one-time QR code attached]")
+        intent = "promo_confirmation"
+        state["pending_offer"] = None
+    else:
+        reply = decision.reply
+        intent = "promo_decline" if decision.offer is None else "promo_selection"
+        state["pending_offer"] = decision.offer
 
-    return {"reply": reply, "intent": intent, "restaurant": chat_state[chat_id].get("restaurant")}
+    metrics.inc("choosie_requests_total", help_text="Chat turns by outcome", path="bot", outcome="offer_local")
+    with span("history_save"):
+        save_chat_message(chat_id, "assistant", reply)
+    chat_state.set(chat_id, state)
+    return {
+        "reply": reply,
+        "intent": intent,
+        "intent_mode": "offer_local",
+        "restaurant": state.get("restaurant"),
+        "qr": qr,
+    }
 
 # ===============================
 # Run interactively
@@ -0,0 +1,258 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from geo import Area, Place, nearby, normalize_address
+from search_index import normalize_text
+
+# -----------------------------------------
+# Catalog settings (override via .env)
+# -----------------------------------------
+RES_LIST_PATH = os.path.join("Files", "Res_List.json")
+DETAILS_PATH = os.path.join("Files", "details.json")
+CATALOG_REFRESH_INTERVAL = float(os.getenv("CATALOG_REFRESH_INTERVAL", "2"))  # seconds between file stats
+
+
+def catalog_key(name: str) -> str:
+    """Lookup key for restaurant / category names: case, accents and spacing folded."""
+    return " ".join(normalize_text(name).split())
+
+
+def _money(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+# =========================================
+# Menu items
+# =========================================
+class MenuItem:
+    """
+    One row of Files/details.json.
+
+    Slotted (no per-item __dict__), prices parsed to floats once and
+    repeated strings interned, so 100k items stay in the tens of MB.
+    Supports item["name"] / item.get("discount") like the raw dicts.
+    """
+
+    __slots__ = ("id", "name", "price", "discount", "net_price", "free_items")
+
+    def __init__(self, raw: dict):
+        self.id = raw.get("id")
+        self.name = sys.intern(str(raw.get("name", "")))
+        self.price = _money(raw.get("price"))
+        self.discount = _money(raw.get("discount"))
+        net = raw.get("net_price")
+        # details.json discounts are peso amounts (232.00 - 12.00 -> net 220.0)
+        self.net_price = _money(net) if net is not None else round(max(self.price - self.discount, 0.0), 2)
+        self.free_items = tuple(
+            sys.intern(str(f.get("name", ""))) for f in raw.get("free_items") or () if f.get("name")
+        )
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def _key(self) -> tuple:
+        return (self.id, self.name, self.price, self.discount, self.net_price, self.free_items)
+
+    def __eq__(self, other):
+        return isinstance(other, MenuItem) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f"MenuItem({self.name!r}, price={self.price}, discount={self.discount})"
+
+
+# =========================================
+# Immutable snapshot
+# =========================================
+class CatalogSnapshot:
+    """
+    One consistent view of both catalog files. Never mutated after
+    construction: readers keep using the snapshot they fetched even while
+    a reload builds the next one.
+
+    Each restaurant is the Res_List.json dict plus a "menu" tuple of
+    MenuItem, so existing `r["name"]` / `r.get("menu")` callers work as is.
+    """
+
+    def __init__(self, version: str, restaurants: List[dict], items: List[dict]):
+        self.version = version
+
+        menus: Dict[str, List[MenuItem]] = {}
+        for raw in items:
+            key = catalog_key(raw.get("restaurant_name", ""))
+            menus.setdefault(key, []).append(MenuItem(raw))
+
+        by_name: Dict[str, dict] = {}
+        by_category: Dict[str, List[dict]] = {}
+        by_area: Dict[str, List[dict]] = {}
+        places: Dict[str, Place] = {}
+        by_place: Dict[Place, List[dict]] = {}
+        for raw in restaurants:
+            key = catalog_key(raw.get("name", ""))
+            if not key:
+                continue
+            r = {**raw, "menu": tuple(menus.get(key, ()))}
+            by_name[key] = r
+            by_category.setdefault(catalog_key(r.get("category", "")), []).append(r)
+            places[key] = place = normalize_address(r.get("address", ""))
+            by_place.setdefault(place, []).append(r)
+            for area in place.areas:  # city and every district the address names
+                by_area.setdefault(area, []).append(r)
+
+        self.restaurants: Tuple[dict, ...] = tuple(by_name.values())
+        self.by_name = by_name
+        self.by_category = {k: tuple(v) for k, v in by_category.items()}
+        self.by_area = {k: tuple(v) for k, v in by_area.items()}
+        self.places = places
+        self.by_place = {k: tuple(v) for k, v in by_place.items()}
+        self.menu_items = sum(len(v) for v in menus.values())
+        # details.json rows whose restaurant is not in Res_List.json
+        self.orphan_items = sum(len(v) for k, v in menus.items() if k not in by_name)
+
+    def restaurant(self, name: str) -> Optional[dict]:
+        return self.by_name.get(catalog_key(name))
+
+    def menu(self, name: str) -> Tuple[MenuItem, ...]:
+        r = self.restaurant(name)
+        return r["menu"] if r else ()
+
+    def in_category(self, category: str) -> Tuple[dict, ...]:
+        return self.by_category.get(catalog_key(category), ())
+
+    def in_area(self, area: str) -> Tuple[dict, ...]:
+        """Restaurants in a city or district, by name or alias ("BGC", "Makati City")."""
+        areas = normalize_address(area).areas
+        return self.by_area.get(areas[0], ()) if areas else ()
+
+    def place(self, name: str) -> Optional[Place]:
+        return self.places.get(catalog_key(name))
+
+    def near(self, area: Area, near: bool = False) -> List[Tuple[dict, float]]:
+        """Restaurants in / around `area`, closest first as (restaurant, km); see geo.nearby."""
+        return nearby(area, self.by_place.items(), near)
+
+    def __len__(self):
+        return len(self.restaurants)
+
+
+# =========================================
+# Hot-reloading service
+# =========================================
+class Catalog:
+    """
+    Serves the current CatalogSnapshot. The files are stat'ed at most
+    every `check_interval` seconds; on change a new snapshot is built
+    off to the side and swapped in with a single assignment. A file that
+    fails to parse (e.g. caught mid-write) keeps the last good snapshot,
+    and is retried on the next change.
+
+    `version` is a hash of both files' (mtime, size), so caches keyed on
+    it invalidate as soon as either file changes.
+    """
+
+    def __init__(
+        self,
+        res_path: str = RES_LIST_PATH,
+        details_path: str = DETAILS_PATH,
+        check_interval: float = CATALOG_REFRESH_INTERVAL,
+    ):
+        self.paths = (res_path, details_path)
+        self.check_interval = check_interval
+        self._snapshot = CatalogSnapshot("empty", [], [])
+        self._sig = None
+        self._failed_sig = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def _signature(self) -> tuple:
+        sig = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                sig.append(f"{st.st_mtime_ns}:{st.st_size}")
+            except OSError:
+                sig.append("-")
+        return tuple(sig)
+
+    @staticmethod
+    def _read(path: str) -> list:
+        if not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, list) else []
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Checks the files and rebuilds the snapshot if one changed. The
+        rebuild runs in a background thread (requests keep the current
+        snapshot meanwhile) unless `force` is set. Returns True on an
+        inline swap.
+        """
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+        sig = self._signature()
+        if sig == self._sig or (sig == self._failed_sig and not force):
+            return False
+        if force:
+            return self._reload(sig)
+        if not self._lock.locked():
+            threading.Thread(target=self._reload, args=(sig,), daemon=True).start()
+        return False
+
+    def _reload(self, sig: tuple) -> bool:
+        with self._lock:  # one rebuild at a time
+            if sig == self._sig:
+                return False
+            try:
+                restaurants, items = (self._read(p) for p in self.paths)
+            except (OSError, ValueError) as e:
+                print(f"Catalog reload failed, keeping version {self._snapshot.version}: {e}")
+                self._failed_sig = sig
+                return False
+            version = hashlib.sha256("\x00".join(sig).encode("utf-8")).hexdigest()[:12]
+            self._snapshot = CatalogSnapshot(version, restaurants, items)
+            self._sig = sig
+            self.reloads += 1
+            return True
+
+    def current(self) -> CatalogSnapshot:
+        self.refresh()
+        return self._snapshot
+
+    @property
+    def version(self) -> str:
+        return self.current().version
+
+
+# -----------------------------------------
+# Shared catalog for Files/*.json
+# -----------------------------------------
+_catalog: Optional[Catalog] = None
+
+
+def get_catalog() -> Catalog:
+    global _catalog
+    if _catalog is None:
+        _catalog = Catalog()
+        _catalog.refresh(force=True)
+    return _catalog
@@ -1,33 +1,46 @@
-from typing import Dict, List, Literal, TypedDict
+from typing import Dict, List, Literal, Optional, TypedDict
 from fastapi import UploadFile
-import os, json, base64
+import os, json, time, base64, asyncio
 from dotenv import load_dotenv
-import openai  # Ensure openai is imported
-
-# Helpers
-from file import prepare_uploaded_file
-from qr_code import generate_unique_qr
 
 # -----------------------------------------
 # Load ENV
 # -----------------------------------------
 load_dotenv()
+
+# Helpers
+from file import prepare_uploaded_file
+from qr_code import generate_unique_qr_async
+from llm_client import LLM_BACKEND, OFFLINE_BACKENDS
+from llm_gateway import request_deadline
+from model_router import ModelRouter, tiers_from_env
+from intent import classify_local
+from offers import ALREADY_CLAIMED, Decision, advance, after_reply, issued_reply, offer_text
+from retrieval import rank_candidates
+from session_store import create_store
+from history import HistoryManager
+from tokens import count_message_tokens
+from prompt_assembly import PromptAssembler, PromptTemplate
+from response_cache import RESPONSE_CACHE_ENABLED, ResponseCache, catalog_version, prompt_version
+from singleflight import AsyncSingleFlight, coalesce_key
+from image_cache import (
+    DESCRIPTION_MAX_TOKENS, VISION_CACHE_ENABLED, description_context, description_messages,
+    image_fingerprint, vision_cache,
+)
+import metrics
+from metrics import span
+
 API_KEY = os.getenv("OPENAI_API_KEY")
-if not API_KEY:
+if not API_KEY and LLM_BACKEND not in OFFLINE_BACKENDS:
     raise RuntimeError("OPENAI_API_KEY is missing.")
 
-# -----------------------------------------
-# Load Restaurants
-# -----------------------------------------
-def load_restaurant_list():
-    path = os.path.join("Files", "Res_List.json")
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return []
-
-RESTAURANTS = load_restaurant_list()
+# Small model for chit-chat and promo yes/no, bigger one for discovery
+# and images (CHAT_MODEL_FAST / _SMART / _VISION, "provider:model")
+chat_router = ModelRouter(
+    "chat",
+    tiers_from_env("CHAT", fast="openai:gpt-4o-mini", smart="openai:gpt-4o", vision="openai:gpt-4o"),
+    default="fast",
+)
 
 # -----------------------------------------
 # Session & Offers
@@ -36,9 +49,13 @@ class Message(TypedDict):
     role: Literal["system", "user", "assistant"]
     content: str
 
-chat_sessions: Dict[str, List[Message]] = {}
-pending_offers: Dict[str, Dict] = {}
-MAX_HISTORY = 15
+# Bounded LRU + TTL stores (SESSION_BACKEND=memory|sqlite)
+chat_sessions = create_store("chat_sessions")
+pending_offers = create_store("pending_offers")
+
+# Histories are kept within HISTORY_TOKEN_BUDGET; older turns are rolled
+# into a running summary
+history_manager = HistoryManager(chat_sessions)
 
 # =========================================
 # FINAL CHOOSIE MASTER PROMPT V1 + SMART GREETING FIX
@@ -115,113 +132,389 @@ You are **Choosie**, a friendly and stylish restaurant recommendation assistant
 
 """.strip()
 
+# Static, cacheable prefix: the persona never changes between requests
+chat_prompt = PromptAssembler("chat", PromptTemplate("chat_persona", SYSTEM_PROMPT))
+
+# Part of every response-cache key: a prompt or model change never
+# serves answers produced by the old one.
+PROMPT_VERSION = prompt_version(chat_prompt.version, chat_router.signature())
+
+# First-turn discovery answers ("filipino food", "romantic dinner makati")
+response_cache = ResponseCache()
+
+# Identical first-turn queries arriving together (promo pushes) share one
+# in-flight completion instead of each missing the cache
+llm_flight = AsyncSingleFlight("chat_llm")
+
+# Scraped by GET /metrics (computed at scrape time, not per request)
+metrics.gauge("choosie_session_store_entries", lambda: len(chat_sessions),
+              "Entries in a session store", store="chat_sessions")
+metrics.gauge("choosie_session_store_entries", lambda: len(pending_offers),
+              "Entries in a session store", store="pending_offers")
+metrics.gauge("choosie_cache_hit_ratio", lambda: response_cache.metrics()["hit_ratio"],
+              "Hits / lookups since start", cache="response")
+metrics.gauge("choosie_cache_hit_ratio", lambda: vision_cache.metrics()["hit_ratio"],
+              "Hits / lookups since start", cache="vision")
+metrics.gauge("choosie_cache_hit_ratio", lambda: chat_prompt.metrics()["prefix_hit_ratio"],
+              "Hits / lookups since start", cache="chat_prompt_prefix")
+metrics.gauge("choosie_cache_entries", lambda: response_cache.metrics()["entries"],
+              "Entries in a cache", cache="response")
+metrics.gauge("choosie_cache_entries", lambda: vision_cache.metrics()["entries"],
+              "Entries in a cache", cache="vision")
+
 # -----------------------------------------
 # Helpers
 # -----------------------------------------
-def _load_session(session_id: str):
-    if session_id not in chat_sessions:
-        chat_sessions[session_id] = []
-    return chat_sessions[session_id]
-
-def _trim(session_id: str):
-    if len(chat_sessions[session_id]) > MAX_HISTORY:
-        chat_sessions[session_id] = chat_sessions[session_id][-MAX_HISTORY:]
-
-def is_yes(text: str) -> bool:
-    return text.lower().strip() in {"yes", "yep", "yeah", "ok", "okay", "claim", "down", "generate", "let’s go", "g"}
+# Session stores may be SQLite (SESSION_BACKEND): their calls block, so
+# turns run them in a worker thread instead of on the event loop
+async def _load_session(session_id: str) -> Dict:
+    return await asyncio.to_thread(history_manager.load, session_id)
+
+async def _save_session(session_id: str, conv: Dict) -> Dict:
+    # Compacts the conversation to the token budget before storing it
+    return await asyncio.to_thread(history_manager.save, session_id, conv)
+
+QR_PLACEHOLDER = "QR: [one-time QR code shown to the user]"
+
+async def _describe_image(uploaded: Dict, vision_key) -> Optional[str]:
+    """
+    Neutral description of an upload, stored in the vision cache. None when
+    the vision model is unavailable. Concurrent uploads of the same file
+    share one call.
+    """
+    completion = await llm_flight.do(("describe", vision_key[0]), lambda: chat_router.complete(
+        description_messages(uploaded["data"], uploaded["mime_type"]),
+        has_image=True,
+        fallback_query="",
+        temperature=0,
+        max_tokens=DESCRIPTION_MAX_TOKENS,
+    ))
+    if completion.source != "llm" or not completion.text.strip():
+        return None
+    vision_cache.put(vision_key, completion.text.strip())
+    return completion.text.strip()
+
+_describe_tasks = set()  # strong references: the loop only keeps weak ones
+
+def _describe_in_background(uploaded: Dict, vision_key):
+    """Describes a re-uploaded image off the request path, for the uploads after it."""
+    task = asyncio.get_running_loop().create_task(_describe_image(uploaded, vision_key))
+    _describe_tasks.add(task)
+    task.add_done_callback(_describe_tasks.discard)
 
 # -----------------------------------------
-# Main Function
+# Turn stages (shared by /chat and /chat/stream)
 # -----------------------------------------
-async def process_chat_file(session_id: str, message: str, upload: UploadFile = None):
-    history = _load_session(session_id)
+async def _prepare_turn(session_id: str, message: str, upload: UploadFile = None, uploaded: Dict = None) -> Dict:
+    """
+    Records the user message and either resolves the turn locally
+    (QR confirmation) or builds the LLM payload.
+
+    Returns {"result": ...} for locally resolved turns, otherwise
+    {"history", "messages", "curated_block", "cache_key", "tokens",
+    "query", "intent", "has_image"}. `history` is the stored conversation
+    (see HistoryManager); `intent` / `has_image` pick the model.
+    `cache_key` is set only for stateless first turns (no prior history,
+    no upload). `uploaded` is an already prepared upload (see stream_chat_file).
+    """
+    with span("history_load"):
+        conv = await _load_session(session_id)
     message = (message or "").strip()
 
-    uploaded = None
-    if upload:
-        uploaded = await prepare_uploaded_file(upload)
+    if upload and uploaded is None:
+        with span("upload"):
+            uploaded = await prepare_uploaded_file(upload)
+
+    # A first upload goes inline with the question (one call). When the same
+    # file comes back it is described in the background (question-independent),
+    # and the uploads after that are answered from the cached description
+    image_description = None
+    if uploaded and VISION_CACHE_ENABLED:
+        with span("vision_fingerprint"):
+            vision_key = await asyncio.to_thread(image_fingerprint, uploaded["data"])
+        image_description = vision_cache.get(vision_key)
+        if image_description is not None:
+            uploaded["stats"]["vision_cache"] = "hit"
+        elif vision_cache.seen_before(vision_key):
+            uploaded["stats"]["vision_cache"] = "repeat"
+            _describe_in_background(uploaded, vision_key)
+        else:
+            uploaded["stats"]["vision_cache"] = "miss"
 
     user_content = message or "[Image uploaded]"
     if uploaded and message:
         user_content = f"{message} [Image: {upload.filename}]"
 
-    if user_content:
-        history.append({"role": "user", "content": user_content})
-
-    # ——— QR CONFIRMATION ———
-    if session_id in pending_offers and is_yes(message):
-        offer = pending_offers.pop(session_id)
-        offer_text = f"{offer['restaurant']} · {offer.get('item', 'Dish')} · {offer.get('discount', 15)}% OFF"
-        qr = generate_unique_qr(offer_text)
-        title = offer.get("title", "Taste Elite")
-
-        reply = (
-            f"Rise as a {title} — your exclusive drop just landed.\n\n"
-            f"{offer_text}\n"
-            f"Token: {qr['token']}\n\n"
-            f"QR: data:image/png;base64,{qr['qr_code']}\n\n"
-            "This one has your name on it. Flex when you redeem."
-        )
-        history.append({"role": "assistant", "content": reply})
-        _trim(session_id)
-        return {"reply": reply, "history": history}
+    first_turn = not conv["messages"] and not conv["summary"]
+    # Routes the model call (see chat_router); None = not obvious locally
+    intent = classify_local(message, conv["messages"]) if message else None
+    with span("history_save"):
+        history_manager.append(conv, "user", user_content)
+        conv = await _save_session(session_id, conv)
+
+    # ——— OFFER / QR CONFIRMATION ———
+    # Picking an item, confirming and declining are resolved locally (see offers.py)
+    offer = await asyncio.to_thread(pending_offers.get, session_id)
+    decision = advance(offer, message) if offer and message else None
+    if decision and decision.action == "issue":
+        # Claim before issuing: pop is atomic across workers, so two "yes"
+        # requests can never both get a token for the same offer
+        claimed = await asyncio.to_thread(pending_offers.pop, session_id, None)
+        decision = advance(claimed, message) if claimed else Decision("reply", None, ALREADY_CLAIMED)
+        if decision.action == "pass":  # changed by another request in between: leave it pending
+            await asyncio.to_thread(pending_offers.set, session_id, claimed)
+    if decision and decision.action == "issue":
+        with span("qr_generate"):
+            qr = await generate_unique_qr_async(offer_text(decision.offer))
+        reply = issued_reply(decision.offer, qr["token"], f"QR: {qr['qr_url']}")
+        # History (re-sent to the LLM on later turns) keeps a placeholder, not the image link
+        history_manager.append(conv, "assistant", issued_reply(decision.offer, qr["token"], QR_PLACEHOLDER))
+        conv = await _save_session(session_id, conv)
+        return {"result": {"reply": reply, "history": conv["messages"], "qr": qr}}
+    if decision and decision.action == "reply":
+        if decision.offer is None:
+            await asyncio.to_thread(pending_offers.delete, session_id)
+        else:
+            await asyncio.to_thread(pending_offers.set, session_id, decision.offer)
+        history_manager.append(conv, "assistant", decision.reply)
+        conv = await _save_session(session_id, conv)
+        return {"result": {"reply": decision.reply, "history": conv["messages"], "qr": None}}
 
     # ——— CURATED BLOCK ———
     curated_block = ""
     curated = []
     if message.lower() not in {"hi", "hello", "hey", "sup", "yo"}:  # simple safety net
-        curated = [r for r in RESTAURANTS if message.lower() in " ".join([r["name"], r["category"], r["description"]]).lower()][:3]
+        with span("curated_lookup"):
+            curated = rank_candidates(message, 3)[0]
         if curated:
             # Directly add restaurant details without "Vibe-matched picks" header
             for r in curated:
                 curated_block += f"• {r['name']} — {r['description']} ({r['category']})\n  {r['address']}\n"
 
     # ——— BUILD MESSAGES ———
-    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-
-    for msg in history:
-        if msg["role"] in {"user", "assistant"}:  # only valid roles
-            messages.append(msg)
-
     # Vision support
-    if uploaded:
-        content_block = [{"type": "text", "text": user_content}]
+    if image_description:
+        content = f"{user_content}\n\n{description_context(image_description)}"
+    elif uploaded:
         b64 = base64.b64encode(uploaded["data"]).decode()
-        content_block.append({
-            "type": "image_url",
-            "image_url": {"url": f"data:{uploaded['mime_type']};base64,{b64}"}
-        })
-        messages.append({"role": "user", "content": content_block})
+        content = [
+            {"type": "text", "text": user_content},
+            {"type": "image_url", "image_url": {"url": f"data:{uploaded['mime_type']};base64,{b64}"}},
+        ]
     else:
-        messages.append({"role": "user", "content": user_content})
+        content = user_content
 
-    # ——— CALL OPENAI ———
-    try:
-        resp = openai.ChatCompletion.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            temperature=0.8,
-            max_tokens=800
+    # Persona + summary + earlier messages; the current user message (last
+    # in the stored history) goes last, with the image when there is one
+    with span("prompt_build"):
+        messages, _ = chat_prompt.build(
+            history_manager.prompt_messages(conv)[:-1], content, session_key=session_id
         )
-        ai_answer = resp["choices"][0]["message"]["content"].strip()
-    except Exception as e:
-        # Catch all exceptions
-        print(f"Error occurred: {e}")
-        ai_answer = "Sorry, something went wrong. Please try again later."
 
+    cache_key = message if RESPONSE_CACHE_ENABLED and first_turn and not uploaded and message else None
+
+    # Prompt tokens as sent vs. with the full, uncompacted history
+    usage = history_manager.usage(conv)
+    prompt_tokens = count_message_tokens(messages)
+    tokens = {
+        "prompt_tokens_before": prompt_tokens - usage["tokens_after"] + usage["tokens_before"],
+        "prompt_tokens_after": prompt_tokens,
+    }
+
+    return {
+        "history": conv,
+        "messages": messages,
+        "curated_block": curated_block,
+        "cache_key": cache_key,
+        "upload": uploaded["stats"] if uploaded else None,
+        "query": message,
+        "intent": intent,
+        "has_image": bool(uploaded) and image_description is None,
+        "tokens": tokens,
+    }
+
+
+async def _finish_turn(session_id: str, conv: Dict, ai_answer: str, curated_block: str) -> Dict:
     final_answer = ai_answer + curated_block
 
-    history.append({"role": "assistant", "content": final_answer})
-    _trim(session_id)
+    with span("history_save"):
+        history_manager.append(conv, "assistant", final_answer)
+        conv = await _save_session(session_id, conv)
+
+    # Offer on the table after the model's reply (the curated block only lists places)
+    offer = after_reply(await asyncio.to_thread(pending_offers.get, session_id), ai_answer)
+    if offer is not None:
+        await asyncio.to_thread(pending_offers.set, session_id, offer)
+    else:
+        await asyncio.to_thread(pending_offers.delete, session_id)
 
-    # Auto-create pending offer if AI mentioned unlock/drop
-    if any(k in final_answer.lower() for k in ["unlocked", "drop", "rise as"]):
-        if session_id not in pending_offers:
-            pending_offers[session_id] = {
-                "restaurant": "Partner Spot",
-                "item": "Signature",
-                "discount": 15,
-                "title": "Taste Titan"
-            }
+    return {"reply": final_answer, "history": conv["messages"]}
 
-    return {"reply": final_answer, "history": history}
+
+def _sse(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# -----------------------------------------
+# Main Function
+# -----------------------------------------
+async def process_chat_file(session_id: str, message: str, upload: UploadFile = None):
+    with metrics.trace("chat") as trace, request_deadline():
+        result = await _process_chat_turn(session_id, message, upload)
+    if trace is not None:
+        result["timings"] = trace.summary()
+    return result
+
+
+async def _process_chat_turn(session_id: str, message: str, upload: UploadFile = None) -> Dict:
+    turn = await _prepare_turn(session_id, message, upload)
+    if "result" in turn:
+        result = turn["result"]
+        metrics.inc("choosie_requests_total", help_text="Chat turns by outcome", path="chat", outcome="local")
+        return {"reply": result["reply"], "history": result["history"]}
+
+    cache_key = turn["cache_key"]
+    curated_block = turn["curated_block"]
+    ai_answer = response_cache.get(cache_key, PROMPT_VERSION) if cache_key else None
+    outcome = "cached"
+
+    # ——— CALL LLM (non-blocking) ———
+    if ai_answer is None:
+        flight_key = coalesce_key(cache_key, PROMPT_VERSION, catalog_version()) if cache_key else None
+        with span("llm"):
+            completion = await llm_flight.do(flight_key, lambda: chat_router.complete(
+                turn["messages"],
+                intent=turn["intent"],
+                has_image=turn["has_image"],
+                fallback_query=turn["query"],
+                temperature=0.8,
+                max_tokens=800
+            ))
+        ai_answer = completion.text
+        outcome = completion.source
+        if completion.source == "llm":
+            if cache_key:
+                response_cache.put(cache_key, PROMPT_VERSION, ai_answer)
+        else:
+            curated_block = ""  # the fallback reply already lists the catalog picks
+    metrics.inc("choosie_requests_total", help_text="Chat turns by outcome", path="chat", outcome=outcome)
+
+    result = await _finish_turn(session_id, turn["history"], ai_answer, curated_block)
+    result["tokens"] = turn["tokens"]
+    if turn["upload"]:
+        result["upload"] = turn["upload"]
+    return result
+
+
+async def _stream_answer(turn: Dict, info: Dict):
+    """
+    Completion chunks for a prepared turn; cached first turns come back as
+    one chunk. `info["source"]` ends up "cached", "llm", "interrupted" or
+    "fallback" (see LLMGateway.stream).
+    """
+    cache_key = turn["cache_key"]
+    cached = response_cache.get(cache_key, PROMPT_VERSION) if cache_key else None
+    if cached is not None:
+        info["source"] = "cached"
+        yield cached
+        return
+
+    parts: List[str] = []
+    async for chunk in chat_router.stream(
+        turn["messages"],
+        intent=turn["intent"],
+        has_image=turn["has_image"],
+        fallback_query=turn["query"],
+        info=info,
+        temperature=0.8,
+        max_tokens=800
+    ):
+        parts.append(chunk)
+        yield chunk
+    if info["source"] != "llm":
+        return
+
+    answer = "".join(parts).strip()
+    if cache_key:
+        response_cache.put(cache_key, PROMPT_VERSION, answer)
+
+
+async def stream_chat_file(session_id: str, message: str, upload: UploadFile = None, uploaded: Dict = None):
+    """
+    Server-Sent Events variant of process_chat_file.
+
+    Yields `token` events while the completion is generated, then one
+    `done` event carrying the curated block, pending offer / QR payload
+    and timings (`ttfb_ms` = time to first token).
+
+    The route must read the upload (prepare_uploaded_file) before the
+    response starts and pass it as `uploaded`: the form file is closed
+    once the endpoint returns, and size/type errors should still be
+    plain HTTP errors.
+    """
+    with metrics.trace("chat_stream") as trace, request_deadline():
+        async for event in _stream_chat_turn(session_id, message, upload, uploaded, trace):
+            yield event
+
+
+def _done(payload: Dict, trace) -> str:
+    if trace is not None:
+        payload["timings"] = trace.summary()
+    return _sse("done", payload)
+
+
+async def _stream_chat_turn(session_id: str, message: str, upload: UploadFile, uploaded: Dict, trace):
+    started = time.perf_counter()
+    turn = await _prepare_turn(session_id, message, upload, uploaded)
+
+    if "result" in turn:
+        result = turn["result"]
+        metrics.inc("choosie_requests_total", help_text="Chat turns by outcome", path="chat_stream", outcome="local")
+        yield _done({
+            "reply": result["reply"],
+            "curated": "",
+            "qr": result.get("qr"),
+            "pending_offer": await asyncio.to_thread(pending_offers.get, session_id),
+            "ttfb_ms": round((time.perf_counter() - started) * 1000, 2),
+            "total_ms": round((time.perf_counter() - started) * 1000, 2),
+        }, trace)
+        return
+
+    parts: List[str] = []
+    info: Dict = {}
+    ttfb_ms = None
+    finished = False
+    try:
+        try:
+            async for chunk in _stream_answer(turn, info):
+                if ttfb_ms is None:
+                    ttfb_ms = round((time.perf_counter() - started) * 1000, 2)
+                parts.append(chunk)
+                yield _sse("token", {"text": chunk})
+            outcome = info.get("source", "llm")
+        except Exception as e:
+            print(f"Error occurred: {e}")
+            outcome = "error"
+            parts = ["Sorry, something went wrong. Please try again later."]
+            yield _sse("token", {"text": parts[0]})
+        metrics.inc("choosie_requests_total", help_text="Chat turns by outcome", path="chat_stream", outcome=outcome)
+
+        curated_block = turn["curated_block"] if outcome != "fallback" else ""
+        result = await _finish_turn(session_id, turn["history"], "".join(parts).strip(), curated_block)
+        finished = True
+        yield _done({
+            "reply": result["reply"],
+            "curated": curated_block,
+            "qr": None,
+            "pending_offer": await asyncio.to_thread(pending_offers.get, session_id),
+            "upload": turn["upload"],
+            "tokens": turn["tokens"],
+            "ttfb_ms": ttfb_ms,
+            "total_ms": round((time.perf_counter() - started) * 1000, 2),
+        }, trace)
+    finally:
+        # Client went away mid-stream: keep whatever was generated so the
+        # session history still alternates user / assistant.
+        # Runs inline: the generator is being closed, so it cannot await here.
+        if not finished and parts:
+            history_manager.append(turn["history"], "assistant", "".join(parts).strip())
+            history_manager.save(session_id, turn["history"])
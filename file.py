@@ -1,18 +1,86 @@
-from fastapi import UploadFile
+import os
+import io
+import asyncio
+
+from fastapi import HTTPException, UploadFile
+from PIL import Image, ImageOps
+
+# -------------------------------------
+# Upload limits (override via .env)
+# -------------------------------------
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+UPLOAD_MAX_DIMENSION = int(os.getenv("UPLOAD_MAX_DIMENSION", "1536"))  # longest side sent to the model
+UPLOAD_JPEG_QUALITY = int(os.getenv("UPLOAD_JPEG_QUALITY", "85"))
+
+# Leading bytes of the image formats we accept
+_SIGNATURES = {
+    b"\x89PNG\r\n\x1a\n": "image/png",
+    b"\xff\xd8\xff": "image/jpeg",
+    b"GIF87a": "image/gif",
+    b"GIF89a": "image/gif",
+}
+
+
+def _sniff(head: bytes):
+    for sig, mime in _SIGNATURES.items():
+        if head.startswith(sig):
+            return mime
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+# -------------------------------------
+# Downscale / re-encode (runs in a worker thread)
+# -------------------------------------
+def _downscale(data: bytes, mime_type: str):
+    """
+    Fits the image inside UPLOAD_MAX_DIMENSION and re-encodes it
+    (JPEG, or PNG when it has transparency). Small JPEG/PNG uploads that
+    already fit are passed through untouched.
+    """
+    with Image.open(io.BytesIO(data)) as img:
+        width, height = img.size
+        fits = max(width, height) <= UPLOAD_MAX_DIMENSION
+        if fits and mime_type in {"image/jpeg", "image/png"} and len(data) <= 512 * 1024:
+            return data, mime_type, (width, height), width * height * len(img.getbands())
+
+        # JPEGs can be decoded directly at 1/2, 1/4 or 1/8 scale: never
+        # materialise the full-resolution bitmap of a large photo.
+        scale = min(1.0, UPLOAD_MAX_DIMENSION / max(width, height))
+        img.draft("RGB", (int(width * scale), int(height * scale)))
+        img = ImageOps.exif_transpose(img)
+        decoded_bytes = img.size[0] * img.size[1] * len(img.getbands())
+
+        img.thumbnail((UPLOAD_MAX_DIMENSION, UPLOAD_MAX_DIMENSION), Image.LANCZOS)
+        out = io.BytesIO()
+        if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+            img.save(out, format="PNG", optimize=True)
+            out_mime = "image/png"
+        else:
+            img.convert("RGB").save(out, format="JPEG", quality=UPLOAD_JPEG_QUALITY, optimize=True)
+            out_mime = "image/jpeg"
+        return out.getvalue(), out_mime, img.size, decoded_bytes
+
 
 # -------------------------------------
 # Prepare uploaded file for OpenAI Vision
 # -------------------------------------
 async def prepare_uploaded_file(upload: UploadFile):
     """
-    Reads an uploaded file (image, PDF, menu photo, etc.)
-    and returns its raw bytes and mime type.
+    Streams an uploaded image (menu photo, food photo, screenshot) in
+    chunks, enforcing UPLOAD_MAX_BYTES while reading, then downscales it
+    to a model-appropriate resolution off the event loop.
+
+    Raises HTTPException 415 for non-images and 413 for oversized files.
 
     Returns:
         dict | None:
             {
                 "mime_type": str,
-                "data": bytes
+                "data": bytes,
+                "stats": {"received_bytes", "payload_bytes", "peak_bytes", "width", "height"}
             }
         OR None if no file is provided.
     """
@@ -21,15 +89,47 @@ async def prepare_uploaded_file(upload: UploadFile):
     if upload is None:
         return None
 
-    # Read uploaded file data
-    file_bytes = await upload.read()
+    # Reject obvious non-images before reading the body
+    if upload.content_type and not upload.content_type.startswith("image/"):
+        raise HTTPException(status_code=415, detail="Only image uploads are supported.")
+
+    buffer = bytearray()
+    while True:
+        chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        if not buffer and _sniff(chunk[:16]) is None:
+            raise HTTPException(status_code=415, detail="Only image uploads are supported.")
+        buffer.extend(chunk)
+        if len(buffer) > UPLOAD_MAX_BYTES:
+            raise HTTPException(status_code=413, detail="Image is too large.")
 
     # If file is empty or unreadable
-    if not file_bytes:
+    if not buffer:
         return None
 
+    received = bytes(buffer)
+    del buffer
+    try:
+        data, mime_type, (width, height), decoded_bytes = await asyncio.to_thread(
+            _downscale, received, _sniff(received[:16])
+        )
+    except (OSError, Image.DecompressionBombError):
+        raise HTTPException(status_code=415, detail="Could not read the image.")
+
+    # Peak estimate: raw upload + decoded pixels + re-encoded output
+    # (+ its base64 data URL, built by the caller)
+    peak_bytes = len(received) + decoded_bytes + len(data) + (len(data) + 2) // 3 * 4
+
     # Return standard file structure for OpenAI Vision models
     return {
-        "mime_type": upload.content_type,
-        "data": file_bytes
+        "mime_type": mime_type,
+        "data": data,
+        "stats": {
+            "received_bytes": len(received),
+            "payload_bytes": len(data),
+            "peak_bytes": peak_bytes,
+            "width": width,
+            "height": height,
+        }
     }
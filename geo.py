@@ -0,0 +1,191 @@
+import os
+import re
+import json
+import math
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from search_index import normalize_text
+
+# -----------------------------------------
+# Geo settings (override via .env)
+# -----------------------------------------
+GAZETTEER_PATH = os.path.join("Files", "gazetteer.json")
+GEO_FILTER = os.getenv("GEO_FILTER", "1") == "1"      # 0: location words only count as search terms
+GEO_NEAR_KM = float(os.getenv("GEO_NEAR_KM", "2.5"))  # extra reach of "near X" beyond X itself
+
+# Query words that ask for proximity rather than membership ("near BGC" vs "in Makati")
+NEAR_WORDS = {"near", "nearby", "around", "close", "beside", "walking"}
+
+_AREA_SUFFIX_RE = re.compile(r"\s+city$")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def area_key(name: str) -> str:
+    """Lookup key for area names: case, accents and spacing folded."""
+    return " ".join(normalize_text(name).split())
+
+
+def area_of(address: str) -> str:
+    """Coarse area from an address: its last component ("Makati City" -> "makati")."""
+    last = (address or "").rsplit(",", 1)[-1]
+    last = last.rsplit(" - ", 1)[-1]
+    return _AREA_SUFFIX_RE.sub("", area_key(last))
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(h))
+
+
+class Area(NamedTuple):
+    key: str
+    name: str
+    kind: str         # "city" | "district"
+    city: str         # key of the enclosing city (itself for cities)
+    lat: float
+    lon: float
+    radius_km: float
+
+
+class Place(NamedTuple):
+    """Where a restaurant is: its city, most specific district and coordinates (if known)."""
+    city: str
+    district: Optional[str]
+    areas: Tuple[str, ...]  # every area key the address mentions, plus the city
+    lat: Optional[float]
+    lon: Optional[float]
+
+
+# =========================================
+# Gazetteer
+# =========================================
+class Gazetteer:
+    """
+    Metro Manila cities and districts from Files/gazetteer.json with
+    approximate centers, a radius and the spellings they go by in
+    addresses and queries ("BGC", "the Fort", "Bonifacio Global City").
+    """
+
+    def __init__(self, path: str = GAZETTEER_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        self.areas: Dict[str, Area] = {}
+        aliases: List[Tuple[str, Area]] = []
+        for entry in raw:
+            area = Area(
+                key=area_key(entry["name"]),
+                name=entry["name"],
+                kind=entry.get("kind", "district"),
+                city=area_key(entry.get("city") or entry["name"]),
+                lat=float(entry["lat"]),
+                lon=float(entry["lon"]),
+                radius_km=float(entry.get("radius_km", 1.0)),
+            )
+            self.areas[area.key] = area
+            for alias in entry.get("aliases") or [entry["name"]]:
+                aliases.append((" ".join(_WORD_RE.findall(area_key(alias))), area))
+        # Longest alias first, so "ayala alabang" wins over "alabang"
+        self._aliases = sorted(aliases, key=lambda a: -len(a[0]))
+
+    def get(self, key: str) -> Optional[Area]:
+        return self.areas.get(area_key(key))
+
+    def find(self, text: str) -> List[Area]:
+        """Areas named in free text, without overlapping matches."""
+        padded = f" {' '.join(_WORD_RE.findall(normalize_text(text)))} "
+        found: List[Area] = []
+        for alias, area in self._aliases:
+            needle = f" {alias} "
+            if needle in padded:
+                padded = padded.replace(needle, " | ")
+                if area not in found:
+                    found.append(area)
+        return found
+
+    def __len__(self):
+        return len(self.areas)
+
+
+_gazetteer: Optional[Gazetteer] = None
+
+
+def get_gazetteer() -> Gazetteer:
+    global _gazetteer
+    if _gazetteer is None:
+        _gazetteer = Gazetteer()
+    return _gazetteer
+
+
+# =========================================
+# Addresses and queries
+# =========================================
+def normalize_address(address: str, gazetteer: Optional[Gazetteer] = None) -> Place:
+    """
+    "Level 3, Shangri-La at the Fort, Taguig City" -> city "taguig",
+    district "bgc" with BGC's coordinates. Addresses the gazetteer does
+    not know keep their last component as the city, without coordinates.
+    """
+    gazetteer = gazetteer or get_gazetteer()
+    found = gazetteer.find(address or "")
+    districts = sorted((a for a in found if a.kind == "district"), key=lambda a: a.radius_km)
+    cities = [a for a in found if a.kind == "city"]
+
+    district = districts[0] if districts else None
+    if district is not None:
+        city = district.city
+    elif cities:
+        city = cities[0].key
+    else:
+        city = area_of(address)
+
+    keys = [a.key for a in found] + ([city] if city else [])
+    anchor = district or gazetteer.areas.get(city)
+    return Place(
+        city=city,
+        district=district.key if district else None,
+        areas=tuple(dict.fromkeys(keys)),
+        lat=anchor.lat if anchor else None,
+        lon=anchor.lon if anchor else None,
+    )
+
+
+def locate(query: str) -> Tuple[Optional[Area], bool]:
+    """
+    Most specific area a query names and whether it asks for proximity:
+    "cozy italian near BGC" -> (BGC, True). (None, False) without one.
+    """
+    found = get_gazetteer().find(query or "")
+    if not found:
+        return None, False
+    near = bool(NEAR_WORDS & set(_WORD_RE.findall(normalize_text(query))))
+    return min(found, key=lambda a: a.radius_km), near
+
+
+def distance_km(place: Place, area: Area) -> Optional[float]:
+    if place.lat is None:
+        return None
+    return haversine_km(place.lat, place.lon, area.lat, area.lon)
+
+
+def nearby(area: Area, by_place: Iterable[Tuple[Place, List[dict]]], near: bool = False,
+           radius_km: float = GEO_NEAR_KM) -> List[Tuple[dict, float]]:
+    """
+    Restaurants inside `area`, plus (for districts or "near" queries) those
+    within its radius + `radius_km` of its center, closest first as
+    (restaurant, km). Members without coordinates rank at the area's edge.
+
+    Takes restaurants grouped by Place: addresses resolve to a few dozen
+    gazetteer points, so distances are computed per point, not per row.
+    """
+    reach = area.radius_km + radius_km if near or area.kind == "district" else 0.0
+    ranked = []
+    for place, restaurants in by_place:
+        km = distance_km(place, area)
+        if area.key in place.areas:
+            km = km if km is not None else area.radius_km
+        elif km is None or km > reach:
+            continue
+        ranked.extend((r, km) for r in restaurants)
+    ranked.sort(key=lambda x: x[1])
+    return ranked
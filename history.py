@@ -0,0 +1,122 @@
+import os
+import re
+from typing import Dict, List
+
+from session_store import SessionStore
+from tokens import count_tokens
+
+# -----------------------------------------
+# History settings (override via .env)
+# -----------------------------------------
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))  # verbatim messages
+HISTORY_SUMMARY_TOKENS = int(os.getenv("HISTORY_SUMMARY_TOKENS", "300"))  # running summary
+HISTORY_MIN_MESSAGES = 2  # the latest exchange is never compacted
+DIGEST_CHARS = 160
+
+MESSAGE_OVERHEAD = 4  # same per-message estimate as tokens.count_message_tokens
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s")
+_BOLD_RE = re.compile(r"\*\*(.+?)\*\*")
+_SKIP_LINE_RE = re.compile(r"^(QR|Token):")
+
+
+def _digest(message: Dict) -> str:
+    """
+    One extractive summary line for a compacted message: its first
+    sentence plus the restaurants it named (replies bold them).
+    """
+    lines = [l for l in message["content"].splitlines() if l.strip() and not _SKIP_LINE_RE.match(l.strip())]
+    text = " ".join(" ".join(lines).split())
+    first = _SENTENCE_RE.split(text, 1)[0]
+    if len(first) > DIGEST_CHARS:
+        first = first[:DIGEST_CHARS].rsplit(" ", 1)[0] + "…"
+    line = f"{'User' if message['role'] == 'user' else 'Assistant'}: {first}"
+
+    names = list(dict.fromkeys(n.strip() for n in _BOLD_RE.findall(text)))
+    if names and message["role"] == "assistant":
+        line += f" (mentioned: {', '.join(names[:6])})"
+    return line
+
+
+# =========================================
+# History manager
+# =========================================
+class HistoryManager:
+    """
+    Keeps each conversation within a token budget instead of a fixed
+    message count.
+
+    A conversation is stored as one dict:
+        {
+            "messages": [...],          # verbatim recent messages
+            "tokens": [...],            # their token counts (counted once)
+            "summary": [[line, tokens]], # running summary of older turns
+            "raw_tokens": int,          # tokens of every message ever added
+        }
+
+    When the verbatim messages exceed `budget` tokens the oldest ones are
+    folded into the summary, one digest line each, so the summary is
+    updated incrementally on write and never rebuilt per request. The
+    summary itself is capped at `summary_budget` tokens (oldest lines
+    dropped first).
+    """
+
+    def __init__(
+        self,
+        store: SessionStore,
+        budget: int = HISTORY_TOKEN_BUDGET,
+        summary_budget: int = HISTORY_SUMMARY_TOKENS,
+    ):
+        self.store = store
+        self.budget = budget
+        self.summary_budget = summary_budget
+
+    @staticmethod
+    def new() -> Dict:
+        return {"messages": [], "tokens": [], "summary": [], "raw_tokens": 0}
+
+    def load(self, key) -> Dict:
+        return self.store.get(key) or self.new()
+
+    def append(self, conv: Dict, role: str, content: str) -> Dict:
+        tokens = MESSAGE_OVERHEAD + count_tokens(content)
+        conv["messages"].append({"role": role, "content": content})
+        conv["tokens"].append(tokens)
+        conv["raw_tokens"] += tokens
+        return conv
+
+    def compact(self, conv: Dict) -> int:
+        """Folds the oldest messages into the summary until the budget holds."""
+        folded = 0
+        while sum(conv["tokens"]) > self.budget and len(conv["messages"]) > HISTORY_MIN_MESSAGES:
+            message = conv["messages"].pop(0)
+            conv["tokens"].pop(0)
+            line = _digest(message)
+            conv["summary"].append([line, count_tokens(line) + 1])
+            folded += 1
+
+        summary = conv["summary"]
+        while summary and sum(t for _, t in summary) > self.summary_budget:
+            summary.pop(0)
+        return folded
+
+    def save(self, key, conv: Dict) -> Dict:
+        self.compact(conv)
+        return self.store.set(key, conv)
+
+    def prompt_messages(self, conv: Dict) -> List[Dict]:
+        """Summary (as one system message) followed by the verbatim messages."""
+        if not conv["summary"]:
+            return list(conv["messages"])
+        summary = "Earlier in this conversation:\n" + "\n".join(line for line, _ in conv["summary"])
+        return [{"role": "system", "content": summary}] + conv["messages"]
+
+    def usage(self, conv: Dict) -> Dict[str, int]:
+        """History tokens without compaction vs. what is actually sent."""
+        summary_tokens = sum(t for _, t in conv["summary"])
+        return {
+            "tokens_before": conv["raw_tokens"],
+            "tokens_after": sum(conv["tokens"]) + (summary_tokens + MESSAGE_OVERHEAD if summary_tokens else 0),
+            "messages": len(conv["messages"]),
+            "summary_lines": len(conv["summary"]),
+        }
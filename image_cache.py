@@ -0,0 +1,155 @@
+import io
+import os
+import base64
+import hashlib
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from prompt import IMAGE_DESCRIPTION_PROMPT
+from session_store import MemorySessionStore
+
+# -----------------------------------------
+# Vision cache settings (override via .env)
+# -----------------------------------------
+VISION_CACHE_ENABLED = os.getenv("VISION_CACHE", "1") == "1"
+VISION_CACHE_TTL = float(os.getenv("VISION_CACHE_TTL", str(24 * 3600)))
+VISION_CACHE_MAX_ENTRIES = int(os.getenv("VISION_CACHE_MAX_ENTRIES", "1000"))
+# Max differing dHash bits for two uploads to count as the same picture
+# (re-compressed, resized or slightly re-cropped photos). -1 (default):
+# exact re-uploads only. A 64-bit dHash only sees layout, so different
+# text-heavy menus with the same layout hash within a bit or two of each
+# other; enable this only for photo-style uploads.
+VISION_HASH_DISTANCE = int(os.getenv("VISION_HASH_DISTANCE", "-1"))
+MAX_DESCRIPTION_CHARS = 1500
+DESCRIPTION_MAX_TOKENS = 600
+
+Fingerprint = Tuple[str, Optional[int]]  # (sha256 hex, 64-bit dHash or None)
+
+
+def perceptual_hash(data: bytes) -> int:
+    """64-bit difference hash: brightness gradients of a 9x8 grayscale thumbnail."""
+    with Image.open(io.BytesIO(data)) as img:
+        img.draft("L", (64, 64))
+        small = img.convert("L").resize((9, 8), Image.BILINEAR)
+        pixels = list(small.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+def image_fingerprint(data: bytes) -> Fingerprint:
+    """
+    CPU-bound (decodes the image): call it from a worker thread.
+    Files PIL cannot read (PDF menus in the UI) get exact matching only.
+    """
+    try:
+        phash = perceptual_hash(data)
+    except (OSError, Image.DecompressionBombError):
+        phash = None
+    return hashlib.sha256(data).hexdigest(), phash
+
+
+# =========================================
+# Vision-result cache
+# =========================================
+class VisionCache:
+    """
+    Maps an uploaded image to a neutral description of it (one dedicated
+    describe call, see description_messages), so repeated questions about
+    the same image are answered from text.
+
+    A first upload is answered with the image inline and only recorded as
+    seen (seen_before); the describe call is made once the same file comes
+    back, so one-off uploads never pay for a second call.
+
+    Exact re-uploads match on the content hash; near-duplicates match when
+    their perceptual hashes differ by at most VISION_HASH_DISTANCE bits
+    (off by default).
+    Bounded LRU + TTL (entries evicted from the store also leave the
+    perceptual index on the next lookup).
+    """
+
+    def __init__(self, ttl: float = VISION_CACHE_TTL, max_entries: int = VISION_CACHE_MAX_ENTRIES):
+        self._store = MemorySessionStore("vision_cache", ttl=ttl, max_entries=max_entries)
+        self._seen = MemorySessionStore("vision_seen", ttl=ttl, max_entries=max_entries)
+        self._phashes: Dict[str, int] = {}  # sha256 -> dHash
+        self._lock = threading.Lock()
+        self.stats = {"hits_exact": 0, "hits_similar": 0, "misses": 0}
+
+    def get(self, fingerprint: Fingerprint) -> Optional[str]:
+        sha, phash = fingerprint
+        description = self._store.get(sha)
+        if description is not None:
+            self.stats["hits_exact"] += 1
+            return description
+        if phash is None or VISION_HASH_DISTANCE < 0:
+            self.stats["misses"] += 1
+            return None
+
+        with self._lock:
+            candidates = list(self._phashes.items())
+        for other_sha, other_phash in candidates:
+            if other_phash is None or bin(phash ^ other_phash).count("1") > VISION_HASH_DISTANCE:
+                continue
+            description = self._store.get(other_sha)
+            if description is None:
+                with self._lock:
+                    self._phashes.pop(other_sha, None)  # evicted from the store
+                continue
+            self.stats["hits_similar"] += 1
+            return description
+
+        self.stats["misses"] += 1
+        return None
+
+    def seen_before(self, fingerprint: Fingerprint) -> bool:
+        """Records an upload; True when the same file was uploaded before (within the TTL)."""
+        sha = fingerprint[0]
+        seen = self._seen.get(sha) is not None
+        self._seen.set(sha, True)
+        return seen
+
+    def put(self, fingerprint: Fingerprint, description: str):
+        sha, phash = fingerprint
+        self._store.set(sha, description[:MAX_DESCRIPTION_CHARS])
+        with self._lock:
+            self._phashes[sha] = phash
+            if len(self._phashes) > 2 * self._store.max_entries:
+                # Drop index entries whose image left the store
+                self._phashes = {k: v for k, v in self._phashes.items() if k in self._store}
+
+    def metrics(self) -> Dict[str, float]:
+        hits = self.stats["hits_exact"] + self.stats["hits_similar"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._store),
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def description_messages(data: bytes, mime_type: str) -> List[Dict]:
+    """Request for the question-independent description the cache stores."""
+    b64 = base64.b64encode(data).decode()
+    return [
+        {"role": "system", "content": IMAGE_DESCRIPTION_PROMPT.text},
+        {"role": "user", "content": [
+            {"type": "text", "text": "Describe this upload."},
+            {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{b64}"}},
+        ]},
+    ]
+
+
+def description_context(description: str) -> str:
+    """How a cached description is handed to the answering model."""
+    return f"[Uploaded image, as described by the vision model: {description}]"
+
+
+# Shared by the FastAPI path (chatbot.py) and the Streamlit UI (UI.py)
+vision_cache = VisionCache()
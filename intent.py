@@ -0,0 +1,159 @@
+import re
+import math
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# ===============================
+# Intent categories (mirror INTENT_PROMPT)
+# ===============================
+INTENTS = [
+    "general_chat",
+    "restaurant_discovery",
+    "item_question",
+    "promo_inquiry",
+    "promo_selection",
+    "promo_confirmation",
+    "promo_decline",
+]
+
+# Confidence needed before the lexical model may skip the LLM
+LOCAL_INTENT_THRESHOLD = 0.8
+
+# ===============================
+# Rules for obvious short replies
+# ===============================
+_YES = {
+    "yes", "yep", "yeah", "yup", "sure", "ok", "okay", "claim", "down", "generate",
+    "let's go", "let’s go", "go", "g", "please", "yes please", "sure please",
+    "go ahead", "do it", "sounds good", "absolutely", "of course",
+}
+_NO = {
+    "no", "nope", "nah", "no thanks", "no thank you", "not now", "later",
+    "maybe later", "skip", "pass", "not interested", "no need",
+}
+_GREETINGS = {"hi", "hello", "hey", "sup", "yo", "good morning", "good evening", "thanks", "thank you"}
+
+# Words in the assistant's last turn that mean it asked for promo consent
+_OFFER_CUES = ("qr", "offer", "promo", "discount", "redeem", "% off")
+
+# ===============================
+# Seed phrases for the lexical model
+# ===============================
+_SEEDS: Dict[str, List[str]] = {
+    "general_chat": [
+        "how are you", "who are you", "what can you do", "thanks for the help",
+        "tell me a joke", "what is choosie",
+    ],
+    "restaurant_discovery": [
+        "filipino food", "japanese restaurant", "romantic dinner in makati",
+        "cozy italian place", "where to eat in bgc", "recommend a restaurant",
+        "korean bbq near me", "any good thai spots", "something casual for dinner",
+        "best sushi in alabang", "group hangout restaurant",
+    ],
+    "item_question": [
+        "how much is the pizza", "do they have ice cream", "price of the pasta",
+        "is the tiramisu available", "what is on the menu", "do they serve dessert",
+    ],
+    "promo_inquiry": [
+        "any deals", "any promos", "is there a discount", "any offers today",
+        "can i get a discount", "what promos are available", "any good deals",
+    ],
+    "promo_selection": [
+        "i'll take the pasta", "the first one", "i choose the ice cream",
+        "i want the pizza offer", "the second option", "let me get the pasta deal",
+    ],
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9%']+")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(_TOKEN_RE.findall((text or "").lower().replace("’", "'")))
+
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN_RE.findall(_normalize(text))
+
+
+# ===============================
+# Multinomial naive Bayes over the seeds
+# ===============================
+class LexicalIntentModel:
+    def __init__(self, seeds: Dict[str, List[str]]):
+        self.labels = list(seeds)
+        self.word_counts = {label: Counter() for label in self.labels}
+        self.totals = {}
+        vocab = set()
+        for label, phrases in seeds.items():
+            for phrase in phrases:
+                toks = _tokens(phrase)
+                self.word_counts[label].update(toks)
+                vocab.update(toks)
+            self.totals[label] = sum(self.word_counts[label].values())
+        self.vocab_size = len(vocab)
+        self.vocab = vocab
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        toks = [t for t in _tokens(text) if t in self.vocab]
+        if not toks:
+            return "general_chat", 0.0
+
+        scores = {}
+        for label in self.labels:
+            denom = self.totals[label] + self.vocab_size
+            scores[label] = sum(math.log((self.word_counts[label][t] + 1) / denom) for t in toks)
+
+        best = max(scores, key=scores.get)
+        # Softmax over log-likelihoods -> posterior with a uniform prior
+        top = scores[best]
+        norm = sum(math.exp(s - top) for s in scores.values())
+        return best, 1.0 / norm
+
+
+_model = LexicalIntentModel(_SEEDS)
+
+
+def classify_local(message: str, history: Optional[List[dict]] = None) -> Optional[str]:
+    """
+    Cheap local intent pre-classifier.
+
+    Returns an intent when the message is obvious (short yes/no after an
+    offer, greetings, confident lexical match) or None to defer to the LLM.
+    """
+    text = _normalize(message)
+    if not text:
+        return "general_chat"
+
+    last_assistant = ""
+    for msg in reversed(history or []):
+        if msg.get("role") == "assistant":
+            last_assistant = (msg.get("content") or "").lower()
+            break
+    offered = any(cue in last_assistant for cue in _OFFER_CUES)
+
+    if text in _YES:
+        return "promo_confirmation" if offered else None
+    if text in _NO:
+        return "promo_decline" if offered else "general_chat"
+    if text in _GREETINGS:
+        return "general_chat"
+
+    label, confidence = _model.predict(text)
+    if confidence >= LOCAL_INTENT_THRESHOLD and label != "promo_selection":
+        # Selections depend on the offered list, leave those to the LLM
+        return label
+    return None
+
+
+def is_yes(message: str) -> bool:
+    return _normalize(message) in _YES
+
+
+def is_no(message: str) -> bool:
+    return _normalize(message) in _NO
+
+
+def parse_intent(label: str) -> str:
+    """Maps a model-produced label onto a known intent (default general_chat)."""
+    label = (label or "").strip().strip('"').lower()
+    return label if label in INTENTS else "general_chat"
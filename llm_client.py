@@ -0,0 +1,393 @@
+import os
+import base64
+import asyncio
+import random
+import time
+import threading
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+
+# -----------------------------------------
+# Backend settings (override via .env)
+# -----------------------------------------
+# "openai" | "fake" | "faulty". The offline kinds ("fake", "faulty") stand in
+# for every provider; otherwise each provider gets its own backend.
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+OFFLINE_BACKENDS = ("fake", "faulty")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_FAKE_LATENCY_MS = float(os.getenv("LLM_FAKE_LATENCY_MS", "300"))
+LLM_FAULT_ERROR_RATE = float(os.getenv("LLM_FAULT_ERROR_RATE", "0.3"))  # "faulty" backend only
+LLM_FAULT_HANG_RATE = float(os.getenv("LLM_FAULT_HANG_RATE", "0.1"))
+
+
+# =========================================
+# Base backend
+# =========================================
+class CompletionBackend:
+    """
+    Async chat-completion backend.
+
+    Every call goes through a shared semaphore (concurrency limit) and
+    a per-request timeout, so one slow completion can never hold the
+    event loop or starve the other sessions on the worker.
+
+    Messages use the OpenAI chat format (image parts as data URLs);
+    `json_mode` asks for a JSON object, and a `usage` dict, when given,
+    receives the provider's prompt_tokens / completion_tokens.
+    """
+
+    name = "base"
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, timeout: float = LLM_TIMEOUT):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def complete(
+        self,
+        messages: List[Dict],
+        model: str,
+        temperature: float = 0.7,
+        max_tokens: int = 800,
+        timeout: Optional[float] = None,
+        json_mode: bool = False,
+        usage: Optional[Dict] = None,
+    ) -> str:
+        timeout = timeout or self.timeout
+        async with self._semaphore:
+            return await asyncio.wait_for(
+                self._complete(messages, model, temperature, max_tokens, timeout, json_mode, usage),
+                timeout=timeout,
+            )
+
+    async def stream(
+        self,
+        messages: List[Dict],
+        model: str,
+        temperature: float = 0.7,
+        max_tokens: int = 800,
+        timeout: Optional[float] = None,
+        usage: Optional[Dict] = None,
+    ) -> AsyncIterator[str]:
+        """Yields completion text chunks; the timeout covers the whole stream."""
+        timeout = timeout or self.timeout
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            deadline = loop.time() + timeout
+            chunks = self._stream(messages, model, temperature, max_tokens, timeout, usage).__aiter__()
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=remaining)
+                except StopAsyncIteration:
+                    break
+                if chunk:
+                    yield chunk
+
+    async def _complete(self, messages, model, temperature, max_tokens, timeout, json_mode, usage) -> str:
+        raise NotImplementedError
+
+    async def _stream(self, messages, model, temperature, max_tokens, timeout, usage) -> AsyncIterator[str]:
+        # Backends without native streaming emit the full reply as one chunk
+        yield await self._complete(messages, model, temperature, max_tokens, timeout, False, usage)
+
+    async def aclose(self):
+        pass
+
+
+# =========================================
+# OpenAI backend (pooled HTTP client)
+# =========================================
+class OpenAIBackend(CompletionBackend):
+    name = "openai"
+
+    def __init__(self, api_key: Optional[str] = None, **kwargs):
+        super().__init__(**kwargs)
+        from openai import AsyncOpenAI
+
+        # One pooled HTTP client per process; keep-alive connections are reused
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+            ),
+            timeout=self.timeout,
+        )
+        self._client = AsyncOpenAI(
+            api_key=api_key or os.getenv("OPENAI_API_KEY"),
+            http_client=self._http,
+            max_retries=0,  # retried by llm_gateway, within the request deadline
+        )
+
+    async def _complete(self, messages, model, temperature, max_tokens, timeout, json_mode, usage) -> str:
+        resp = await self._client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=timeout,
+            **({"response_format": {"type": "json_object"}} if json_mode else {}),
+        )
+        if usage is not None and resp.usage:
+            usage.update(prompt_tokens=resp.usage.prompt_tokens, completion_tokens=resp.usage.completion_tokens)
+        return (resp.choices[0].message.content or "").strip()
+
+    async def _stream(self, messages, model, temperature, max_tokens, timeout, usage) -> AsyncIterator[str]:
+        stream = await self._client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=timeout,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        async for event in stream:
+            if usage is not None and event.usage:
+                usage.update(prompt_tokens=event.usage.prompt_tokens, completion_tokens=event.usage.completion_tokens)
+            if event.choices and event.choices[0].delta.content:
+                yield event.choices[0].delta.content
+
+    async def aclose(self):
+        await self._http.aclose()
+
+
+# =========================================
+# Gemini backend (google-generativeai)
+# =========================================
+class GeminiBackend(CompletionBackend):
+    """
+    Gemini through google-generativeai's async API. OpenAI-style messages
+    are translated: system messages become the system instruction,
+    assistant turns the "model" role, image data URLs inline blobs and
+    {"type": "file", "file": ...} parts (genai.upload_file) are passed as-is.
+    """
+
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str] = None, **kwargs):
+        super().__init__(**kwargs)
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key or os.getenv("GEMINI_API_KEY"))
+        self._genai = genai
+
+    @staticmethod
+    def _parts(content) -> List:
+        if isinstance(content, str):
+            return [content]
+        parts = []
+        for part in content:
+            if part.get("type") == "text":
+                parts.append(part["text"])
+            elif part.get("type") == "image_url":
+                header, _, data = part["image_url"]["url"].partition(",")
+                mime_type = header[len("data:"):].split(";")[0]
+                parts.append({"mime_type": mime_type, "data": base64.b64decode(data)})
+            elif part.get("type") == "file":
+                parts.append(part["file"])
+        return parts
+
+    def _request(self, messages, model, temperature, max_tokens, json_mode):
+        system = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+        contents = [
+            {"role": "model" if m["role"] == "assistant" else "user", "parts": self._parts(m["content"])}
+            for m in messages if m["role"] != "system"
+        ]
+        client = self._genai.GenerativeModel(model, system_instruction=system or None)
+        config = {"temperature": temperature, "max_output_tokens": max_tokens}
+        if json_mode:
+            config["response_mime_type"] = "application/json"
+        return client, contents, config
+
+    @staticmethod
+    def _record_usage(resp, usage):
+        meta = getattr(resp, "usage_metadata", None)
+        if usage is not None and meta:
+            usage.update(prompt_tokens=meta.prompt_token_count, completion_tokens=meta.candidates_token_count)
+
+    async def _complete(self, messages, model, temperature, max_tokens, timeout, json_mode, usage) -> str:
+        client, contents, config = self._request(messages, model, temperature, max_tokens, json_mode)
+        resp = await client.generate_content_async(
+            contents, generation_config=config, request_options={"timeout": timeout}
+        )
+        self._record_usage(resp, usage)
+        return (resp.text or "").strip()
+
+    async def _stream(self, messages, model, temperature, max_tokens, timeout, usage) -> AsyncIterator[str]:
+        client, contents, config = self._request(messages, model, temperature, max_tokens, False)
+        resp = await client.generate_content_async(
+            contents, generation_config=config, request_options={"timeout": timeout}, stream=True
+        )
+        async for chunk in resp:
+            self._record_usage(chunk, usage)
+            if chunk.text:
+                yield chunk.text
+
+
+# =========================================
+# Local fake backend (offline benchmarks)
+# =========================================
+class FakeBackend(CompletionBackend):
+    """
+    Deterministic local backend with a configurable latency.
+
+    `blocking=True` sleeps synchronously, which reproduces the old
+    behaviour of calling a sync client inside an `async def` route.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency_ms: float = LLM_FAKE_LATENCY_MS, blocking: bool = False, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency_ms / 1000.0
+        self.blocking = blocking
+        self.calls = 0
+
+    def _reply_for(self, messages: List[Dict]) -> str:
+        last = messages[-1]["content"] if messages else ""
+        if isinstance(last, list):  # vision content block
+            last = " ".join(p.get("text", "") for p in last if p.get("type") == "text")
+        if any(k in last.lower() for k in ("deal", "promo", "offer", "discount")):
+            # Lets offline runs exercise the pending-offer / QR confirmation flow
+            return (f"You've unlocked a special offer for your taste (re: {last[:60]})! "
+                    "Would you like me to generate the QR code?")
+        return f"Here are a few places for your next food adventure! (re: {last[:60]})"
+
+    async def _complete(self, messages, model, temperature, max_tokens, timeout, json_mode, usage) -> str:
+        self.calls += 1
+        if self.blocking:
+            time.sleep(self.latency)
+        else:
+            await asyncio.sleep(self.latency)
+        return self._reply_for(messages)
+
+    async def _stream(self, messages, model, temperature, max_tokens, timeout, usage) -> AsyncIterator[str]:
+        # First token after ~30% of the latency, the rest spread evenly
+        self.calls += 1
+        words = self._reply_for(messages).split(" ")
+        await asyncio.sleep(self.latency * 0.3)
+        step = self.latency * 0.7 / max(len(words), 1)
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(step)
+            yield word if i == 0 else " " + word
+
+
+class UpstreamError(Exception):
+    """Injected provider failure (carries an HTTP status like the SDK errors do)."""
+
+    def __init__(self, status_code: int = 503):
+        super().__init__(f"injected upstream error ({status_code})")
+        self.status_code = status_code
+
+
+class FaultInjectingBackend(FakeBackend):
+    """
+    FakeBackend that fails on purpose: with probability `error_rate` a
+    call raises UpstreamError(503), with `hang_rate` it never answers
+    (only the caller's timeout ends it). `outage=True` fails every call.
+    Seeded, so gateway runs are reproducible.
+    """
+
+    name = "faulty"
+
+    def __init__(self, error_rate: float = LLM_FAULT_ERROR_RATE, hang_rate: float = LLM_FAULT_HANG_RATE,
+                 seed: int = 0, **kwargs):
+        super().__init__(**kwargs)
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.outage = False
+        self.faults = 0
+        self._rng = random.Random(seed)
+
+    async def _inject(self):
+        roll = self._rng.random()
+        if self.outage or roll < self.error_rate:
+            self.faults += 1
+            await asyncio.sleep(self.latency * 0.1)
+            raise UpstreamError(503)
+        if roll < self.error_rate + self.hang_rate:
+            self.faults += 1
+            await asyncio.Event().wait()
+
+    async def _complete(self, messages, model, temperature, max_tokens, timeout, json_mode, usage) -> str:
+        await self._inject()
+        return await super()._complete(messages, model, temperature, max_tokens, timeout, json_mode, usage)
+
+    async def _stream(self, messages, model, temperature, max_tokens, timeout, usage) -> AsyncIterator[str]:
+        await self._inject()
+        async for chunk in super()._stream(messages, model, temperature, max_tokens, timeout, usage):
+            yield chunk
+
+
+# -----------------------------------------
+# Process-wide backends (one per provider)
+# -----------------------------------------
+_backends: Dict[str, CompletionBackend] = {}
+_override: Optional[CompletionBackend] = None
+_backends_lock = threading.Lock()
+
+
+def create_backend(kind: str = LLM_BACKEND, **kwargs) -> CompletionBackend:
+    if kind == "fake":
+        return FakeBackend(**kwargs)
+    if kind == "faulty":
+        return FaultInjectingBackend(**kwargs)
+    if kind == "openai":
+        return OpenAIBackend(**kwargs)
+    if kind == "gemini":
+        return GeminiBackend(**kwargs)
+    raise ValueError(f"Unknown LLM backend: {kind}")
+
+
+def get_backend(provider: Optional[str] = None) -> CompletionBackend:
+    """
+    Backend for `provider` (default: LLM_BACKEND). With an offline
+    LLM_BACKEND, or after set_backend(), every provider shares that one.
+    """
+    if _override is not None:
+        return _override
+    kind = LLM_BACKEND if provider is None or LLM_BACKEND in OFFLINE_BACKENDS else provider
+    backend = _backends.get(kind)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(kind)
+            if backend is None:
+                backend = _backends[kind] = create_backend(kind)
+    return backend
+
+
+def set_backend(backend: CompletionBackend):
+    """Swap the backend of every provider (benchmarks, local runs)."""
+    global _override
+    _override = backend
+
+
+async def close_backends():
+    for backend in {*_backends.values(), *([_override] if _override else [])}:
+        await backend.aclose()
+
+
+# -----------------------------------------
+# Sync bridge (bot.py, UI.py)
+# -----------------------------------------
+_sync_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def run_sync(coro):
+    """
+    Runs a backend coroutine from synchronous code on one long-lived
+    background loop, so pooled clients (and the semaphore) are created
+    once instead of per call.
+    """
+    global _sync_loop
+    with _backends_lock:
+        if _sync_loop is None:
+            _sync_loop = asyncio.new_event_loop()
+            threading.Thread(target=_sync_loop.run_forever, name="llm-sync-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _sync_loop).result()
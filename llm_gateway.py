@@ -0,0 +1,393 @@
+import os
+import time
+import random
+import asyncio
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import AsyncIterator, Callable, Dict, List, NamedTuple, Optional
+
+import metrics
+
+# -----------------------------------------
+# Gateway settings (override via .env)
+# -----------------------------------------
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "20"))             # seconds per user request, all attempts included
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))                  # extra attempts after the first
+LLM_RETRY_BASE_MS = float(os.getenv("LLM_RETRY_BASE_MS", "200"))
+LLM_RETRY_MAX_MS = float(os.getenv("LLM_RETRY_MAX_MS", "2000"))
+LLM_BREAKER_WINDOW = int(os.getenv("LLM_BREAKER_WINDOW", "20"))       # most recent attempts considered
+LLM_BREAKER_FAILURE_RATIO = float(os.getenv("LLM_BREAKER_FAILURE_RATIO", "0.5"))  # failing share that opens it
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))  # seconds open before one probe
+LLM_GATEWAY_LOG = os.getenv("LLM_GATEWAY_LOG", "0") == "1"  # 1: also print every failed attempt
+
+FALLBACK_INTRO = (
+    "My recommendation engine is taking a breather right now, "
+    "but here are some spots from our list you might like:\n"
+)
+FALLBACK_EMPTY = "My recommendation engine is taking a breather right now. Please try again in a moment!"
+
+
+class Completion(NamedTuple):
+    text: str
+    source: str    # "llm" | "fallback"
+    attempts: int  # upstream attempts made (0 when the breaker was open)
+
+
+# =========================================
+# Deadlines
+# =========================================
+class Deadline:
+    """Absolute point in time (monotonic clock) by which a request must answer."""
+
+    __slots__ = ("expires",)
+
+    def __init__(self, seconds: float):
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+_deadline: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("choosie_deadline", default=None)
+
+
+@contextmanager
+def request_deadline(seconds: float = LLM_DEADLINE):
+    """
+    Sets the deadline of the current request; gateway calls made inside
+    it (however deeply nested) never wait past it. A nested block can
+    only shorten an outer deadline, never extend it.
+    """
+    outer = _deadline.get()
+    deadline = Deadline(seconds)
+    if outer is not None and outer.expires < deadline.expires:
+        deadline = outer
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+def current_deadline() -> Deadline:
+    return _deadline.get() or Deadline(LLM_DEADLINE)
+
+
+# =========================================
+# Circuit breaker
+# =========================================
+class CircuitBreaker:
+    """
+    closed -> open once at least `ratio` of the last `window` attempts failed
+    (judged after window/2 attempts); open -> half-open after `cooldown` seconds, where a single probe call decides whether
+    it closes again or reopens (a probe that never reports back, e.g. a
+    cancelled request, is replaced after another cooldown). Thread-safe:
+    bot.py / UI.py call from threads.
+    """
+
+    def __init__(self, name: str, window: int = LLM_BREAKER_WINDOW,
+                 ratio: float = LLM_BREAKER_FAILURE_RATIO, cooldown: float = LLM_BREAKER_COOLDOWN):
+        self.name = name
+        self.ratio = ratio
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.recent = deque(maxlen=window)  # True = failed attempt
+        self.opened_at = 0.0
+        self._probe_started = None
+        self._lock = threading.Lock()
+        metrics.gauge("choosie_llm_breaker_open", lambda: 0 if self.state == "closed" else 1,
+                      "1 while the provider circuit breaker is open or half-open", provider=name)
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            now = time.monotonic()
+            if self.state == "open" and now - self.opened_at >= self.cooldown:
+                self.state = "half_open"
+                self._probe_started = None
+            if self.state == "half_open" and (
+                self._probe_started is None or now - self._probe_started >= self.cooldown
+            ):
+                self._probe_started = now
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            if self.state != "closed":
+                self.recent.clear()  # the probe went through: judge the provider afresh
+            self.state = "closed"
+            self.recent.append(False)
+            self._probe_started = None
+
+    def failure(self):
+        with self._lock:
+            self.recent.append(True)
+            failed = sum(self.recent)
+            tripped = len(self.recent) * 2 >= self.recent.maxlen and failed >= self.ratio * len(self.recent)
+            if self.state == "half_open" or (self.state == "closed" and tripped):
+                if self.state == "closed":
+                    print(f"[llm_gateway] circuit for {self.name} opened ({failed}/{len(self.recent)} attempts failed)")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._probe_started = None
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    """One breaker per provider, shared by every gateway that calls it."""
+    with _breakers_lock:
+        breaker = _breakers.get(provider)
+        if breaker is None:
+            breaker = _breakers[provider] = CircuitBreaker(provider)
+        return breaker
+
+
+# =========================================
+# Retry policy
+# =========================================
+# SDK transport errors, matched by class name so the SDKs stay optional:
+# openai (APIConnectionError / APITimeoutError), httpx (TransportError and
+# its timeouts), requests and google.api_core
+TRANSIENT_ERROR_NAMES = {
+    "APIConnectionError", "APITimeoutError", "TransportError", "TimeoutException",
+    "ConnectionError", "Timeout", "DeadlineExceeded", "ServiceUnavailable",
+}
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    for status in (getattr(exc, "status_code", None),
+                   getattr(getattr(exc, "response", None), "status_code", None),
+                   getattr(exc, "code", None)):  # google.api_core errors
+        if isinstance(status, int):
+            return status
+    return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    Timeouts, connection errors, 408/429 and 5xx. Anything else (bad
+    requests, auth, content filters, bugs) would fail the same way again.
+    """
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    if any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(exc).__mro__):
+        return True
+    status = _status_code(exc)
+    return status is not None and (status in (408, 429) or status >= 500)
+
+
+def attempt_timeout(timeout: Optional[float], deadline: Deadline) -> float:
+    """
+    Budget of one attempt: the backend's own timeout (LLM_TIMEOUT), cut to
+    what the request deadline has left. A hung call then fails after
+    LLM_TIMEOUT and leaves room for a retry instead of eating the deadline.
+    """
+    remaining = deadline.remaining()
+    return min(timeout, remaining) if timeout else remaining
+
+
+def backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff, in seconds."""
+    cap = min(LLM_RETRY_MAX_MS, LLM_RETRY_BASE_MS * (2 ** attempt))
+    return random.uniform(0, cap) / 1000.0
+
+
+# =========================================
+# Local fallback reply
+# =========================================
+def last_user_text(messages: List[Dict]) -> str:
+    for m in reversed(messages):
+        if m.get("role") == "user":
+            content = m.get("content") or ""
+            if isinstance(content, list):  # vision content block
+                content = " ".join(p.get("text", "") for p in content if p.get("type") == "text")
+            return content
+    return ""
+
+
+def fallback_reply(query: str, k: int = 3) -> str:
+    """Template answer from the local catalog index: no model call involved."""
+    from search_index import get_restaurant_index
+
+    index = get_restaurant_index()
+    picks = [r for r, _ in index.search(query, k=k)] if query else []
+    if not picks:
+        from catalog import get_catalog
+        picks = list(get_catalog().current().restaurants[:k])
+    if not picks:
+        return FALLBACK_EMPTY
+    lines = [f"• **{r['name']}** — {r.get('description', '')} ({r.get('category', '')})\n  {r.get('address', '')}"
+             for r in picks]
+    return FALLBACK_INTRO + "\n".join(lines)
+
+
+def _record(provider: str, outcome: str):
+    metrics.inc("choosie_llm_gateway_total", help_text="LLM gateway calls by outcome", provider=provider, outcome=outcome)
+
+
+def _attempt_failed(provider: str, attempt: int, exc: BaseException, kind: str = "attempt"):
+    error = type(exc).__name__
+    metrics.inc("choosie_llm_attempt_failures_total", help_text="Failed LLM attempts by error type",
+                provider=provider, error=error)
+    if LLM_GATEWAY_LOG:
+        print(f"[llm_gateway] {provider} {kind} {attempt} failed: {error}: {exc}")
+
+
+# =========================================
+# Async gateway (chatbot.py)
+# =========================================
+class LLMGateway:
+    """
+    Wraps a CompletionBackend with a request deadline, jittered retries
+    and the provider's circuit breaker. Never raises for provider
+    failures: when the breaker is open, or retries / the deadline run
+    out, it answers with `fallback_reply`, so latency stays bounded
+    during an outage.
+    """
+
+    def __init__(self, backend_factory: Callable, provider: Optional[str] = None, retries: int = LLM_RETRIES):
+        self._backend_factory = backend_factory
+        self._provider = provider
+        self.retries = retries
+
+    @property
+    def backend(self):
+        # Resolved per call: set_backend() swaps take effect immediately
+        return self._backend_factory()
+
+    @property
+    def breaker(self) -> CircuitBreaker:
+        return get_breaker(self._provider or self.backend.name)
+
+    async def complete(self, messages: List[Dict], model: str, fallback_query: Optional[str] = None,
+                       deadline: Optional[Deadline] = None, backend=None, **kwargs) -> Completion:
+        """`backend` overrides the gateway's own (model_router picks one per call)."""
+        backend = backend or self.backend
+        deadline = deadline or current_deadline()
+        breaker = get_breaker(self._provider or backend.name)
+        query = fallback_query if fallback_query is not None else last_user_text(messages)
+
+        attempts = 0
+        while not deadline.expired and breaker.allow():
+            attempts += 1
+            try:
+                timeout = attempt_timeout(backend.timeout, deadline)
+                text = await backend.complete(messages, model=model, timeout=timeout, **kwargs)
+                breaker.success()
+                _record(breaker.name, "ok" if attempts == 1 else "ok_after_retry")
+                return Completion(text, "llm", attempts)
+            except Exception as e:
+                breaker.failure()
+                _attempt_failed(breaker.name, attempts, e)
+                if attempts > self.retries or not is_retryable(e):
+                    break
+                pause = backoff(attempts - 1)
+                if pause >= deadline.remaining():
+                    break
+                await asyncio.sleep(pause)
+
+        _record(breaker.name, "fallback" if attempts else "skipped")
+        return Completion(await asyncio.to_thread(fallback_reply, query), "fallback", attempts)
+
+    async def stream(self, messages: List[Dict], model: str, fallback_query: Optional[str] = None,
+                     deadline: Optional[Deadline] = None, info: Optional[Dict] = None,
+                     backend=None, **kwargs) -> AsyncIterator[str]:
+        """
+        Streaming variant. Failures before the first chunk are retried like
+        `complete`; once text has been sent, an error ends the stream there
+        (re-sending would duplicate it). `info["source"]` is set to "llm",
+        "interrupted" or "fallback" for the caller.
+        """
+        info = info if info is not None else {}
+        info["source"] = "llm"
+        backend = backend or self.backend
+        deadline = deadline or current_deadline()
+        breaker = get_breaker(self._provider or backend.name)
+        query = fallback_query if fallback_query is not None else last_user_text(messages)
+
+        attempts = 0
+        while not deadline.expired and breaker.allow():
+            attempts += 1
+            sent = False
+            try:
+                timeout = attempt_timeout(backend.timeout, deadline)
+                async for chunk in backend.stream(messages, model=model, timeout=timeout, **kwargs):
+                    sent = True
+                    yield chunk
+                breaker.success()
+                _record(breaker.name, "ok" if attempts == 1 else "ok_after_retry")
+                return
+            except Exception as e:
+                breaker.failure()
+                _attempt_failed(breaker.name, attempts, e, "stream attempt")
+                if sent:
+                    _record(breaker.name, "interrupted")
+                    info["source"] = "interrupted"
+                    return
+                if attempts > self.retries or not is_retryable(e):
+                    break
+                pause = backoff(attempts - 1)
+                if pause >= deadline.remaining():
+                    break
+                await asyncio.sleep(pause)
+
+        _record(breaker.name, "fallback" if attempts else "skipped")
+        info["source"] = "fallback"
+        yield await asyncio.to_thread(fallback_reply, query)
+
+
+# =========================================
+# Sync gateway (bot.py, UI.py)
+# =========================================
+class SyncLLMGateway:
+    """
+    Blocking counterpart for SDK calls made from threads. `call` takes a
+    function of the per-attempt timeout (seconds) that returns the text;
+    `timeout` caps each attempt like the backend's own timeout does.
+    """
+
+    def __init__(self, provider: str, retries: int = LLM_RETRIES, timeout: Optional[float] = None):
+        self.provider = provider
+        self.retries = retries
+        self.timeout = timeout
+
+    @property
+    def breaker(self) -> CircuitBreaker:
+        return get_breaker(self.provider)
+
+    def call(self, fn: Callable[[float], str], fallback_query: str = "",
+             deadline: Optional[Deadline] = None, fallback: Optional[Callable[[str], str]] = None) -> Completion:
+        deadline = deadline or current_deadline()
+        breaker = self.breaker
+
+        attempts = 0
+        while not deadline.expired and breaker.allow():
+            attempts += 1
+            try:
+                text = fn(attempt_timeout(self.timeout, deadline))
+                breaker.success()
+                _record(breaker.name, "ok" if attempts == 1 else "ok_after_retry")
+                return Completion(text, "llm", attempts)
+            except Exception as e:
+                breaker.failure()
+                _attempt_failed(breaker.name, attempts, e)
+                if attempts > self.retries or not is_retryable(e):
+                    break
+                pause = backoff(attempts - 1)
+                if pause >= deadline.remaining():
+                    break
+                time.sleep(pause)
+
+        _record(breaker.name, "fallback" if attempts else "skipped")
+        return Completion((fallback or fallback_reply)(fallback_query), "fallback", attempts)
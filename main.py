@@ -1,9 +1,33 @@
-from fastapi import FastAPI, UploadFile, File, Form
-from chatbot import process_chat_file
+import asyncio
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+import metrics
+from chatbot import process_chat_file, stream_chat_file
+from file import prepare_uploaded_file
+from llm_client import close_backends
+from qr_code import MIME_TYPES, purge_qr_images, qr_image_path, qr_pool
+from redemption import promo_tokens, run_purger
+from vector_index import VECTOR_INDEX, get_vector_index
 
 app = FastAPI(title="Manila Food Chatbot API", version="2.0")
 
 
+@app.on_event("startup")
+async def startup():
+    await asyncio.to_thread(purge_qr_images)
+    qr_pool.start()
+    app.state.promo_purger = asyncio.create_task(run_purger())
+    if VECTOR_INDEX:
+        await asyncio.to_thread(get_vector_index)  # load (or build once) before the first query
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    app.state.promo_purger.cancel()
+    await qr_pool.stop()
+    await close_backends()
+
+
 @app.post("/chat")
 async def chat(
     session_id: str = Form(...),
@@ -11,3 +35,55 @@ async def chat(
     file: UploadFile = File(None)
 ):
     return await process_chat_file(session_id, message, file)
+
+
+@app.post("/chat/stream")
+async def chat_stream(
+    session_id: str = Form(...),
+    message: str = Form(""),
+    file: UploadFile = File(None)
+):
+    # Read the upload now: the form file is closed once this returns
+    uploaded = await prepare_uploaded_file(file) if file else None
+    return StreamingResponse(
+        stream_chat_file(session_id, message, file, uploaded),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/qr/{name}")
+async def qr_image(name: str):
+    path = qr_image_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="QR code not found")
+    # Content-addressed name: the bytes behind a URL never change
+    return FileResponse(
+        path,
+        media_type=MIME_TYPES[name.rsplit(".", 1)[1]],
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
+
+
+REDEEM_STATUS_CODES = {"success": 200, "valid": 200, "invalid": 404, "used": 409, "expired": 410}
+
+
+# Sync on purpose: FastAPI runs these in the threadpool, so SQLite waits never block the event loop.
+# GET only reports the status: link previewers and prefetchers that open the
+# QR URL must not burn the token. Redemption is POST-only.
+@app.get("/promo/redeem")
+def promo_status(token: str):
+    result = promo_tokens.status(token)
+    return JSONResponse(result, status_code=REDEEM_STATUS_CODES[result["status"]])
+
+
+@app.post("/promo/redeem")
+def promo_redeem(token: str):
+    result = promo_tokens.redeem(token)
+    return JSONResponse(result, status_code=REDEEM_STATUS_CODES[result["status"]])
+
+
+# Prometheus text exposition; empty when METRICS=0
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
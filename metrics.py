@@ -0,0 +1,201 @@
+import os
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, List, Optional, Tuple
+
+# -----------------------------------------
+# Metrics settings (override via .env)
+# -----------------------------------------
+METRICS_ENABLED = os.getenv("METRICS", "1") == "1"
+METRICS_LOG = os.getenv("METRICS_LOG", "0") == "1"  # print one timing line per request
+
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+_INF = 'le="+Inf"'
+
+
+def _key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt_labels(key: LabelKey, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+# =========================================
+# Registry
+# =========================================
+class Registry:
+    """
+    Counters, histograms and callback gauges, rendered in the Prometheus
+    text format. Gauges are computed at scrape time, so store sizes and
+    cache ratios cost nothing on the request path.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}  # name -> (type, help)
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, list]] = {}  # [bucket counts, sum, count]
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+        self._gauges: Dict[str, List[Tuple[LabelKey, Callable[[], float]]]] = {}
+
+    def _declare(self, name: str, kind: str, help_text: str):
+        if name not in self._help:
+            self._help[name] = (kind, help_text)
+
+    def inc(self, name: str, value: float = 1, help_text: str = "", **labels):
+        key = _key(labels)
+        with self._lock:
+            self._declare(name, "counter", help_text)
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, help_text: str = "", buckets=STAGE_BUCKETS, **labels):
+        key = _key(labels)
+        with self._lock:
+            self._declare(name, "histogram", help_text)
+            bounds = self._buckets.setdefault(name, tuple(buckets))
+            series = self._histograms.setdefault(name, {})
+            entry = series.get(key)
+            if entry is None:
+                entry = series[key] = [[0] * len(bounds), 0.0, 0]
+            idx = bisect.bisect_left(bounds, value)
+            if idx < len(bounds):
+                entry[0][idx] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def gauge(self, name: str, fn: Callable[[], float], help_text: str = "", **labels):
+        with self._lock:
+            self._declare(name, "gauge", help_text)
+            self._gauges.setdefault(name, []).append((_key(labels), fn))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            counters = {n: dict(s) for n, s in self._counters.items()}
+            histograms = {n: {k: (list(v[0]), v[1], v[2]) for k, v in s.items()} for n, s in self._histograms.items()}
+            gauges = {n: list(s) for n, s in self._gauges.items()}
+
+        for name, (kind, help_text) in sorted(self._help.items()):
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "counter":
+                for key, value in counters.get(name, {}).items():
+                    lines.append(f"{name}{_fmt_labels(key)} {value:g}")
+            elif kind == "histogram":
+                bounds = self._buckets[name]
+                for key, (counts, total, count) in histograms.get(name, {}).items():
+                    cumulative = 0
+                    for bound, n in zip(bounds, counts):
+                        cumulative += n
+                        le = 'le="%g"' % bound
+                        lines.append(f"{name}_bucket{_fmt_labels(key, le)} {cumulative}")
+                    lines.append(f"{name}_bucket{_fmt_labels(key, _INF)} {count}")
+                    lines.append(f"{name}_sum{_fmt_labels(key)} {total:.6f}")
+                    lines.append(f"{name}_count{_fmt_labels(key)} {count}")
+            else:
+                for key, fn in gauges.get(name, []):
+                    try:
+                        value = float(fn())
+                    except Exception:
+                        continue  # a broken gauge must not break the scrape
+                    lines.append(f"{name}{_fmt_labels(key)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+# =========================================
+# Per-request traces
+# =========================================
+class Trace:
+    """Stage timings of one request, in the order they ran."""
+
+    __slots__ = ("path", "started", "stages")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            **{stage: round(ms, 2) for stage, ms in self.stages.items()},
+            "total": round((time.perf_counter() - self.started) * 1000, 2),
+        }
+
+
+_current: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("choosie_trace", default=None)
+_NOOP = nullcontext()
+
+
+@contextmanager
+def _timed(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        trace = _current.get()
+        path = trace.path if trace else "-"
+        if trace is not None:
+            trace.stages[stage] = trace.stages.get(stage, 0.0) + elapsed * 1000
+        registry.observe("choosie_stage_seconds", elapsed, "Time spent per request stage", path=path, stage=stage)
+
+
+def span(stage: str):
+    """`with span("llm"):` times a stage of the current request (no-op when disabled)."""
+    return _timed(stage) if METRICS_ENABLED else _NOOP
+
+
+@contextmanager
+def _traced(path: str):
+    trace = Trace(path)
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+        summary = trace.summary()
+        registry.observe("choosie_request_seconds", summary["total"] / 1000, "End-to-end request time", path=path)
+        if METRICS_LOG:
+            print(f"[trace] {path} {summary}")
+
+
+def trace(path: str):
+    """Opens a request trace; spans inside it are attributed to `path`. Yields None when disabled."""
+    return _traced(path) if METRICS_ENABLED else _NOOP
+
+
+# -----------------------------------------
+# Shorthands (no-ops when disabled)
+# -----------------------------------------
+def inc(name: str, value: float = 1, help_text: str = "", **labels):
+    if METRICS_ENABLED:
+        registry.inc(name, value, help_text, **labels)
+
+
+def gauge(name: str, fn: Callable[[], float], help_text: str = "", **labels):
+    if METRICS_ENABLED:
+        registry.gauge(name, fn, help_text, **labels)
+
+
+def count_llm_tokens(path: str, prompt_tokens: int, completion_tokens: int):
+    if METRICS_ENABLED:
+        registry.inc("choosie_llm_tokens_total", prompt_tokens, "LLM tokens (local estimate)", path=path, kind="prompt")
+        registry.inc("choosie_llm_tokens_total", completion_tokens, "LLM tokens (local estimate)", path=path, kind="completion")
+
+
+def render() -> str:
+    return registry.render()
@@ -0,0 +1,149 @@
+import os
+import time
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
+
+import metrics
+from llm_client import get_backend, run_sync
+from llm_gateway import Completion, LLMGateway, SyncLLMGateway, last_user_text
+from tokens import count_message_tokens, count_tokens
+
+# -----------------------------------------
+# Routing settings (override via .env)
+# -----------------------------------------
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "1") == "1"  # 0: every call uses the router's default tier
+ROUTER_LOG = os.getenv("ROUTER_LOG", "0") == "1"  # 1: also print a line per model call (see /metrics)
+
+# Intents a small model answers as well as a big one
+FAST_INTENTS = {"general_chat", "promo_confirmation", "promo_decline"}
+
+# USD per 1M tokens (input, output); unknown models are logged at cost 0
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+}
+
+
+class Route(NamedTuple):
+    tier: str      # "fast" | "smart" | "vision"
+    provider: str  # llm_client backend kind
+    model: str
+    reason: str
+
+
+def parse_model(spec: str) -> Tuple[str, str]:
+    """"openai:gpt-4o" -> ("openai", "gpt-4o"); a bare model name means OpenAI."""
+    provider, sep, model = spec.partition(":")
+    return (provider, model) if sep else ("openai", spec)
+
+
+def tiers_from_env(prefix: str, **defaults: str) -> Dict[str, Tuple[str, str]]:
+    """{tier: (provider, model)}, each overridable as <PREFIX>_MODEL_<TIER>."""
+    return {
+        tier: parse_model(os.getenv(f"{prefix}_MODEL_{tier.upper()}", spec))
+        for tier, spec in defaults.items()
+    }
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    price_in, price_out = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * price_in + completion_tokens * price_out) / 1_000_000
+
+
+# =========================================
+# Router
+# =========================================
+class ModelRouter:
+    """
+    Picks provider + model per request from the turn's intent: FAST_INTENTS
+    go to the "fast" tier, image turns to "vision", everything else
+    (discovery, menu questions, promos, unknown intent) to "smart".
+
+    Calls go through the LLM gateway of the chosen provider (deadline,
+    retries, breaker, fallback). Each call logs the decision, latency and
+    an estimated cost, which is also exported on /metrics.
+    """
+
+    def __init__(self, name: str, tiers: Dict[str, Tuple[str, str]], default: str = "smart"):
+        self.name = name
+        self.tiers = tiers
+        self.default = default
+        self._gateway = LLMGateway(get_backend)
+
+    def route(self, intent: Optional[str] = None, has_image: bool = False, tier: Optional[str] = None) -> Route:
+        """`tier` forces a tier for calls that are not chat turns (e.g. intent classification)."""
+        if tier:
+            reason = "forced"
+        elif not MODEL_ROUTING:
+            tier, reason = self.default, "routing off"
+        elif has_image:
+            tier, reason = "vision", "image"
+        elif intent in FAST_INTENTS:
+            tier, reason = "fast", intent
+        else:
+            tier, reason = "smart", intent or "unknown intent"
+        provider, model = self.tiers[tier]
+        return Route(tier, provider, model, reason)
+
+    def signature(self) -> str:
+        """Changes whenever the routing table does (part of response-cache keys)."""
+        return "|".join(f"{t}={p}:{m}" for t, (p, m) in sorted(self.tiers.items())) + f"|routing={MODEL_ROUTING}"
+
+    def _record(self, route: Route, source: str, elapsed: float, messages: List[Dict], text: str, usage: Dict):
+        prompt_tokens = usage.get("prompt_tokens") or count_message_tokens(messages)
+        completion_tokens = usage.get("completion_tokens") or count_tokens(text)
+        cost = estimate_cost(route.model, prompt_tokens, completion_tokens) if source == "llm" else 0.0
+        if source == "llm":
+            metrics.count_llm_tokens(self.name, prompt_tokens, completion_tokens)
+        if metrics.METRICS_ENABLED:
+            labels = {"path": self.name, "tier": route.tier, "model": route.model}
+            metrics.registry.inc("choosie_llm_calls_total", 1, "Routed LLM calls", source=source, **labels)
+            metrics.registry.inc("choosie_llm_cost_usd_total", cost, "Estimated LLM spend", **labels)
+            metrics.registry.observe("choosie_llm_seconds", elapsed, "Routed LLM call latency", **labels)
+        if ROUTER_LOG:
+            print(f"[router] {self.name} {route.reason} -> {route.tier} {route.provider}:{route.model} "
+                  f"{source} {elapsed * 1000:.0f}ms {prompt_tokens}+{completion_tokens} tok ~${cost:.6f}")
+
+    async def complete(self, messages: List[Dict], intent: Optional[str] = None, has_image: bool = False,
+                       tier: Optional[str] = None, **kwargs) -> Completion:
+        route = self.route(intent, has_image, tier)
+        usage: Dict = {}
+        started = time.perf_counter()
+        completion = await self._gateway.complete(
+            messages, model=route.model, backend=get_backend(route.provider), usage=usage, **kwargs
+        )
+        self._record(route, completion.source, time.perf_counter() - started, messages, completion.text, usage)
+        return completion
+
+    async def stream(self, messages: List[Dict], intent: Optional[str] = None, has_image: bool = False,
+                     tier: Optional[str] = None, info: Optional[Dict] = None, **kwargs) -> AsyncIterator[str]:
+        route = self.route(intent, has_image, tier)
+        info = info if info is not None else {}
+        usage: Dict = {}
+        parts: List[str] = []
+        started = time.perf_counter()
+        async for chunk in self._gateway.stream(
+            messages, model=route.model, backend=get_backend(route.provider), info=info, usage=usage, **kwargs
+        ):
+            parts.append(chunk)
+            yield chunk
+        self._record(route, info["source"], time.perf_counter() - started, messages, "".join(parts), usage)
+
+    def complete_sync(self, messages: List[Dict], intent: Optional[str] = None, has_image: bool = False,
+                      tier: Optional[str] = None, fallback_query: Optional[str] = None, fallback=None,
+                      **kwargs) -> Completion:
+        """Blocking variant for bot.py / UI.py (runs on llm_client's background loop)."""
+        route = self.route(intent, has_image, tier)
+        backend = get_backend(route.provider)
+        usage: Dict = {}
+        started = time.perf_counter()
+        completion = SyncLLMGateway(backend.name, timeout=backend.timeout).call(
+            lambda timeout: run_sync(backend.complete(
+                messages, model=route.model, timeout=timeout, usage=usage, **kwargs
+            )),
+            fallback_query if fallback_query is not None else last_user_text(messages),
+            fallback=fallback,
+        )
+        self._record(route, completion.source, time.perf_counter() - started, messages, completion.text, usage)
+        return completion
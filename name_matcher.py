@@ -0,0 +1,187 @@
+import threading
+import unicodedata
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from catalog import get_catalog
+
+# Leading words dropped to form automatic aliases ("The Wholesome Table" -> "Wholesome Table")
+_ALIAS_PREFIXES = ("the ",)
+
+
+class Mention(NamedTuple):
+    name: str   # canonical catalog name
+    start: int  # span in the original text
+    end: int
+    alias: str  # the (folded) form that matched
+
+
+_fold_cache: Dict[str, str] = {}
+
+
+def _fold_char(c: str) -> str:
+    """Lowercase, strip diacritics, and turn anything non-alphanumeric into a space."""
+    folded = _fold_cache.get(c)
+    if folded is None:
+        decomposed = unicodedata.normalize("NFKD", c)
+        folded = "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+        folded = "".join(ch if ch.isalnum() else " " for ch in folded)
+        _fold_cache[c] = folded
+    return folded
+
+
+def fold(text: str) -> Tuple[str, List[int]]:
+    """
+    Folded text (see _fold_char, whitespace runs collapsed) plus, for
+    every folded character, the index of the original character it came
+    from, so matches map back to exact spans in the reply.
+    """
+    out: List[str] = []
+    offsets: List[int] = []
+    last_space = True
+    for i, c in enumerate(text):
+        for ch in (c.lower() if c.isascii() else _fold_char(c)):
+            if not ch.isalnum():
+                if last_space:
+                    continue
+                ch = " "
+                last_space = True
+            else:
+                last_space = False
+            out.append(ch)
+            offsets.append(i)
+    return "".join(out), offsets
+
+
+def fold_name(name: str) -> str:
+    return fold(name)[0].strip()
+
+
+# =========================================
+# Aho-Corasick automaton
+# =========================================
+class NameMatcher:
+    """
+    Aho-Corasick automaton over every restaurant name and alias: one pass
+    over the reply finds all of them, regardless of catalog size.
+
+    Matches must sit on word boundaries ("Kong" does not fire inside
+    "Kongs"), and overlapping matches keep the longest ("Hong Kong
+    Kitchen" over "Kong").
+    """
+
+    def __init__(self, names: Iterable[Tuple[str, Iterable[str]]]):
+        # Trie as parallel arrays: goto[state] = {char: state}
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[List[int]] = [[]]
+        self.patterns: List[Tuple[str, str]] = []  # (folded alias, canonical name)
+
+        seen = set()
+        for name, aliases in names:
+            for alias in (name, *aliases):
+                key = fold_name(alias)
+                if not key or key in seen:
+                    continue
+                seen.add(key)
+                self._insert(key, len(self.patterns))
+                self.patterns.append((key, name))
+        self._link()
+
+    def _insert(self, key: str, pattern_id: int):
+        state = 0
+        for ch in key:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+            state = nxt
+        self.out[state].append(pattern_id)
+
+    def _link(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def find_all(self, text: str) -> List[Mention]:
+        folded, offsets = fold(text)
+        goto, fail, out, patterns = self.goto, self.fail, self.out, self.patterns
+        n = len(folded)
+
+        found: List[Tuple[int, int, int]] = []  # (start, end, pattern) in folded coordinates
+        state = 0
+        for i, ch in enumerate(folded):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            if i + 1 < n and folded[i + 1] != " ":
+                continue  # not at the end of a word
+            for pid in out[state]:
+                start = i + 1 - len(patterns[pid][0])
+                if start == 0 or folded[start - 1] == " ":
+                    found.append((start, i + 1, pid))
+
+        # Longest first, then drop anything overlapping an accepted match
+        found.sort(key=lambda m: (m[0] - m[1], m[0]))
+        taken: List[Tuple[int, int]] = []
+        mentions = []
+        for start, end, pid in found:
+            if any(start < t_end and t_start < end for t_start, t_end in taken):
+                continue
+            taken.append((start, end))
+            alias, name = patterns[pid]
+            mentions.append(Mention(name, offsets[start], offsets[end - 1] + 1, alias))
+        mentions.sort(key=lambda m: m.start)
+        return mentions
+
+    def __len__(self):
+        return len(self.patterns)
+
+
+def _aliases(r: dict) -> List[str]:
+    aliases = list(r.get("aliases") or ())
+    lowered = r["name"].lower()
+    for prefix in _ALIAS_PREFIXES:
+        if lowered.startswith(prefix) and len(lowered) > len(prefix) + 3:
+            aliases.append(r["name"][len(prefix):])
+    return aliases
+
+
+def build_matcher(restaurants: Iterable[dict]) -> NameMatcher:
+    return NameMatcher((r["name"], _aliases(r)) for r in restaurants if r.get("name"))
+
+
+# -----------------------------------------
+# Shared matcher, rebuilt per catalog version
+# -----------------------------------------
+_matcher: Optional[Tuple[str, NameMatcher]] = None
+_lock = threading.Lock()
+
+
+def get_name_matcher() -> NameMatcher:
+    global _matcher
+    snapshot = get_catalog().current()
+    current = _matcher
+    if current is None or current[0] != snapshot.version:
+        with _lock:
+            if _matcher is None or _matcher[0] != snapshot.version:
+                _matcher = (snapshot.version, build_matcher(snapshot.restaurants))
+            current = _matcher
+    return current[1]
+
+
+def find_restaurants(text: str) -> List[Mention]:
+    """Every catalog restaurant mentioned in `text`, in order of appearance."""
+    return get_name_matcher().find_all(text or "")
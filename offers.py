@@ -0,0 +1,236 @@
+from typing import Dict, List, NamedTuple, Optional
+
+from catalog import get_catalog
+from intent import is_no, is_yes
+from name_matcher import find_restaurants, fold
+
+# -----------------------------------------
+# Offer states
+# -----------------------------------------
+# idle (no entry) -> offered -> selected -> QR issued (entry cleared)
+#                       \----------\--> declined (entry cleared)
+OFFERED = "offered"    # promo items were put forward (of one restaurant, or catalog-wide)
+SELECTED = "selected"  # one item picked, waiting for the user's go-ahead
+
+# Phrases that put an offer on the table: the persona's "you've unlocked ..."
+# and the consent question the prompts require before any QR. Plain mentions
+# of promos or deals in an answer do not start an offer.
+OFFER_CUES = (
+    "unlocked", "rise as", "exclusive drop",
+    "generate the qr", "generate a qr", "generate your qr", "qr code for you", "qr code for this",
+)
+MAX_FALLBACK_ITEMS = 5  # items listed when an offer names no restaurant
+
+OFFER_TITLE = "Taste Titan"
+ALREADY_CLAIMED = "That offer was already claimed — check the QR code I sent you. Craving anything else?"
+
+_ORDINALS = {
+    "1": 0, "1st": 0, "first": 0,  # not "one": "that one" is no ordinal
+    "2": 1, "2nd": 1, "two": 1, "second": 1,
+    "3": 2, "3rd": 2, "three": 2, "third": 2,
+    "4": 3, "4th": 3, "four": 3, "fourth": 3,
+    "last": -1,
+}
+_FILLER = {
+    "the", "a", "an", "i", "ll", "take", "want", "get", "me", "let", "please", "one", "that", "with", "and",
+    "number", "option",
+}
+# A pick is short: the item (or an ordinal) plus at most this many other words.
+# Anything longer, any question, is a new request for the model.
+MAX_PICK_EXTRA_WORDS = 1
+_QUESTION_WORDS = {"any", "are", "can", "do", "does", "how", "is", "what", "when", "where", "which", "who", "why"}
+
+
+class Decision(NamedTuple):
+    action: str             # "issue" | "reply" | "pass"
+    offer: Optional[Dict]   # offer to issue, or the next state to store (None clears it)
+    reply: str = ""         # local reply for "reply"
+
+
+# =========================================
+# Catalog -> offers
+# =========================================
+def _item_dict(item, restaurant: str) -> Dict:
+    """JSON-safe snapshot of a MenuItem (offers live in the session stores)."""
+    return {
+        "restaurant": restaurant,
+        "id": item.id,
+        "name": item.name,
+        "price": item.price,
+        "discount": item.discount,
+        "net_price": item.net_price,
+        "free_items": list(item.free_items),
+    }
+
+
+def promo_items(restaurant: dict) -> List[Dict]:
+    """Menu items with something to claim: a reduced net price or free items."""
+    return [
+        _item_dict(item, restaurant["name"]) for item in restaurant.get("menu") or ()
+        if item.discount or item.free_items or item.net_price < item.price
+    ]
+
+
+def describe_item(item: Dict) -> str:
+    text = f"**{item['name']}** — ₱{item['price']:,.2f}"
+    if item["net_price"] < item["price"]:
+        text += f" → ₱{item['net_price']:,.2f}"
+    if item["free_items"]:
+        text += f" + free {', '.join(item['free_items'])}"
+    return text
+
+
+def offer_text(offer: Dict) -> str:
+    """What the QR token is registered for (shown again on redemption)."""
+    item = offer["item"]
+    text = f"{item['restaurant']} · {item['name']} · ₱{item['net_price']:.2f}"
+    if item["net_price"] < item["price"]:
+        text += f" (was ₱{item['price']:.2f})"
+    if item["free_items"]:
+        text += f" · free {', '.join(item['free_items'])}"
+    return text
+
+
+def _mentions_item(folded_text: str, item: Dict) -> bool:
+    name = fold(item["name"])[0].strip()
+    return bool(name) and f" {name} " in f" {folded_text} "
+
+
+def offer_from_reply(reply: str) -> Optional[Dict]:
+    """
+    Offer state implied by an assistant reply: the first restaurant it
+    names that has promo items, provided the reply actually offers
+    something. Naming one of those items selects it right away.
+
+    A reply that offers something without naming any restaurant
+    ("You've unlocked a special offer!") gets the catalog's promo items,
+    so the user's "yes" still leads to a QR. One that only names places
+    without promo items offers nothing.
+    """
+    lowered = reply.lower()
+    if not any(cue in lowered for cue in OFFER_CUES):
+        return None
+
+    snapshot = get_catalog().current()
+    folded = fold(reply)[0]
+    mentions = find_restaurants(reply)
+    for mention in mentions:
+        restaurant = snapshot.restaurant(mention.name)
+        items = promo_items(restaurant) if restaurant else []
+        if not items:
+            continue
+        named = [item for item in items if _mentions_item(folded, item)]
+        if len(named) == 1:
+            return {"state": SELECTED, "restaurant": mention.name, "items": items, "item": named[0]}
+        return {"state": OFFERED, "restaurant": mention.name, "items": items, "item": None}
+
+    if mentions:
+        return None
+    items = [item for r in snapshot.restaurants for item in promo_items(r)][:MAX_FALLBACK_ITEMS]
+    if not items:
+        return None
+    return {"state": OFFERED, "restaurant": None, "items": items, "item": None}
+
+
+# =========================================
+# User message -> transition
+# =========================================
+def match_item(message: str, items: List[Dict]) -> Optional[Dict]:
+    """
+    Item the user picked, by ordinal ("2", "the second one") or by name
+    ("the pasta", "ice cream please"). Only selection-shaped messages
+    count: "is the pasta spicy?" or "table for two" are not picks.
+    """
+    if "?" in message:
+        return None
+    words = [w for w in fold(message)[0].split() if w not in _FILLER]
+    if not words or words[0] in _QUESTION_WORDS:
+        return None
+
+    if len(words) == 1 and words[0] in _ORDINALS:
+        idx = _ORDINALS[words[0]]
+        return items[idx] if -len(items) <= idx < len(items) else None
+
+    wanted = set(words)
+    scored = []
+    for item in items:
+        overlap = len(wanted & set(fold(item["name"])[0].split()))
+        if overlap:
+            scored.append((overlap, item))
+    scored.sort(key=lambda s: -s[0])
+    if not scored or (len(scored) > 1 and scored[0][0] == scored[1][0]):
+        return None
+    overlap, item = scored[0]
+    return item if len(wanted) - overlap <= MAX_PICK_EXTRA_WORDS else None
+
+
+def _selected(offer: Dict, item: Dict) -> Decision:
+    state = {**offer, "state": SELECTED, "item": item}
+    return Decision("reply", state, (
+        f"Great pick! {describe_item(item)} at **{item['restaurant']}**. "
+        "Want me to generate your one-time QR code?"
+    ))
+
+
+def advance(offer: Dict, message: str) -> Decision:
+    """
+    Next step for a pending offer given the user's message, resolved
+    locally. "pass" leaves the turn (and the offer) to the model.
+    """
+    items = offer["items"]
+
+    if is_no(message):
+        return Decision("reply", None, (
+            "No worries — just ask again if you change your mind. "
+            "Anything else you're craving?"
+        ))
+
+    picked = match_item(message, items)
+    if picked is not None:  # (re)selecting always asks for consent again
+        return _selected(offer, picked)
+
+    if is_yes(message):
+        if offer["state"] == SELECTED:
+            return Decision("issue", offer)
+        if len(items) == 1:
+            return Decision("issue", {**offer, "item": items[0]})
+        where = f" at **{offer['restaurant']}**" if offer["restaurant"] else ""
+        options = "\n".join(
+            f"{i}. {describe_item(item)}" + ("" if where else f" at {item['restaurant']}")
+            for i, item in enumerate(items, 1)
+        )
+        return Decision("reply", offer, (
+            f"Nice! Which one should I lock in{where}?\n{options}\n"
+            "Just reply with the number or the dish."
+        ))
+
+    return Decision("pass", offer)
+
+
+def after_reply(offer: Optional[Dict], reply: str) -> Optional[Dict]:
+    """
+    Offer state once the model has answered a turn: a new offer in the
+    reply replaces the pending one; otherwise the pending one survives
+    only while the reply still talks about its restaurant (or, for a
+    catalog-wide offer, one of the offered ones), so a later "yes" never
+    issues a QR for a conversation that moved on.
+    """
+    new = offer_from_reply(reply)
+    if new is not None:
+        return new
+    if offer is not None:
+        offered = {item["restaurant"] for item in offer["items"]}
+        if any(m.name in offered for m in find_restaurants(reply)):
+            return offer
+    return None
+
+
+def issued_reply(offer: Dict, token: str, qr_line: str) -> str:
+    """Confirmation sent with a freshly issued QR; `qr_line` links or describes the image."""
+    return "\n".join([
+        f"Rise as a {OFFER_TITLE} — your exclusive drop just landed.\n",
+        offer_text(offer),
+        f"Token: {token}\n",
+        f"{qr_line}\n",
+        "This one has your name on it. Flex when you redeem.",
+    ])
@@ -1,6 +1,12 @@
-def get_system_prompt(context_data: str,) -> str:
-    print("context_data",context_data)
-    return f"""
+from prompt_assembly import PromptTemplate
+
+# ===============================
+# BOT SYSTEM PROMPT (static prefix)
+# ===============================
+# Byte-stable across requests so providers can cache it; the per-message
+# DATABASE goes in a separate message after the history (DATABASE_PROMPT).
+
+BOT_RULES = PromptTemplate("bot_rules", """
 You are Choosie — an elite, taste-driven restaurant concierge for Metro Manila.
 
 Choosie is not a generic chatbot.
@@ -11,7 +17,7 @@ You do not invent information. You do not assume availability.
 DATABASE (SOURCE OF TRUTH)
 ────────────────────────
 
-You are STRICTLY restricted to the restaurants listed below.
+You are STRICTLY restricted to the restaurants listed in the DATABASE.
 This database is the single source of truth.
 
 Each restaurant entry may include:
@@ -27,8 +33,8 @@ Rules for using the menu section:
 - If this section is missing or says "No specific menu data available",
   you MUST NOT guess or infer any item-level details
 
-DATABASE:
-{context_data}
+The DATABASE for the user's latest message is given in the system
+message placed right before it.
 
 ────────────────────────
 INSTRUCTIONS
@@ -192,7 +198,12 @@ TONE & STYLE
 - Never robotic
 
 If information is unavailable, say so plainly and respectfully.
-""".strip()
+""")
+
+DATABASE_PROMPT = PromptTemplate("bot_database", """
+DATABASE:
+$context_data
+""")
 
 # ===============================
 # INTENT CLASSIFICATION PROMPT
@@ -227,48 +238,40 @@ Return ONLY one category name from the list above.
 
 
 # ===============================
-# QR_EXTRACTION PROMPT
+# SINGLE-CALL (REPLY + INTENT) INSTRUCTIONS
 # ===============================
 
-QR_EXTRACTION_PROMPT = """
-Analyze the conversation carefully.
-
-The user has explicitly and clearly confirmed they want a QR code or access.
-Confirmation must be affirmative and intentional (e.g. agreement to proceed). 
-
-From the assistant’s LAST message ONLY:
-
-- Identify the Restaurant name (resolved via name, cuisine, or mood)
-- Identify the specific Item ONLY if it was explicitly mentioned
-- Extract the original price ONLY if it was explicitly shown
-- Extract the discount ONLY if a [PROMO] tag or explicit percentage was mentioned
-- Extract whether the item is a free item (i.e., if it's part of a "buy one, get one free" or similar promotion)
-- Calculate and extract the Net Price ONLY if BOTH price and discount are explicitly stated
-
-STRICT RULES:
-- Do NOT guess or infer missing values
-- Do NOT merge information across multiple restaurants
-- Do NOT calculate Net Price if price OR discount is missing
-
-OUTPUT FORMAT (Markdown ONLY):
+SINGLE_CALL_PROMPT = PromptTemplate("single_call_output", """
+────────────────────────
+OUTPUT FORMAT (MANDATORY)
+────────────────────────
 
-Restaurant:
-Item:
-Price:
-Discount:
-Is Free Item: (Yes/No)
-Net Price:
+Reply with a single JSON object and nothing else:
 
-OUTPUT RULES:
-- Write values on the same line after each label
-- Use "None" if a field was not explicitly stated
-- Use currency symbols exactly as shown in the assistant message
-- Do NOT add explanations, notes, emojis, or extra text
-- Do NOT rephrase values
+{"intent": "<category>", "reply": "<your message to the user>"}
 
-If valid extraction is NOT possible, return EXACTLY:
+"intent" classifies the user's LAST message as ONE of:
+general_chat, restaurant_discovery, item_question, promo_inquiry,
+promo_selection, promo_confirmation, promo_decline
+(promo_confirmation = clear consent, promo_decline = no / later / skip;
+if uncertain, use general_chat).
 
-Status: No valid item or pricing information found.
-"""
+"reply" follows every rule above.
+""")
 
 
+# ===============================
+# IMAGE DESCRIPTION (vision cache)
+# ===============================
+# Question-independent on purpose: the description is cached per image and
+# every later question about the same upload is answered from it.
+
+IMAGE_DESCRIPTION_PROMPT = PromptTemplate("image_description", """
+Describe the attached image for someone who cannot see it.
+
+- If it is a menu, receipt or price list: transcribe the restaurant name,
+  every dish with its price, and any promos or notes, as a plain list.
+- If it is food or a place: name the dishes or setting, cuisine and notable details.
+- Copy names and prices exactly; do not guess unreadable text, mark it [unreadable].
+- No recommendations, opinions or follow-up questions.
+""")
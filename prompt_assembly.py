@@ -0,0 +1,131 @@
+import os
+import json
+import hashlib
+import threading
+from string import Template
+from typing import Dict, List, Optional, Tuple
+
+from session_store import MemorySessionStore
+
+# -----------------------------------------
+# Prompt settings (override via .env)
+# -----------------------------------------
+PROMPT_DEBUG = os.getenv("PROMPT_DEBUG", "0") == "1"  # print assembled prompts / context
+
+
+def section_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+
+
+def _message_hash(message: Dict) -> str:
+    return hashlib.sha1(json.dumps(message, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def debug_log(label: str, text: str):
+    if PROMPT_DEBUG:
+        print(f"[prompt] {label} ({len(text)} chars)\n{text}")
+
+
+# =========================================
+# Templates
+# =========================================
+class PromptTemplate:
+    """
+    A prompt section compiled once at import. `version` is the hash of
+    its text, so any edit shows up as a new version in the metrics.
+    Sections without $placeholders are static and may go in the prefix.
+    """
+
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self.text = text.strip()
+        self._template = Template(self.text)
+        self.placeholders = {
+            m.group("named") or m.group("braced")
+            for m in Template.pattern.finditer(self.text)
+            if m.group("named") or m.group("braced")
+        }
+        self.version = section_hash(self.text)
+
+    @property
+    def static(self) -> bool:
+        return not self.placeholders
+
+    def render(self, **values) -> str:
+        return self._template.substitute(values)
+
+
+# =========================================
+# Assembler
+# =========================================
+class PromptAssembler:
+    """
+    Builds chat payloads in a cache-friendly order:
+
+        [static system prefix] + history + [variable context] + user message
+
+    The prefix (persona, rules, output format) is joined once and is
+    byte-identical on every request, and history only ever grows at its
+    end, so providers with automatic prefix caching can reuse everything
+    up to the per-message context.
+
+    Tracks, per session, how many leading messages repeat the previous
+    payload (the part a prefix cache can serve).
+    """
+
+    def __init__(self, name: str, *sections: PromptTemplate, max_sessions: int = 10000):
+        for section in sections:
+            if not section.static:
+                raise ValueError(f"Prefix section {section.name!r} has placeholders: {section.placeholders}")
+        self.name = name
+        self.sections = {s.name: s.version for s in sections}
+        self.prefix = "\n\n".join(s.text for s in sections)
+        self.version = section_hash(self.prefix)
+        self._prefix_message = {"role": "system", "content": self.prefix}
+        self._prefix_hash = _message_hash(self._prefix_message)
+        self._last = MemorySessionStore(f"prompt_prefix:{name}", max_entries=max_sessions)
+        self._lock = threading.Lock()
+        self.stats = {"builds": 0, "prefix_hits": 0, "prefix_misses": 0, "reused_messages": 0, "sent_messages": 0}
+
+    def build(
+        self,
+        history: List[Dict],
+        user_content,
+        context: Optional[str] = None,
+        session_key=None,
+    ) -> Tuple[List[Dict], Dict]:
+        messages = [self._prefix_message, *history]
+        if context:
+            messages.append({"role": "system", "content": context})
+        messages.append({"role": "user", "content": user_content})
+
+        reused = 0
+        if session_key is not None:
+            hashes = [self._prefix_hash] + [_message_hash(m) for m in messages[1:]]
+            previous = self._last.get(session_key) or []
+            for a, b in zip(previous, hashes):
+                if a != b:
+                    break
+                reused += 1
+            self._last.set(session_key, hashes)
+
+        with self._lock:
+            self.stats["builds"] += 1
+            self.stats["sent_messages"] += len(messages)
+            self.stats["reused_messages"] += reused
+            if session_key is not None:
+                # A hit: more than the static prefix repeats the previous turn
+                self.stats["prefix_hits" if reused > 1 else "prefix_misses"] += 1
+
+        if context:
+            debug_log(f"{self.name} context", context)
+        return messages, {"prompt_version": self.version, "reused_messages": reused}
+
+    def metrics(self) -> Dict:
+        builds = self.stats["prefix_hits"] + self.stats["prefix_misses"]
+        return {
+            **self.stats,
+            "prompt_version": self.version,
+            "sections": dict(self.sections),
+            "prefix_hit_ratio": round(self.stats["prefix_hits"] / builds, 4) if builds else 0.0,
+        }
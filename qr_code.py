@@ -1,79 +1,251 @@
+import os
+import re
+import time
 import uuid
 import qrcode
 import base64
+import asyncio
+import hashlib
 from io import BytesIO
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from redemption import PROMO_TTL, promo_tokens, redeem_url
+
+
+# -----------------------------------------
+# Rendering settings (override via .env)
+# -----------------------------------------
+QR_FORMAT = os.getenv("QR_FORMAT", "png")  # "png" | "svg"
+QR_BOX_SIZE = int(os.getenv("QR_BOX_SIZE", "4"))
+QR_BORDER = int(os.getenv("QR_BORDER", "2"))
+# "thread" | "process". Threads are enough for a ~10 ms render; a process
+# pool (opt-in) adds spawned workers and pickling per app process
+QR_EXECUTOR = os.getenv("QR_EXECUTOR", "thread")
+QR_WORKERS = int(os.getenv("QR_WORKERS", "2"))
+QR_POOL_SIZE = int(os.getenv("QR_POOL_SIZE", "0"))  # pre-generated token + QR pairs, 0 = off
+
+ERROR_CORRECTION = {
+    "L": qrcode.constants.ERROR_CORRECT_L,
+    "M": qrcode.constants.ERROR_CORRECT_M,
+    "Q": qrcode.constants.ERROR_CORRECT_Q,
+    "H": qrcode.constants.ERROR_CORRECT_H,
+}
+QR_ERROR_CORRECTION = os.getenv("QR_ERROR_CORRECTION", "L")
+
+MIME_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+
+def qr_url(token: str) -> str:
+    return redeem_url(token)
+
+
+def _matrix_to_svg(matrix, box_size: int) -> bytes:
+    # One path, one segment per horizontal run of dark modules: far
+    # smaller than one rect per module.
+    size = len(matrix)
+    segments = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < size:
+            if row[x]:
+                run = x
+                while run < size and row[run]:
+                    run += 1
+                segments.append(f"M{x} {y}h{run - x}v1h-{run - x}z")
+                x = run
+            else:
+                x += 1
+    px = size * box_size
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{px}" height="{px}" '
+        f'viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<rect width="{size}" height="{size}" fill="#fff"/>'
+        f'<path d="{"".join(segments)}"/></svg>'
+    ).encode("utf-8")
+
+
+def render_qr(
+    data: str,
+    fmt: str = QR_FORMAT,
+    box_size: int = QR_BOX_SIZE,
+    border: int = QR_BORDER,
+    error_correction: str = QR_ERROR_CORRECTION,
+) -> bytes:
+    """Renders `data` as PNG or SVG bytes (CPU-bound: run it off the event loop)."""
+    qr = qrcode.QRCode(
+        error_correction=ERROR_CORRECTION[error_correction],
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    if fmt == "svg":
+        return _matrix_to_svg(qr.get_matrix(), box_size)
 
+    buffer = BytesIO()
+    qr.make_image().save(buffer, format="PNG")
+    return buffer.getvalue()
 
-# Temporary in-memory store (replace with database later)
-# Structure:
-# {
-#    "token": {
-#        "offer": "10% OFF at Ramen Manila",
-#        "is_used": False
-#    }
-# }
-qr_store = {}
 
+def _register(token: str, offer_text: str):
+    promo_tokens.issue(token, offer_text)
 
-def generate_unique_qr(offer_text: str):
-    """
-    Generates a unique, one-time-use QR code.
-    Returns the token and the base64 QR image.
-    """
 
-    # 1. Create unique token
-    token = str(uuid.uuid4())
+# =========================================
+# Image storage (served by GET /qr/{name})
+# =========================================
+QR_FOLDER = os.getenv("QR_FOLDER", "qr_codes")
+QR_PUBLIC_BASE_URL = os.getenv("QR_PUBLIC_BASE_URL", "").rstrip("/")
+os.makedirs(QR_FOLDER, exist_ok=True)
 
-    # 2. Save token in local store
-    qr_store[token] = {
-        "offer": offer_text,
-        "is_used": False
-    }
+_QR_NAME_RE = re.compile(r"^[0-9a-f]{16}\.(png|svg)$")
 
-    # 3. Prepare QR content (validation URL)
-    qr_data = f"https://your-domain.com/validate_qr?token={token}"
 
-    # 4. Generate QR code
-    qr_img = qrcode.make(qr_data)
+def store_qr_image(image: bytes, fmt: str) -> str:
+    """Writes the image once under a content-addressed name and returns that name."""
+    name = f"{hashlib.sha256(image).hexdigest()[:16]}.{fmt}"
+    path = os.path.join(QR_FOLDER, name)
+    if not os.path.exists(path):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(image)
+        os.replace(tmp, path)
+    return name
+
+
+def render_and_store(data: str, fmt: str = QR_FORMAT) -> str:
+    return store_qr_image(render_qr(data, fmt), fmt)
 
-    # 5. Convert to base64
-    buffer = BytesIO()
-    qr_img.save(buffer, format="PNG")
-    qr_base64 = base64.b64encode(buffer.getvalue()).decode("utf-8")
 
+def qr_image_path(name: str) -> Optional[str]:
+    """Filesystem path for a stored QR image name, or None if invalid / missing."""
+    if not _QR_NAME_RE.match(name):
+        return None
+    path = os.path.join(QR_FOLDER, name)
+    return path if os.path.exists(path) else None
+
+
+def qr_image_url(name: str) -> str:
+    return f"{QR_PUBLIC_BASE_URL}/qr/{name}"
+
+
+def purge_qr_images(max_age: float = PROMO_TTL) -> int:
+    """Deletes stored QR images older than max_age seconds (only files this module wrote)."""
+    cutoff = time.time() - max_age
+    removed = 0
+    for name in os.listdir(QR_FOLDER):
+        path = os.path.join(QR_FOLDER, name)
+        if _QR_NAME_RE.match(name) and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+def generate_unique_qr(offer_text: str, fmt: str = QR_FORMAT):
+    """
+    Generates a unique, one-time-use QR code.
+    Returns the token and the base64 QR image.
+
+    Blocking: inside async code use generate_unique_qr_async.
+    """
+    token = str(uuid.uuid4())
+    image = render_qr(qr_url(token), fmt)
+    _register(token, offer_text)
     return {
         "token": token,
-        "qr_code": qr_base64
+        "qr_code": base64.b64encode(image).decode("utf-8"),
+        "mime_type": MIME_TYPES[fmt],
     }
 
 
-def validate_qr_token(token: str):
-    """
-    Validates a QR token.
-    Returns status and offer details.
-    """
+# =========================================
+# Off-loop rendering
+# =========================================
+_executor = None
+
 
-    # Token not found
-    if token not in qr_store:
-        return {
-            "status": "invalid",
-            "message": "QR token not found."
-        }
+def _get_executor():
+    global _executor
+    if _executor is None:
+        if QR_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(max_workers=QR_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=QR_WORKERS, thread_name_prefix="qr")
+    return _executor
 
-    data = qr_store[token]
 
-    # Already used
-    if data["is_used"]:
-        return {
-            "status": "expired",
-            "message": "This QR code has already been used."
-        }
+async def render_qr_async(data: str, fmt: str = QR_FORMAT) -> str:
+    """Renders and stores the QR in the worker pool; returns the stored image name."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), render_and_store, data, fmt)
 
-    # Mark as used
-    data["is_used"] = True
 
+class QRPool:
+    """
+    Pre-generated (token, image name) pairs. The QR only encodes the token URL,
+    so images can be rendered before anyone asks; the offer is attached
+    when a pair is taken. A background task keeps the pool topped up.
+    """
+
+    def __init__(self, size: int = QR_POOL_SIZE, fmt: str = QR_FORMAT):
+        self.size = size
+        self.fmt = fmt
+        self._ready: "asyncio.Queue" = asyncio.Queue(maxsize=max(size, 1))
+        self._low = asyncio.Event()
+        self._task = None
+
+    async def _refill(self):
+        while True:
+            while not self._ready.full():
+                token = str(uuid.uuid4())
+                name = await render_qr_async(qr_url(token), self.fmt)
+                self._ready.put_nowait((token, name))
+            self._low.clear()
+            await self._low.wait()
+
+    def start(self):
+        if self._task is None and self.size > 0:
+            self._task = asyncio.get_running_loop().create_task(self._refill())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def take(self):
+        try:
+            pair = self._ready.get_nowait()
+        except asyncio.QueueEmpty:
+            token = str(uuid.uuid4())
+            pair = (token, await render_qr_async(qr_url(token), self.fmt))
+        self._low.set()
+        return pair
+
+
+qr_pool = QRPool()
+
+
+async def generate_unique_qr_async(offer_text: str):
+    """
+    Issues a one-time token whose QR is rendered in the worker pool (or
+    taken from the pre-generated pool) and stored on disk.
+    Returns {"token", "qr_url", "mime_type"} instead of inline base64.
+    """
+    token, name = await qr_pool.take()
+    await asyncio.to_thread(_register, token, offer_text)  # SQLite INSERT (redemption.py)
     return {
-        "status": "success",
-        "message": "QR is valid. Offer applied!",
-        "offer": data["offer"]
+        "token": token,
+        "qr_url": qr_image_url(name),
+        "mime_type": MIME_TYPES[qr_pool.fmt],
     }
+
+
+def validate_qr_token(token: str):
+    """
+    Validates and redeems a QR token (single use, atomic).
+    Returns status ("success", "used", "expired" or "invalid"),
+    a message and, on success, the offer.
+    """
+    return promo_tokens.redeem(token)
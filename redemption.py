@@ -0,0 +1,138 @@
+import os
+import time
+import sqlite3
+import asyncio
+import threading
+from typing import Dict, Optional
+
+# -----------------------------------------
+# Redemption settings (override via .env)
+# -----------------------------------------
+PROMO_DB_PATH = os.getenv("PROMO_DB_PATH", "promos.db")
+PROMO_TTL = float(os.getenv("PROMO_TTL", str(7 * 24 * 3600)))  # seconds a token stays redeemable
+PROMO_PURGE_INTERVAL = float(os.getenv("PROMO_PURGE_INTERVAL", "3600"))
+PROMO_PURGE_GRACE = float(os.getenv("PROMO_PURGE_GRACE", str(24 * 3600)))  # keep expired rows this long
+PROMO_REDEEM_URL = os.getenv("PROMO_REDEEM_URL", "https://yourapp.com/promo/redeem")
+
+
+def redeem_url(token: str) -> str:
+    """What the QR encodes: the redemption endpoint for this token."""
+    return f"{PROMO_REDEEM_URL}?token={token}"
+
+
+# =========================================
+# Promo token store
+# =========================================
+class PromoTokenStore:
+    """
+    Durable one-time promo tokens in SQLite.
+
+    `token` is the primary key (unique index), so lookups and redemptions
+    are indexed. Redemption is a single conditional UPDATE
+    (`redeemed_at IS NULL AND expires_at > now`): SQLite serialises
+    writers, so exactly one of any number of concurrent scans, across
+    threads or worker processes, can win.
+    """
+
+    def __init__(self, path: str = PROMO_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS promo_tokens ("
+            " token TEXT PRIMARY KEY,"
+            " offer TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " redeemed_at REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS promo_tokens_expiry ON promo_tokens (expires_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread: FastAPI runs sync endpoints in a threadpool
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    def issue(self, token: str, offer: str, ttl: float = PROMO_TTL):
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO promo_tokens (token, offer, created_at, expires_at) VALUES (?, ?, ?, ?)",
+            (token, offer, now, now + ttl),
+        )
+
+    def get(self, token: str) -> Optional[Dict]:
+        row = self._conn().execute(
+            "SELECT offer, created_at, expires_at, redeemed_at FROM promo_tokens WHERE token = ?",
+            (token,),
+        ).fetchone()
+        if row is None:
+            return None
+        return {"offer": row[0], "created_at": row[1], "expires_at": row[2], "redeemed_at": row[3]}
+
+    def status(self, token: str) -> Dict:
+        """
+        Read-only check: what redeem() would say, without using the token.
+        Returns {"status": "valid" | "used" | "expired" | "invalid", "message", ["offer", "expires_at"]}.
+        """
+        record = self.get(token)
+        if record is None:
+            return {"status": "invalid", "message": "QR token not found."}
+        if record["redeemed_at"] is not None:
+            return {"status": "used", "message": "This QR code has already been used."}
+        if record["expires_at"] <= time.time():
+            return {"status": "expired", "message": "This QR code has expired."}
+        return {"status": "valid", "message": "QR is valid. Redeem it at the counter.",
+                "offer": record["offer"], "expires_at": record["expires_at"]}
+
+    def redeem(self, token: str) -> Dict:
+        """
+        Atomically marks the token as used.
+        Returns {"status": "success" | "used" | "expired" | "invalid", "message", ["offer"]}.
+        """
+        now = time.time()
+        conn = self._conn()
+        cur = conn.execute(
+            "UPDATE promo_tokens SET redeemed_at = ? "
+            "WHERE token = ? AND redeemed_at IS NULL AND expires_at > ?",
+            (now, token, now),
+        )
+        record = self.get(token)
+
+        if cur.rowcount == 1:
+            return {"status": "success", "message": "QR is valid. Offer applied!", "offer": record["offer"]}
+        if record is None:
+            return {"status": "invalid", "message": "QR token not found."}
+        if record["redeemed_at"] is not None:
+            return {"status": "used", "message": "This QR code has already been used."}
+        return {"status": "expired", "message": "This QR code has expired."}
+
+    def purge(self, grace: float = PROMO_PURGE_GRACE) -> int:
+        """Deletes tokens that expired more than `grace` seconds ago."""
+        cur = self._conn().execute(
+            "DELETE FROM promo_tokens WHERE expires_at < ?",
+            (time.time() - grace,),
+        )
+        return cur.rowcount
+
+
+# -----------------------------------------
+# Shared store + background purge
+# -----------------------------------------
+promo_tokens = PromoTokenStore()
+
+
+async def run_purger(interval: float = PROMO_PURGE_INTERVAL):
+    while True:
+        try:
+            removed = await asyncio.to_thread(promo_tokens.purge)
+            if removed:
+                print(f"Purged {removed} expired promo tokens")
+        except sqlite3.Error as e:
+            print(f"Promo purge failed: {e}")
+        await asyncio.sleep(interval)
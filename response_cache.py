@@ -0,0 +1,105 @@
+import os
+import re
+import hashlib
+from typing import Dict, Optional
+
+from search_index import normalize_text, STOPWORDS
+from session_store import MemorySessionStore
+from catalog import get_catalog
+
+# -----------------------------------------
+# Cache settings (override via .env)
+# -----------------------------------------
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "1") == "1"
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "900"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+
+# Words without contraction / possessive endings ("where's" -> "where")
+_WORD_RE = re.compile(r"([a-z0-9]+)(?:['’][a-z]+)?")
+
+# Stopwords that say where (or where from), so "near BGC" != "in BGC"
+LOCATION_WORDS = {"at", "from", "in", "near", "on"}
+
+
+def normalize_query(text: str) -> str:
+    """
+    Filler-free form of a discovery query, word order kept:
+    "Any romantic dinner in Makati?" and "romantic dinner in makati"
+    map together, "dinner near Makati" and "Makati dinner" do not.
+    """
+    words = _WORD_RE.findall(normalize_text(text))
+    return " ".join(w for w in words if w not in STOPWORDS or w in LOCATION_WORDS)
+
+
+def prompt_version(*parts: str) -> str:
+    """Short hash of everything that shapes the reply (prompt text, model, ...)."""
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()[:12]
+
+
+def catalog_version() -> str:
+    return get_catalog().version
+
+
+# =========================================
+# Response cache
+# =========================================
+class ResponseCache:
+    """
+    LRU + TTL cache of first-turn LLM answers.
+
+    Entries are stored under two keys: the exact (lowercased) message and
+    its normalized form. Both include the prompt and catalog versions, and
+    the whole cache is dropped as soon as the catalog files change.
+    """
+
+    def __init__(self, ttl: float = RESPONSE_CACHE_TTL, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self._store = MemorySessionStore("response_cache", ttl=ttl, max_entries=max_entries)
+        self._catalog = None
+        self.stats = {"hits_exact": 0, "hits_normalized": 0, "misses": 0, "invalidations": 0}
+
+    def _keys(self, message: str, version: str):
+        catalog = catalog_version()
+        if catalog != self._catalog:
+            if self._catalog is not None:
+                self.clear()
+                self.stats["invalidations"] += 1
+            self._catalog = catalog
+        prefix = f"{version}:{catalog}"
+        normalized = normalize_query(message)
+        return (
+            f"{prefix}:x:{message.strip().lower()}",
+            f"{prefix}:n:{normalized}" if normalized else None,
+        )
+
+    def get(self, message: str, version: str) -> Optional[str]:
+        exact, normalized = self._keys(message, version)
+        answer = self._store.get(exact)
+        if answer is not None:
+            self.stats["hits_exact"] += 1
+            return answer
+        answer = self._store.get(normalized) if normalized else None
+        if answer is not None:
+            self.stats["hits_normalized"] += 1
+            return answer
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, message: str, version: str, answer: str):
+        exact, normalized = self._keys(message, version)
+        self._store.set(exact, answer)
+        if normalized:
+            self._store.set(normalized, answer)
+
+    def clear(self):
+        self._store = MemorySessionStore(
+            "response_cache", ttl=self._store.ttl, max_entries=self._store.max_entries
+        )
+
+    def metrics(self) -> Dict[str, float]:
+        hits = self.stats["hits_exact"] + self.stats["hits_normalized"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._store),
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        }
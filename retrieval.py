@@ -0,0 +1,139 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+from catalog import get_catalog
+from geo import GEO_FILTER, Area, locate
+from search_index import get_restaurant_index, tokenize
+from vector_index import hybrid_search
+from tokens import count_tokens
+
+# -----------------------------------------
+# Retrieval settings
+# -----------------------------------------
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "1200"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+RETRIEVAL_HISTORY_TURNS = int(os.getenv("RETRIEVAL_HISTORY_TURNS", "4"))
+MAX_MENU_LINES = 8
+
+
+# ===============================
+# Formatting (same shape the prompt rules expect)
+# ===============================
+def format_menu_item(item) -> str:
+    line = f"- {item['name']}: ₱{float(item['price']):.2f}"
+    discount = float(item.get("discount", 0) or 0)  # pesos off, not a percentage
+    if discount:
+        net = item.get("net_price")
+        net = float(net) if net is not None else float(item["price"]) - discount
+        line += f" [PROMO ₱{discount:g} off, now ₱{net:.2f}]"
+    if item.get("free_items"):
+        line += f" (free: {', '.join(item['free_items'])})"
+    return line
+
+
+def format_restaurant(r: dict, query_terms: set) -> str:
+    header = f"Restaurant: {r['name']}"
+    details = ", ".join(x for x in (r.get("category"), r.get("address")) if x)
+    if details:
+        header += f" ({details})"
+    if r.get("description"):
+        header += f"\n{r['description']}"
+
+    menu = r.get("menu", [])
+    if not menu:
+        return header + "\n>>> CURRENT MENU & OFFERS\nNo specific menu data available\n"
+
+    # Items that match the query first, then promos, then the rest
+    def rank(item):
+        overlap = len(query_terms & set(tokenize(item["name"])))
+        return (-overlap, -float(item.get("discount", 0) or 0))
+
+    lines = [format_menu_item(i) for i in sorted(menu, key=rank)[:MAX_MENU_LINES]]
+    return header + "\n>>> CURRENT MENU & OFFERS\n" + "\n".join(lines) + "\n"
+
+
+def _directory_line(r: dict) -> str:
+    return f"- {r['name']} — {r.get('category', '')}, {r.get('address', '')}"
+
+
+# ===============================
+# Candidate ranking
+# ===============================
+def rank_candidates(message: str, k: int) -> Tuple[List[dict], Optional[Area], Optional[List[dict]]]:
+    """
+    Top-k restaurants for a message as (ranked, area, nearby). When the
+    message names an area ("near BGC", "in Makati") only restaurants in or
+    around it qualify: relevant ones first, then the closest. `nearby` is
+    every qualifying restaurant, closest first (None without an area).
+    """
+    area, near = locate(message) if GEO_FILTER else (None, False)
+    if area is None:
+        return [r for r, _ in hybrid_search(message, k=k)], None, None
+
+    nearby = [r for r, _ in get_catalog().current().near(area, near)]
+    allowed = {r["name"] for r in nearby}
+    ranked = [r for r, _ in hybrid_search(message, k=k * 4) if r["name"] in allowed][:k]
+    picked = {r["name"] for r in ranked}
+    ranked += [r for r in nearby if r["name"] not in picked][:k - len(ranked)]
+    return ranked, area, nearby
+
+
+# ===============================
+# Retrieval stage
+# ===============================
+def retrieve_context(message: str, history: List[dict], budget_tokens: int = RETRIEVAL_TOKEN_BUDGET) -> Tuple[str, Dict]:
+    """
+    Picks the restaurants relevant to the message (and recent history)
+    and renders only those as prompt context, within a token budget.
+
+    Returns (context_text, stats) where stats has the selected names and
+    the context token count.
+    """
+    index = get_restaurant_index()
+
+    # Current message drives the ranking, recent turns fill in follow-ups
+    # ("what about their desserts?") that no longer name the place.
+    # A named area limits both, and the directory, to what is nearby.
+    ranked, area, nearby = rank_candidates(message, RETRIEVAL_TOP_K)
+    allowed = {r["name"] for r in nearby} if nearby is not None else None
+    recent = " ".join(m.get("content", "") for m in history[-RETRIEVAL_HISTORY_TURNS:] if isinstance(m.get("content"), str))
+    for r, _ in index.search(recent, k=RETRIEVAL_TOP_K):
+        if len(ranked) >= RETRIEVAL_TOP_K:
+            break
+        if r not in ranked and (allowed is None or r["name"] in allowed):
+            ranked.append(r)
+
+    query_terms = set(tokenize(message))
+    blocks, used = [], 0
+    for r in ranked:
+        block = format_restaurant(r, query_terms)
+        cost = count_tokens(block)
+        if used + cost > budget_tokens:
+            break
+        blocks.append(block)
+        used += cost
+
+    # Spend what is left on a compact directory so broad questions
+    # still see some of the catalog, without growing with it.
+    selected = {r["name"] for r in ranked[:len(blocks)]}
+    directory = []
+    for r in nearby if nearby is not None else index.docs.values():
+        if r["name"] in selected:
+            continue
+        line = _directory_line(r)
+        cost = count_tokens(line)
+        if used + cost > budget_tokens:
+            break
+        directory.append(line)
+        used += cost
+
+    context = "\n".join(blocks)
+    if directory:
+        context += "\nOTHER RESTAURANTS (no menu details loaded for this message):\n" + "\n".join(directory)
+
+    return context, {
+        "restaurants": [r["name"] for r in ranked[:len(blocks)]],
+        "area": area.name if area else None,
+        "directory_size": len(directory),
+        "context_tokens": used,
+    }
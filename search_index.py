@@ -0,0 +1,233 @@
+import os
+import re
+import math
+import heapq
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# -----------------------------------------
+# Index settings
+# -----------------------------------------
+# Postings kept per term at query time (highest BM25 impact first); bounds
+# lookup cost for very common terms in large catalogs.
+MAX_POSTINGS = int(os.getenv("INDEX_MAX_POSTINGS", "256"))
+
+# Field weights: a term in the name counts more than one in the description
+# ("menu" is the joined details.json item names)
+FIELD_WEIGHTS = {"name": 3, "category": 2, "address": 1, "description": 1, "menu": 1}
+
+STOPWORDS = {
+    "a", "an", "and", "any", "are", "at", "be", "best", "can", "do", "for", "from",
+    "good", "i", "in", "is", "it", "me", "my", "near", "of", "on", "or", "place",
+    "places", "please", "restaurant", "restaurants", "some", "something", "spot",
+    "spots", "the", "there", "to", "want", "what", "where", "with", "you",
+}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercases and strips diacritics ("Parañaque" -> "paranaque")."""
+    text = text or ""
+    if text.isascii():
+        return text.lower()
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text: str) -> List[str]:
+    """Unigrams (minus stopwords) plus adjacent-word bigrams."""
+    words = [w for w in _WORD_RE.findall(normalize_text(text)) if w not in STOPWORDS]
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+# =========================================
+# BM25 inverted index
+# =========================================
+class IndexState(NamedTuple):
+    """What searches read: swapped as a whole after each change, never mutated."""
+    docs: Dict[int, dict]
+    impacts: Dict[str, List[Tuple[int, float]]]  # term -> [(doc_id, BM25 weight)]
+
+
+class RestaurantIndex:
+    """
+    Token + bigram inverted index over the catalog with BM25 scoring.
+
+    Follows the catalog version (see catalog.Catalog): when it changes
+    only added/edited/removed restaurants are re-indexed, in a background
+    thread. BM25 weights are precomputed per posting ("impacts") after each
+    change and published with the documents as one IndexState, so a query
+    is just a few dict lookups and additions on a consistent state.
+    """
+
+    def __init__(self, catalog=None, k1: float = 1.2, b: float = 0.75):
+        self.catalog = catalog  # None: fed only through update()
+        self.k1 = k1
+        self.b = b
+
+        # Build side: only touched under _lock
+        self._docs: Dict[int, dict] = {}
+        self.doc_len: Dict[int, int] = {}
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.total_len = 0
+
+        self._state = IndexState({}, {})
+        self._by_key: Dict[str, int] = {}  # name -> doc_id
+        self._next_id = 0
+        self._catalog_version = None
+        self._lock = threading.Lock()
+
+    # ---------- building ----------
+    def _terms(self, r: dict) -> Counter:
+        terms = Counter()
+        for field, weight in FIELD_WEIGHTS.items():
+            value = r.get(field) or ""
+            if not isinstance(value, str):
+                value = " ".join(item["name"] for item in value)
+            for tok in tokenize(value):
+                terms[tok] += weight
+        return terms
+
+    def _add(self, r: dict) -> int:
+        doc_id = self._next_id
+        self._next_id += 1
+        terms = self._terms(r)
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        self._docs[doc_id] = r
+        self.doc_len[doc_id] = sum(terms.values())
+        self.total_len += self.doc_len[doc_id]
+        return doc_id
+
+    def _remove(self, doc_id: int):
+        for term in self._terms(self._docs[doc_id]):
+            plist = self.postings.get(term)
+            if plist is not None:
+                plist.pop(doc_id, None)
+                if not plist:
+                    del self.postings[term]
+        self.total_len -= self.doc_len.pop(doc_id)
+        del self._docs[doc_id]
+
+    def update(self, restaurants: List[dict]) -> Dict[str, int]:
+        """Applies a new restaurant list, re-indexing only what changed."""
+        with self._lock:
+            return self._apply(restaurants)
+
+    def _apply(self, restaurants: List[dict]) -> Dict[str, int]:
+        stats = {"added": 0, "updated": 0, "removed": 0}
+        seen = set()
+        for r in restaurants:
+            key = r.get("name", "")
+            seen.add(key)
+            current = self._by_key.get(key)
+            if current is not None and self._docs[current] == r:
+                continue
+            if current is not None:
+                self._remove(current)
+                stats["updated"] += 1
+            else:
+                stats["added"] += 1
+            self._by_key[key] = self._add(r)
+
+        for key in [k for k in self._by_key if k not in seen]:
+            self._remove(self._by_key.pop(key))
+            stats["removed"] += 1
+
+        if any(stats.values()):
+            # N / avgdl changed: every impact moves. One assignment publishes the new state.
+            self._state = IndexState(dict(self._docs), self._compute_impacts())
+        return stats
+
+    def _compute_impacts(self) -> Dict[str, List[Tuple[int, float]]]:
+        n = len(self._docs)
+        if not n:
+            return {}
+        avgdl = self.total_len / n
+        norms = {
+            doc_id: self.k1 * (1 - self.b + self.b * dl / avgdl)
+            for doc_id, dl in self.doc_len.items()
+        }
+        impacts = {}
+        for term, plist in self.postings.items():
+            idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            weighted = [
+                (doc_id, idf * tf * (self.k1 + 1) / (tf + norms[doc_id]))
+                for doc_id, tf in plist.items()
+            ]
+            if len(weighted) > MAX_POSTINGS:
+                weighted = heapq.nlargest(MAX_POSTINGS, weighted, key=lambda p: p[1])
+            impacts[term] = weighted
+        return impacts
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Re-indexes if the catalog version changed. Like Catalog.refresh the
+        work runs in a background thread (searches keep the current state
+        meanwhile) unless `force` is set or nothing is indexed yet. Returns
+        True on an inline update.
+        """
+        if self.catalog is None:
+            return False
+        if force:
+            self.catalog.refresh(force=True)
+        snapshot = self.catalog.current()
+        if snapshot.version == self._catalog_version:
+            return False
+        if force or self._catalog_version is None:
+            return self._reindex(snapshot)
+        if not self._lock.locked():
+            threading.Thread(target=self._reindex, args=(snapshot,), daemon=True).start()
+        return False
+
+    def _reindex(self, snapshot) -> bool:
+        with self._lock:  # one re-index at a time
+            if snapshot.version == self._catalog_version:
+                return False
+            self._apply(list(snapshot.restaurants))
+            self._catalog_version = snapshot.version
+            return True
+
+    # ---------- querying ----------
+    def search(self, query: str, k: int = 3) -> List[Tuple[dict, float]]:
+        """Top-k restaurants for a free-text query as (restaurant, score)."""
+        self.refresh()
+        state = self._state  # read once: a concurrent re-index swaps it whole
+        terms = set(tokenize(query))
+        if not terms or not state.docs:
+            return []
+
+        scores: Dict[int, float] = {}
+        for term in terms:
+            for doc_id, weight in state.impacts.get(term, ()):
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight
+
+        top = heapq.nlargest(k, scores.items(), key=lambda kv: kv[1])
+        return [(state.docs[doc_id], score) for doc_id, score in top]
+
+    @property
+    def docs(self) -> Dict[int, dict]:
+        """Indexed restaurants by doc id (the published state)."""
+        return self._state.docs
+
+    def __len__(self):
+        return len(self._state.docs)
+
+
+# -----------------------------------------
+# Shared index over the shared catalog
+# -----------------------------------------
+_index: Optional[RestaurantIndex] = None
+
+
+def get_restaurant_index() -> RestaurantIndex:
+    global _index
+    if _index is None:
+        from catalog import get_catalog  # catalog imports normalize_text from here
+
+        _index = RestaurantIndex(get_catalog())
+        _index.refresh()
+    return _index
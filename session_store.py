@@ -0,0 +1,298 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+# -----------------------------------------
+# Store settings (override via .env)
+# -----------------------------------------
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")  # "memory" | "sqlite"
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+SESSION_TTL = float(os.getenv("SESSION_TTL", str(6 * 3600)))  # idle seconds before a session expires
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))  # per store
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024)))  # per store (memory backend)
+
+_MISSING = object()
+
+
+# =========================================
+# Base store
+# =========================================
+class SessionStore:
+    """
+    Dict-like session store with LRU + TTL eviction.
+
+    Keys are normalised to str; values must be JSON-serialisable. Values
+    returned by `get` must be written back with `set` after mutation.
+    If `max_items` is set, list values are trimmed to their last
+    `max_items` elements on write, so histories can never grow unbounded.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl: float = SESSION_TTL,
+        max_entries: int = SESSION_MAX_ENTRIES,
+        max_items: Optional[int] = None,
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_items = max_items
+
+    def _prepare(self, value: Any) -> Any:
+        if self.max_items and isinstance(value, list) and len(value) > self.max_items:
+            return value[-self.max_items:]
+        return value
+
+    def get(self, key, default=None) -> Any:
+        raise NotImplementedError
+
+    def set(self, key, value: Any) -> Any:
+        """Stores the value and returns what was stored (trimmed lists)."""
+        raise NotImplementedError
+
+    def delete(self, key) -> bool:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def pop(self, key, default=_MISSING) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        self.delete(key)
+        return value
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __getitem__(self, key) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value: Any):
+        self.set(key, value)
+
+    def __delitem__(self, key):
+        if not self.delete(key):
+            raise KeyError(key)
+
+
+# =========================================
+# In-process backend
+# =========================================
+class MemorySessionStore(SessionStore):
+    """
+    OrderedDict in least-recently-used order. Every access slides the
+    entry's expiry, so expired entries always sit at the front.
+    """
+
+    def __init__(self, namespace: str, max_bytes: int = SESSION_MAX_BYTES, **kwargs):
+        super().__init__(namespace, **kwargs)
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._data: "OrderedDict[str, list]" = OrderedDict()  # key -> [expires_at, size, value]
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float):
+        # Expired entries first (they are the least recently used), then
+        # LRU until both caps hold.
+        while self._data:
+            key, entry = next(iter(self._data.items()))
+            over = len(self._data) > self.max_entries or self.bytes > self.max_bytes
+            if entry[0] > now and not over:
+                break
+            self._data.popitem(last=False)
+            self.bytes -= entry[1]
+
+    def get(self, key, default=None) -> Any:
+        key = str(key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            if entry[0] <= now:
+                del self._data[key]
+                self.bytes -= entry[1]
+                return default
+            entry[0] = now + self.ttl
+            self._data.move_to_end(key)
+            return entry[2]
+
+    def set(self, key, value: Any) -> Any:
+        key = str(key)
+        value = self._prepare(value)
+        size = len(json.dumps(value, ensure_ascii=False, default=str))
+        now = time.monotonic()
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._data[key] = [now + self.ttl, size, value]
+            self.bytes += size
+            self._evict(now)
+        return value
+
+    def pop(self, key, default=_MISSING) -> Any:
+        with self._lock:
+            entry = self._data.pop(str(key), None)
+            if entry is not None:
+                self.bytes -= entry[1]
+        if entry is None or entry[0] <= time.monotonic():
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        return entry[2]
+
+    def delete(self, key) -> bool:
+        with self._lock:
+            entry = self._data.pop(str(key), None)
+            if entry is None:
+                return False
+            self.bytes -= entry[1]
+            return True
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._evict(time.monotonic())
+            return len(self._data)
+
+
+# =========================================
+# SQLite backend (survives restarts)
+# =========================================
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions persisted in one SQLite table shared by all namespaces.
+    Expired rows are purged and the entry cap enforced every
+    `purge_every` writes.
+
+    The database runs in WAL mode with a busy timeout, so several uvicorn
+    workers can share one file: readers never block the writer, and
+    `pop` is a single IMMEDIATE transaction, so a pending offer can only
+    be claimed by one worker.
+    """
+
+    def __init__(self, namespace: str, path: str = SESSION_DB_PATH, purge_every: int = 200, **kwargs):
+        super().__init__(namespace, **kwargs)
+        self.path = path
+        self.purge_every = purge_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=10000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_expiry ON sessions (namespace, expires_at)")
+
+    def get(self, key, default=None) -> Any:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM sessions WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (self.namespace, str(key), now),
+            ).fetchone()
+            if row is None:
+                return default
+            # Slide the expiry at most once per 5% of the TTL: keeps reads
+            # from turning into a write on every request.
+            if now + self.ttl - row[1] > self.ttl * 0.05:
+                self._conn.execute(
+                    "UPDATE sessions SET expires_at = ? WHERE namespace = ? AND key = ?",
+                    (now + self.ttl, self.namespace, str(key)),
+                )
+        return json.loads(row[0])
+
+    def set(self, key, value: Any) -> Any:
+        value = self._prepare(value)
+        payload = json.dumps(value, ensure_ascii=False, default=str)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sessions (namespace, key, value, expires_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+                (self.namespace, str(key), payload, time.time() + self.ttl),
+            )
+            self._writes += 1
+            if self._writes % self.purge_every == 0:
+                self._purge()
+        return value
+
+    def _purge(self):
+        self._conn.execute(
+            "DELETE FROM sessions WHERE namespace = ? AND expires_at <= ?",
+            (self.namespace, time.time()),
+        )
+        # expires_at slides with every access, so the lowest values are the LRU rows
+        self._conn.execute(
+            "DELETE FROM sessions WHERE namespace = ? AND key IN ("
+            " SELECT key FROM sessions WHERE namespace = ?"
+            " ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.namespace, self.namespace, self.max_entries),
+        )
+
+    def pop(self, key, default=_MISSING) -> Any:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM sessions WHERE namespace = ? AND key = ?",
+                    (self.namespace, str(key)),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "DELETE FROM sessions WHERE namespace = ? AND key = ?",
+                        (self.namespace, str(key)),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None or row[1] <= time.time():
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        return json.loads(row[0])
+
+    def delete(self, key) -> bool:
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM sessions WHERE namespace = ? AND key = ?",
+                (self.namespace, str(key)),
+            )
+        return cur.rowcount > 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM sessions WHERE namespace = ? AND expires_at > ?",
+                (self.namespace, time.time()),
+            ).fetchone()[0]
+
+
+# -----------------------------------------
+# Factory
+# -----------------------------------------
+def create_store(namespace: str, backend: str = SESSION_BACKEND, **kwargs) -> SessionStore:
+    if backend == "memory":
+        return MemorySessionStore(namespace, **kwargs)
+    if backend == "sqlite":
+        return SQLiteSessionStore(namespace, **kwargs)
+    raise ValueError(f"Unknown session backend: {backend}")
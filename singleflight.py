@@ -0,0 +1,145 @@
+import os
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from response_cache import normalize_query
+import metrics
+
+# -----------------------------------------
+# Coalescing settings (override via .env)
+# -----------------------------------------
+COALESCE_ENABLED = os.getenv("COALESCE", "1") == "1"
+# "exact": trimmed + lowercased message; "normalized": punctuation and filler
+# words dropped, order kept (same form the response cache uses)
+COALESCE_KEY_MODE = os.getenv("COALESCE_KEY_MODE", "normalized")
+
+
+def coalesce_key(message: str, *scope: str, mode: str = None) -> Optional[str]:
+    """
+    Key under which identical in-flight requests share one upstream call.
+    `scope` holds whatever else shapes the answer (prompt version, model, ...).
+    None when coalescing is off or the message normalizes to nothing.
+    """
+    if not COALESCE_ENABLED:
+        return None
+    mode = mode or COALESCE_KEY_MODE
+    text = normalize_query(message) if mode == "normalized" else (message or "").strip().lower()
+    if not text:
+        return None
+    return "\x00".join((*scope, text))
+
+
+class _Flight:
+    """Counters shared by the async and threaded variants."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.stats = {"leaders": 0, "coalesced": 0, "errors": 0}
+        metrics.gauge("choosie_coalesced_calls", lambda: self.stats["coalesced"],
+                      "Upstream calls avoided by joining an identical in-flight call", flight=name)
+        metrics.gauge("choosie_coalesce_leaders", lambda: self.stats["leaders"],
+                      "Upstream calls made through a single-flight group", flight=name)
+
+    def metrics(self) -> Dict[str, float]:
+        total = self.stats["leaders"] + self.stats["coalesced"]
+        return {
+            **self.stats,
+            "coalesced_ratio": round(self.stats["coalesced"] / total, 4) if total else 0.0,
+        }
+
+
+# =========================================
+# asyncio: chatbot.py (FastAPI)
+# =========================================
+class AsyncSingleFlight(_Flight):
+    """
+    The first caller for a key runs `fn`; callers arriving while it is in
+    flight await the same future. Results are not kept afterwards (that is
+    the response cache's job), and a failure is shared by every waiter.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Optional[Hashable], fn: Callable[[], Awaitable[Any]]) -> Any:
+        if key is None:
+            return await fn()
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            # shield: a waiter that disconnects must not cancel the leader's call
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self.stats["leaders"] += 1
+        try:
+            result = await fn()
+        except BaseException as e:
+            self.stats["errors"] += 1
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # mark retrieved: no "never retrieved" warning without waiters
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+
+# =========================================
+# threads: bot.py (sync OpenAI client)
+# =========================================
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight(_Flight):
+    """Thread-based counterpart of AsyncSingleFlight for blocking calls."""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Optional[Hashable], fn: Callable[[], Any]) -> Any:
+        if key is None:
+            return fn()
+
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+                self.stats["leaders"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            self.stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.done.set()
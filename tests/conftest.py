@@ -0,0 +1,22 @@
+import os
+import sys
+import tempfile
+
+# Modules read their settings at import time: point every on-disk store
+# at a scratch directory and use the offline LLM backend before any import.
+_scratch = tempfile.mkdtemp(prefix="choosie-tests-")
+os.environ.update(
+    LLM_BACKEND="fake",
+    LLM_FAKE_LATENCY_MS="1",
+    PROMO_DB_PATH=os.path.join(_scratch, "promos.db"),
+    SESSION_DB_PATH=os.path.join(_scratch, "sessions.db"),
+    QR_FOLDER=os.path.join(_scratch, "qr_codes"),
+    VECTOR_INDEX_DIR=os.path.join(_scratch, "vector_index"),
+    METRICS_LOG="0",
+)
+
+# Top-level modules live in the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # Files/*.json are read relative to the working directory
@@ -0,0 +1,79 @@
+import json
+import os
+import time
+
+import pytest
+
+from catalog import Catalog, CatalogSnapshot
+
+RESTAURANTS = [
+    {"name": "Cibo", "category": "Italian", "address": "Glorietta, Ayala Center, Makati City", "description": "Pasta"},
+    {"name": "Just Thai", "category": "Thai", "address": "Alabang Town Center, Muntinlupa City", "description": "Curry"},
+]
+ITEMS = [
+    {"id": 1, "restaurant_name": "Cibo", "name": "Spaghetti", "price": "232.00", "discount": "12.00", "free_items": []},
+]
+
+
+def _write(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(data if isinstance(data, str) else json.dumps(data))
+    # mtime granularity can be coarse: make sure every write changes the signature
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def files(tmp_path):
+    res, details = tmp_path / "Res_List.json", tmp_path / "details.json"
+    _write(res, RESTAURANTS)
+    _write(details, ITEMS)
+    return str(res), str(details)
+
+
+def test_reload_picks_up_changes(files):
+    catalog = Catalog(*files, check_interval=0)
+    assert catalog.refresh(force=True)
+    first = catalog.current()
+    assert [r["name"] for r in first.restaurants] == ["Cibo", "Just Thai"]
+
+    _write(files[0], RESTAURANTS[:1])
+    assert catalog.refresh(force=True)
+    assert catalog.current().version != first.version
+    assert len(catalog.current()) == 1
+    assert len(first) == 2  # earlier snapshots are never mutated
+
+
+def test_malformed_file_keeps_last_good_snapshot(files):
+    catalog = Catalog(*files, check_interval=0)
+    catalog.refresh(force=True)
+    good = catalog.current()
+
+    _write(files[0], '[{"name": "Cibo", ')  # caught mid-write
+    assert not catalog.refresh(force=True)
+    assert catalog.current() is good
+    assert catalog.refresh() is False  # the same broken file is not re-parsed
+
+    _write(files[0], RESTAURANTS)
+    assert catalog.refresh(force=True)
+    assert catalog.current() is not good
+
+
+def test_background_reload_swaps_snapshot(files):
+    catalog = Catalog(*files, check_interval=0)
+    catalog.refresh(force=True)
+    version = catalog.version
+
+    _write(files[1], ITEMS + [dict(ITEMS[0], id=2, name="Lasagna")])
+    catalog.refresh()  # rebuilds off the request path
+    for _ in range(100):
+        if catalog._snapshot.version != version:
+            break
+        time.sleep(0.01)
+    assert len(catalog.current().menu("Cibo")) == 2
+
+
+def test_discounts_are_peso_amounts():
+    snapshot = CatalogSnapshot("v", RESTAURANTS, ITEMS)
+    item = snapshot.menu("cibo")[0]
+    assert (item.price, item.discount, item.net_price) == (232.0, 12.0, 220.0)
@@ -0,0 +1,49 @@
+from catalog import CatalogSnapshot
+from geo import Area, Place, locate, nearby, normalize_address
+from retrieval import rank_candidates
+
+
+def test_locate_reads_area_and_proximity():
+    area, near = locate("cozy italian near BGC")
+    assert area.key == "bgc" and near
+    area, near = locate("sushi in Makati")
+    assert area.kind == "city" and not near
+    assert locate("sushi please") == (None, False)
+
+
+def test_normalize_address_resolves_districts():
+    place = normalize_address("Level 3, Shangri-La at the Fort, Taguig City")
+    assert (place.city, place.district) == ("taguig", "bgc")
+    assert place.lat is not None
+    unknown = normalize_address("12 Some Street, Atlantis")
+    assert (unknown.city, unknown.lat) == ("atlantis", None)
+
+
+def test_nearby_members_first_then_within_reach():
+    area = Area("bgc", "BGC", "district", "taguig", 14.55, 121.05, 1.0)
+    inside = Place("taguig", "bgc", ("bgc", "taguig"), 14.55, 121.05)
+    close = Place("makati", None, ("makati",), 14.56, 121.03)  # ~2.4 km away
+    far = Place("quezon city", None, ("quezon city",), 14.68, 121.04)
+    by_place = [(far, [{"name": "Far"}]), (close, [{"name": "Close"}]), (inside, [{"name": "Inside"}])]
+
+    assert [r["name"] for r, _ in nearby(area, by_place, near=True)] == ["Inside", "Close"]
+    city = area._replace(kind="city")
+    assert [r["name"] for r, _ in nearby(city, by_place)] == ["Inside"]
+
+
+def test_snapshot_resolves_area_aliases():
+    restaurants = [
+        {"name": "Cibo", "address": "Glorietta, Ayala Center, Makati City"},
+        {"name": "Just Thai", "address": "Alabang Town Center, Muntinlupa City"},
+    ]
+    snapshot = CatalogSnapshot("v", restaurants, [])
+    assert [r["name"] for r in snapshot.in_area("Makati City")] == ["Cibo"]
+    assert [r["name"] for r in snapshot.in_area("muntinlupa")] == ["Just Thai"]
+
+
+def test_rank_candidates_stays_in_the_named_area():
+    ranked, area, near = rank_candidates("thai food in alabang", 3)
+    assert area is not None and area.key == "alabang"
+    assert ranked[0]["name"] == "Just Thai"
+    allowed = {r["name"] for r in near}
+    assert all(r["name"] in allowed for r in ranked)
@@ -0,0 +1,68 @@
+import pytest
+
+from history import HISTORY_MIN_MESSAGES, HistoryManager, _digest
+from session_store import MemorySessionStore
+
+REPLY = (
+    "Try **Cibo** in Glorietta for pasta. **Mendokoro Ramenba** is great for ramen.\n"
+    "QR: [one-time QR code shown to the user]\n"
+    "Token: abc"
+)
+
+
+@pytest.fixture
+def manager():
+    return HistoryManager(MemorySessionStore("chat"), budget=120, summary_budget=40)
+
+
+def _chat(manager, turns):
+    conv = manager.new()
+    for i in range(turns):
+        manager.append(conv, "user", f"Question {i}: where can I get good pasta near Makati tonight?")
+        manager.append(conv, "assistant", REPLY)
+        manager.compact(conv)
+    return conv
+
+
+def test_digest_keeps_first_sentence_and_names():
+    line = _digest({"role": "assistant", "content": REPLY})
+    assert line == "Assistant: Try **Cibo** in Glorietta for pasta. (mentioned: Cibo, Mendokoro Ramenba)"
+    assert "QR" not in line and "Token" not in line
+
+
+def test_compaction_holds_the_token_budget(manager):
+    conv = _chat(manager, 10)
+    assert sum(conv["tokens"]) <= manager.budget
+    assert sum(t for _, t in conv["summary"]) <= manager.summary_budget
+    assert conv["messages"][-1]["content"] == REPLY  # newest messages stay verbatim
+    assert len(conv["tokens"]) == len(conv["messages"])
+
+    usage = manager.usage(conv)
+    assert usage["tokens_after"] < usage["tokens_before"]
+
+
+def test_latest_exchange_is_never_compacted():
+    manager = HistoryManager(MemorySessionStore("chat"), budget=1)
+    conv = _chat(manager, 3)
+    assert len(conv["messages"]) == HISTORY_MIN_MESSAGES
+    assert conv["messages"][0]["content"].startswith("Question 2")
+
+
+def test_prompt_messages_lead_with_the_summary(manager):
+    assert manager.prompt_messages(_chat(manager, 1))[0]["role"] == "user"  # nothing compacted yet
+
+    messages = manager.prompt_messages(_chat(manager, 10))
+    assert messages[0]["role"] == "system"
+    assert messages[0]["content"].startswith("Earlier in this conversation:")
+    assert messages[-1]["content"] == REPLY
+
+
+def test_save_compacts_and_round_trips(manager):
+    conv = manager.new()
+    for i in range(10):
+        manager.append(conv, "user", f"Question {i}: anything vegetarian in BGC for a group of six?")
+    manager.save("s1", conv)
+    stored = manager.load("s1")
+    assert sum(stored["tokens"]) <= manager.budget
+    assert stored["summary"]
+    assert manager.load("nobody") == manager.new()
@@ -0,0 +1,99 @@
+import asyncio
+import io
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+import image_cache
+from image_cache import VisionCache, image_fingerprint
+
+
+def _photo(quality=90, shift=0) -> bytes:
+    img = Image.new("RGB", (96, 64))
+    img.putdata([((x * 3 + shift) % 256, (y * 4) % 256, (x + y) % 256) for y in range(64) for x in range(96)])
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=quality)
+    return out.getvalue()
+
+
+def test_exact_reupload_hits():
+    cache = VisionCache()
+    key = image_fingerprint(_photo())
+    assert cache.get(key) is None
+    cache.put(key, "Menu: Spaghetti ₱232")
+    assert cache.get(image_fingerprint(_photo())) == "Menu: Spaghetti ₱232"
+    assert cache.metrics()["hits_exact"] == 1 and cache.metrics()["misses"] == 1
+
+
+def test_near_duplicates_match_only_when_enabled(monkeypatch):
+    cache = VisionCache()
+    original, recompressed = image_fingerprint(_photo(90)), image_fingerprint(_photo(40))
+    assert original[0] != recompressed[0]
+    cache.put(original, "Menu: Spaghetti ₱232")
+
+    assert cache.get(recompressed) is None  # default -1: byte-identical uploads only
+    monkeypatch.setattr(image_cache, "VISION_HASH_DISTANCE", 6)
+    assert cache.get(recompressed) == "Menu: Spaghetti ₱232"
+    assert cache.metrics()["hits_similar"] == 1
+
+
+def test_entries_expire_and_are_bounded():
+    expired = VisionCache(ttl=-1)
+    expired.put(("a", None), "menu")
+    assert expired.get(("a", None)) is None
+
+    small = VisionCache(max_entries=2)
+    for sha in "abc":
+        small.put((sha, None), f"menu {sha}")
+    assert small.get(("a", None)) is None  # least recently used
+    assert small.get(("c", None)) == "menu c"
+    assert small.metrics()["entries"] == 2
+
+
+def test_seen_before_records_uploads():
+    cache = VisionCache()
+    key = image_fingerprint(_photo())
+    assert not cache.seen_before(key)
+    assert cache.seen_before(key)
+
+
+def test_chat_describes_only_repeated_uploads(monkeypatch):
+    import chatbot
+
+    monkeypatch.setattr(chatbot, "vision_cache", VisionCache())
+    describe_calls = []
+    describe = chatbot._describe_image
+
+    async def counting_describe(uploaded, vision_key):
+        describe_calls.append(vision_key)
+        return await describe(uploaded, vision_key)
+
+    monkeypatch.setattr(chatbot, "_describe_image", counting_describe)
+    data = _photo()
+    upload = SimpleNamespace(filename="menu.jpg")
+
+    async def turn(session):
+        uploaded = {"mime_type": "image/jpeg", "data": data, "stats": {}}
+        prepared = await chatbot._prepare_turn(session, "what's good here?", upload, uploaded)
+        await asyncio.gather(*chatbot._describe_tasks)
+        return prepared, uploaded["stats"]["vision_cache"]
+
+    async def three_uploads():
+        return [await turn(f"vision-{i}") for i in range(3)]
+
+    (first, s1), (second, s2), (third, s3) = asyncio.run(three_uploads())
+    # First upload: one call with the image inline, nothing described
+    assert (s1, first["has_image"]) == ("miss", True)
+    # Same file again: still answered inline, described in the background
+    assert (s2, second["has_image"]) == ("repeat", True)
+    assert len(describe_calls) == 1
+    # From then on: answered from the cached description
+    assert (s3, third["has_image"]) == ("hit", False)
+    assert "as described by the vision model" in third["messages"][-1]["content"]
+
+
+@pytest.mark.parametrize("data", [b"%PDF-1.4 menu", b""])
+def test_unreadable_files_get_exact_matching_only(data):
+    sha, phash = image_fingerprint(data)
+    assert phash is None and len(sha) == 64
@@ -0,0 +1,167 @@
+import asyncio
+import itertools
+import time
+
+import pytest
+
+from llm_client import CompletionBackend, UpstreamError
+from llm_gateway import CircuitBreaker, Deadline, LLMGateway, SyncLLMGateway, is_retryable, request_deadline
+
+_names = itertools.count()
+
+
+class ScriptedBackend(CompletionBackend):
+    """Plays one step per attempt: "hang", an exception to raise, or the reply text."""
+
+    name = "scripted"
+
+    def __init__(self, *script, timeout: float = 0.2):
+        super().__init__(timeout=timeout)
+        self.script = list(script)
+        self.timeouts = []
+
+    async def _next(self, timeout):
+        self.timeouts.append(timeout)
+        step = self.script.pop(0) if self.script else "ok"
+        if step == "hang":
+            await asyncio.Event().wait()
+        if isinstance(step, BaseException):
+            raise step
+        return step
+
+    async def _complete(self, messages, model, temperature, max_tokens, timeout, json_mode, usage):
+        return await self._next(timeout)
+
+    async def _stream(self, messages, model, temperature, max_tokens, timeout, usage):
+        reply = await self._next(timeout)
+        for word in reply.split(" "):
+            if word == "<crash>":
+                raise UpstreamError(503)
+            yield word + " "
+
+
+def _gateway(backend):
+    # A fresh provider name per test: breakers are shared per provider
+    return LLMGateway(lambda: backend, provider=f"test-{next(_names)}")
+
+
+def _complete(backend, deadline=3.0):
+    gateway = _gateway(backend)
+    started = time.monotonic()
+    completion = asyncio.run(gateway.complete(
+        [{"role": "user", "content": "pasta"}], model="m", deadline=Deadline(deadline), fallback_query="pasta",
+    ))
+    return completion, time.monotonic() - started
+
+
+def test_hung_attempt_is_retried_within_the_deadline():
+    backend = ScriptedBackend("hang", "ok", timeout=0.2)
+    completion, elapsed = _complete(backend, deadline=3.0)
+    assert (completion.text, completion.source, completion.attempts) == ("ok", "llm", 2)
+    assert elapsed < 1.0
+    assert backend.timeouts[0] == pytest.approx(0.2)  # LLM_TIMEOUT caps the attempt, not the 3s deadline
+
+
+def test_attempt_timeout_never_exceeds_the_deadline():
+    backend = ScriptedBackend("hang", "hang", "hang", timeout=30)
+    completion, elapsed = _complete(backend, deadline=0.3)
+    assert completion.source == "fallback"
+    assert elapsed < 0.6
+
+
+def test_transient_errors_are_retried():
+    completion, _ = _complete(ScriptedBackend(UpstreamError(503), UpstreamError(429), "ok"))
+    assert (completion.source, completion.attempts) == ("llm", 3)
+
+
+def test_permanent_errors_fall_back_at_once():
+    completion, _ = _complete(ScriptedBackend(ValueError("bad request"), "ok"))
+    assert (completion.source, completion.attempts) == ("fallback", 1)
+    assert completion.text  # catalog fallback reply
+
+
+def test_retries_are_bounded():
+    completion, _ = _complete(ScriptedBackend(*[UpstreamError(503)] * 5))
+    assert (completion.source, completion.attempts) == ("fallback", 3)  # first try + LLM_RETRIES
+
+
+def test_stream_retries_before_the_first_chunk_only():
+    async def run(backend):
+        info = {}
+        chunks = [c async for c in _gateway(backend).stream(
+            [{"role": "user", "content": "pasta"}], model="m", deadline=Deadline(3), info=info,
+        )]
+        return "".join(chunks).strip(), info["source"]
+
+    assert asyncio.run(run(ScriptedBackend("hang", "hello there"))) == ("hello there", "llm")
+    text, source = asyncio.run(run(ScriptedBackend("hello <crash>", "never")))
+    assert (text, source) == ("hello", "interrupted")
+
+
+def test_breaker_opens_probes_and_closes():
+    breaker = CircuitBreaker(f"test-{next(_names)}", window=4, ratio=0.5, cooldown=0.05)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()      # one half-open probe
+    assert not breaker.allow()  # ... and only one
+    breaker.success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_open_breaker_skips_the_provider():
+    backend = ScriptedBackend()
+    gateway = _gateway(backend)
+    gateway.breaker.state, gateway.breaker.opened_at = "open", time.monotonic()
+    completion = asyncio.run(gateway.complete([{"role": "user", "content": "pasta"}], model="m"))
+    assert (completion.source, completion.attempts) == ("fallback", 0)
+    assert backend.timeouts == []
+
+
+def test_nested_deadlines_only_shorten():
+    with request_deadline(5) as outer:
+        with request_deadline(1) as inner:
+            assert inner.remaining() <= 1
+        with request_deadline(10) as longer:
+            assert longer is outer
+
+
+def test_sync_gateway_caps_each_attempt():
+    seen = []
+
+    def call(timeout):
+        seen.append(timeout)
+        if len(seen) == 1:
+            raise TimeoutError()
+        return "ok"
+
+    gateway = SyncLLMGateway(f"test-{next(_names)}", timeout=0.2)
+    completion = gateway.call(call, deadline=Deadline(5))
+    assert (completion.source, completion.attempts) == ("llm", 2)
+    assert all(t <= 0.2 for t in seen)
+
+
+class APIConnectionError(Exception):
+    pass
+
+
+class BadRequestError(Exception):
+    status_code = 400
+
+
+@pytest.mark.parametrize("exc, retry", [
+    (asyncio.TimeoutError(), True),
+    (ConnectionResetError(), True),
+    (APIConnectionError(), True),
+    (UpstreamError(503), True),
+    (UpstreamError(429), True),
+    (UpstreamError(409), False),
+    (BadRequestError(), False),
+    (ValueError("bug"), False),
+    (FileNotFoundError(), False),
+])
+def test_is_retryable(exc, retry):
+    assert is_retryable(exc) is retry
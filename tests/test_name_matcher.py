@@ -0,0 +1,54 @@
+import pytest
+
+from name_matcher import build_matcher, find_restaurants, fold
+
+RESTAURANTS = [
+    {"name": "Hong Kong Kitchen"},
+    {"name": "Kong"},
+    {"name": "Café Habana"},
+    {"name": "The Wholesome Table"},
+    {"name": "Mendokoro Ramenba", "aliases": ["Mendokoro"]},
+]
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return build_matcher(RESTAURANTS)
+
+
+def _names(matcher, text):
+    return [m.name for m in matcher.find_all(text)]
+
+
+def test_spans_point_into_the_original_text(matcher):
+    reply = "Try CAFÉ  Habana, then Mendokoro."
+    mentions = matcher.find_all(reply)
+    assert [m.name for m in mentions] == ["Café Habana", "Mendokoro Ramenba"]
+    assert [reply[m.start:m.end] for m in mentions] == ["CAFÉ  Habana", "Mendokoro"]
+
+
+@pytest.mark.parametrize("text, names", [
+    ("Hong Kong Kitchen has dim sum", ["Hong Kong Kitchen"]),  # longest match wins
+    ("Kong is open late", ["Kong"]),
+    ("Kongs and HongKong do not count", []),  # word boundaries
+    ("cafe habana!", ["Café Habana"]),  # accents and punctuation folded
+    ("Wholesome Table for brunch", ["The Wholesome Table"]),  # "The ..." alias
+    ("Kong, then Kong again", ["Kong", "Kong"]),
+    ("", []),
+])
+def test_find_all(matcher, text, names):
+    assert _names(matcher, text) == names
+
+
+def test_fold_keeps_offsets_per_character():
+    folded, offsets = fold("Ñam-Ñam!")
+    assert folded == "nam nam "
+    assert len(offsets) == len(folded) and offsets[4] == 4
+
+
+def test_catalog_matcher_finds_catalog_names():
+    from catalog import get_catalog
+
+    name = get_catalog().current().restaurants[0]["name"]
+    assert [m.name for m in find_restaurants(f"How about {name}?")] == [name]
+    assert find_restaurants(None) == []
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from offers import OFFERED, SELECTED, advance, after_reply, match_item, offer_from_reply
+
+OFFER_REPLY = "You've unlocked a deal at Fresca Trattoria! Want me to generate the QR code?"
+
+
+@pytest.fixture
+def offered():
+    offer = offer_from_reply(OFFER_REPLY)
+    assert offer["state"] == OFFERED and offer["restaurant"] == "Fresca Trattoria"
+    return offer
+
+
+@pytest.fixture
+def selected(offered):
+    offer = advance(offered, "the pasta").offer
+    assert offer["state"] == SELECTED and offer["item"]["name"] == "Cook Pasta"
+    return offer
+
+
+def test_offer_flow_pick_then_confirm(offered):
+    decision = advance(offered, "2")
+    assert decision.action == "reply"
+    assert decision.offer["item"]["name"] == offered["items"][1]["name"]
+    assert advance(decision.offer, "yes").action == "issue"
+    assert advance(decision.offer, "no thanks").offer is None
+
+
+@pytest.mark.parametrize("message, name", [
+    ("2", "Cook Pasta"),
+    ("the second one", "Cook Pasta"),
+    ("number 3", "Ice Cream"),
+    ("the pasta", "Cook Pasta"),
+    ("I'll take the ice cream please", "Ice Cream"),
+])
+def test_selection_shaped_messages_pick(offered, message, name):
+    assert match_item(message, offered["items"])["name"] == name
+
+
+@pytest.mark.parametrize("message", [
+    "any japanese near BGC for two?",
+    "is it open at 2?",
+    "where can I get ice cream in Makati?",
+    "where can I get ice cream in Makati",
+    "table for two please",
+])
+def test_other_requests_reach_the_model(offered, message):
+    assert advance(offered, message).action == "pass"
+
+
+@pytest.mark.parametrize("message", [
+    "is the pasta spicy?",
+    "is the pasta spicy",
+    "table for two please",
+    "any japanese near BGC for two?",
+])
+def test_only_explicit_yes_issues(selected, message):
+    decision = advance(selected, message)
+    assert decision.action == "pass"
+    assert decision.offer == selected
+
+
+def test_naming_the_selected_item_again_asks_for_consent(selected):
+    decision = advance(selected, "the pasta")
+    assert decision.action == "reply"
+    assert "QR" in decision.reply
+
+
+def test_offer_needs_an_offer_cue():
+    assert offer_from_reply("Fresca Trattoria has great pasta and tiramisu.") is None
+
+
+def test_after_reply_keeps_offer_only_while_discussed(offered):
+    assert after_reply(offered, "Fresca Trattoria's pasta is their best seller.") == offered
+    assert after_reply(offered, "Here are some ramen places instead.") is None
+
+
+def test_concurrent_yes_issues_one_qr(selected):
+    import chatbot
+
+    session = "race"
+    chatbot.pending_offers.set(session, selected)
+
+    async def both():
+        return await asyncio.gather(*(chatbot._prepare_turn(session, "yes") for _ in range(2)))
+
+    turns = asyncio.run(both())
+    issued = [t["result"]["qr"] for t in turns if t.get("result", {}).get("qr")]
+    assert len(issued) == 1
+    assert chatbot.pending_offers.get(session) is None
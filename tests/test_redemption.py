@@ -0,0 +1,82 @@
+import threading
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from redemption import PromoTokenStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PromoTokenStore(str(tmp_path / "promos.db"))
+
+
+def test_redeem_states(store):
+    store.issue("fresh", "Cibo · Spaghetti · ₱300.00")
+    store.issue("stale", "Cibo · Spaghetti · ₱300.00", ttl=-1)
+
+    first = store.redeem("fresh")
+    assert first["status"] == "success"
+    assert first["offer"] == "Cibo · Spaghetti · ₱300.00"
+    assert store.redeem("fresh")["status"] == "used"
+    assert store.redeem("stale")["status"] == "expired"
+    assert store.redeem("missing")["status"] == "invalid"
+
+
+def test_concurrent_redeem_succeeds_once(store):
+    store.issue("t", "offer")
+    barrier = threading.Barrier(12)
+    statuses = []
+
+    def scan():
+        barrier.wait()
+        statuses.append(store.redeem("t")["status"])
+
+    threads = [threading.Thread(target=scan) for _ in range(12)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert statuses.count("success") == 1
+    assert statuses.count("used") == 11
+
+
+def test_purge_drops_only_long_expired(store):
+    store.issue("old", "offer", ttl=-10)
+    store.issue("live", "offer")
+    assert store.purge(grace=5) == 1
+    assert store.get("old") is None
+    assert store.get("live") is not None
+
+
+def test_status_does_not_use_the_token(store):
+    store.issue("t", "offer")
+    assert store.status("t")["status"] == "valid"
+    assert store.status("t")["status"] == "valid"
+    assert store.redeem("t")["status"] == "success"
+    assert store.status("t")["status"] == "used"
+    assert store.status("missing")["status"] == "invalid"
+
+
+def test_redeem_endpoint_status_codes():
+    import main
+    from redemption import promo_tokens
+
+    token = str(uuid.uuid4())
+    promo_tokens.issue(token, "offer")
+    expired = str(uuid.uuid4())
+    promo_tokens.issue(expired, "offer", ttl=-1)
+
+    client = TestClient(main.app)
+    # Link previews / prefetches (GET) only read the status
+    for _ in range(3):
+        preview = client.get("/promo/redeem", params={"token": token})
+        assert preview.status_code == 200 and preview.json()["status"] == "valid"
+
+    assert client.post("/promo/redeem", params={"token": token}).status_code == 200
+    assert client.post("/promo/redeem", params={"token": token}).status_code == 409
+    assert client.get("/promo/redeem", params={"token": token}).json()["status"] == "used"
+    assert client.post("/promo/redeem", params={"token": expired}).status_code == 410
+    assert client.get("/promo/redeem", params={"token": expired}).status_code == 410
+    assert client.post("/promo/redeem", params={"token": "nope"}).status_code == 404
@@ -0,0 +1,50 @@
+import pytest
+
+import response_cache
+from response_cache import ResponseCache, normalize_query
+
+
+@pytest.mark.parametrize("a, b", [
+    ("Any romantic dinner in Makati?", "romantic dinner in makati"),
+    ("Where's the best RAMEN near BGC!!", "best ramen near bgc"),
+    ("Manila’s best sisig", "manila sisig"),
+])
+def test_normalize_query_merges_filler_variants(a, b):
+    assert normalize_query(a) == normalize_query(b)
+
+
+@pytest.mark.parametrize("a, b", [
+    ("dinner near Makati", "Makati dinner"),  # word order kept
+    ("ramen near BGC", "ramen in BGC"),  # location words kept
+    ("pizza from Cibo", "pizza at Cibo"),
+])
+def test_normalize_query_keeps_meaning(a, b):
+    assert normalize_query(a) != normalize_query(b)
+
+
+def test_exact_and_normalized_hits():
+    cache = ResponseCache()
+    cache.put("Romantic dinner in Makati", "v1", "Try Cibo.")
+    assert cache.get("romantic dinner in makati ", "v1") == "Try Cibo."
+    assert cache.get("Any romantic dinner in Makati?", "v1") == "Try Cibo."
+    assert cache.get("Romantic dinner in Makati", "v2") is None  # other prompt version
+    assert (cache.stats["hits_exact"], cache.stats["hits_normalized"], cache.stats["misses"]) == (1, 1, 1)
+
+
+def test_catalog_change_drops_every_entry(monkeypatch):
+    version = ["catalog-1"]
+    monkeypatch.setattr(response_cache, "catalog_version", lambda: version[0])
+    cache = ResponseCache()
+    cache.put("ramen near BGC", "v1", "Try Mendokoro.")
+    assert cache.get("ramen near BGC", "v1") == "Try Mendokoro."
+
+    version[0] = "catalog-2"
+    assert cache.get("ramen near BGC", "v1") is None
+    assert cache.stats["invalidations"] == 1
+    assert cache.metrics()["entries"] == 0
+
+
+def test_entries_expire():
+    cache = ResponseCache(ttl=-1)
+    cache.put("ramen near BGC", "v1", "Try Mendokoro.")
+    assert cache.get("ramen near BGC", "v1") is None
@@ -0,0 +1,59 @@
+import time
+from types import SimpleNamespace
+
+from search_index import RestaurantIndex, tokenize
+
+RESTAURANTS = [
+    {"name": "Pasta Place", "category": "Italian", "description": "homemade pasta and tiramisu"},
+    {"name": "Sushi Bar", "category": "Japanese", "description": "fresh sushi rolls and sashimi"},
+    {"name": "Taqueria", "category": "Mexican", "description": "street tacos and burritos, sushi burritos too"},
+]
+
+
+class _Catalog:
+    """Stands in for catalog.Catalog: a version plus a restaurant list."""
+
+    def __init__(self, restaurants, version="v1"):
+        self.snapshot = SimpleNamespace(version=version, restaurants=restaurants)
+
+    def current(self):
+        return self.snapshot
+
+    def refresh(self, force=False):
+        return False
+
+
+def _names(results):
+    return [r["name"] for r, _ in results]
+
+
+def test_tokenize_drops_stopwords_and_adds_bigrams():
+    assert tokenize("The best Sushi in Parañaque") == ["sushi", "paranaque", "sushi_paranaque"]
+
+
+def test_field_weights_rank_name_matches_first():
+    index = RestaurantIndex()
+    index.update(RESTAURANTS)
+    assert _names(index.search("sushi", k=2)) == ["Sushi Bar", "Taqueria"]
+    assert index.search("the and of") == []
+
+
+def test_update_reindexes_only_changes():
+    index = RestaurantIndex()
+    index.update(RESTAURANTS)
+    edited = [RESTAURANTS[0], dict(RESTAURANTS[1], description="ramen"), {"name": "Cafe", "description": "coffee"}]
+    assert index.update(edited) == {"added": 1, "updated": 1, "removed": 1}
+    assert _names(index.search("ramen")) == ["Sushi Bar"]
+    assert _names(index.search("tacos")) == []
+
+
+def test_catalog_change_rebuilds_in_background():
+    index = RestaurantIndex(_Catalog(RESTAURANTS[:1]))
+    assert index.refresh()  # first build is inline
+    index.catalog.snapshot = SimpleNamespace(version="v2", restaurants=RESTAURANTS)
+    index.search("sushi")   # starts the rebuild, answers from the current state
+    for _ in range(200):
+        if len(index) == len(RESTAURANTS):
+            break
+        time.sleep(0.01)
+    assert _names(index.search("sushi", k=1)) == ["Sushi Bar"]
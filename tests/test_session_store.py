@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+
+from session_store import MemorySessionStore, SQLiteSessionStore
+
+OFFER = {"state": "selected", "restaurant": "Fresca Trattoria", "items": [], "item": {"name": "Cook Pasta"}}
+
+
+def _race(fn, n=16):
+    """Runs `fn` from n threads at once; returns what each one got."""
+    barrier = threading.Barrier(n)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(fn())
+
+    threads = [threading.Thread(target=worker) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_pending_offer_pop_is_claimed_once(backend, tmp_path):
+    if backend == "memory":
+        stores = [MemorySessionStore("pending_offers")] * 2
+    else:  # two connections to one file, as two uvicorn workers would have
+        path = str(tmp_path / "sessions.db")
+        stores = [SQLiteSessionStore("pending_offers", path=path) for _ in range(2)]
+    stores[0].set("s1", OFFER)
+
+    results = _race(lambda: stores[threading.get_ident() % 2].pop("s1", None))
+    assert [r for r in results if r is not None] == [OFFER]
+    assert stores[1].get("s1") is None
+
+
+def test_sqlite_state_is_shared_between_connections(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    a, b = SQLiteSessionStore("chat", path=path), SQLiteSessionStore("chat", path=path)
+    other = SQLiteSessionStore("pending_offers", path=path)
+    a.set("s1", {"messages": ["hi"]})
+    assert b.get("s1") == {"messages": ["hi"]}
+    assert other.get("s1") is None  # namespaces do not collide
+    assert b.delete("s1") and a.get("s1") is None
+
+
+def test_sqlite_pop_missing_key():
+    store = SQLiteSessionStore("pending_offers", path=":memory:")
+    assert store.pop("nobody", None) is None
+    with pytest.raises(KeyError):
+        store.pop("nobody")
+
+
+def test_expired_entries_are_gone(tmp_path):
+    for store in (MemorySessionStore("s", ttl=-1), SQLiteSessionStore("s", path=str(tmp_path / "s.db"), ttl=-1)):
+        store.set("k", 1)
+        assert store.get("k") is None
+        assert store.pop("k", None) is None
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import singleflight
+from singleflight import AsyncSingleFlight, SingleFlight, coalesce_key
+
+
+def test_async_identical_calls_share_one_upstream_call():
+    flight = AsyncSingleFlight("test_async")
+    calls = []
+
+    async def upstream():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "Try Cibo."
+
+    async def burst():
+        return await asyncio.gather(*(flight.do("k", upstream) for _ in range(10)))
+
+    assert asyncio.run(burst()) == ["Try Cibo."] * 10
+    assert len(calls) == 1
+    assert flight.metrics()["coalesced"] == 9 and not flight._inflight
+
+
+def test_async_failure_is_shared_and_not_kept():
+    flight = AsyncSingleFlight("test_async_error")
+
+    async def failing():
+        await asyncio.sleep(0.02)
+        raise RuntimeError("upstream down")
+
+    async def burst():
+        return await asyncio.gather(*(flight.do("k", failing) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in asyncio.run(burst()))
+    assert flight.stats["errors"] == 1
+
+    async def ok():
+        return "back"
+
+    assert asyncio.run(flight.do("k", ok)) == "back"  # the next call starts fresh
+
+
+def test_async_waiter_cancel_does_not_cancel_the_leader():
+    flight = AsyncSingleFlight("test_async_cancel")
+
+    async def upstream():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def run():
+        leader = asyncio.ensure_future(flight.do("k", upstream))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(flight.do("k", upstream))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        return await leader
+
+    assert asyncio.run(run()) == "done"
+
+
+def test_threaded_identical_calls_share_one_upstream_call():
+    flight = SingleFlight("test_threads")
+    calls = []
+    barrier = threading.Barrier(8)
+    results = []
+
+    def upstream():
+        calls.append(1)
+        time.sleep(0.05)
+        return "Try Cibo."
+
+    def worker():
+        barrier.wait()
+        results.append(flight.do("k", upstream))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == ["Try Cibo."] * 8
+    assert len(calls) == 1
+
+
+def test_none_key_is_never_coalesced():
+    flight = SingleFlight("test_none")
+    assert [flight.do(None, lambda: i) for i in range(3)] == [0, 1, 2]
+    assert flight.stats["leaders"] == 0
+
+
+@pytest.mark.parametrize("mode, a, b, same", [
+    ("normalized", "Any ramen near BGC?", "ramen near bgc", True),
+    ("normalized", "ramen near BGC", "ramen in BGC", False),
+    ("exact", "  Ramen near BGC ", "ramen near bgc", True),
+    ("exact", "Any ramen near BGC?", "ramen near bgc", False),
+])
+def test_coalesce_key_modes(mode, a, b, same):
+    assert (coalesce_key(a, "v1", mode=mode) == coalesce_key(b, "v1", mode=mode)) is same
+
+
+def test_coalesce_key_scope_and_switch(monkeypatch):
+    assert coalesce_key("ramen", "v1") != coalesce_key("ramen", "v2")
+    assert coalesce_key("the?", "v1") is None  # nothing left after normalizing
+    monkeypatch.setattr(singleflight, "COALESCE_ENABLED", False)
+    assert coalesce_key("ramen", "v1") is None
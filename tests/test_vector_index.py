@@ -0,0 +1,62 @@
+import time
+from types import SimpleNamespace
+
+from vector_index import TfidfSvdEncoder, VectorIndex, hybrid_search
+
+RESTAURANTS = [
+    {"name": "Pasta Place", "category": "Italian", "description": "homemade pasta and tiramisu, cozy date night"},
+    {"name": "Sushi Bar", "category": "Japanese", "description": "fresh sushi rolls and sashimi"},
+    {"name": "Lounge 88", "category": "Bar", "description": "lowkey lounge vibes, cocktails and good music"},
+    {"name": "Taqueria", "category": "Mexican", "description": "street tacos and burritos, cheap eats"},
+]
+
+
+class _Catalog:
+    def __init__(self, restaurants, version="v1"):
+        self.snapshot = SimpleNamespace(version=version, restaurants=restaurants)
+
+    def current(self):
+        return self.snapshot
+
+    def refresh(self, force=False):
+        return False
+
+
+def _names(results):
+    return [r["name"] for r, _ in results]
+
+
+def test_vectors_match_vibe_words_and_reload_from_disk(tmp_path):
+    index = VectorIndex(directory=str(tmp_path), encoder=TfidfSvdEncoder(dim=4))
+    index.update(RESTAURANTS)
+    assert index.source == "built"
+    assert _names(index.search("lounge music", k=1)) == ["Lounge 88"]
+
+    reloaded = VectorIndex(directory=str(tmp_path), encoder=TfidfSvdEncoder(dim=4))
+    reloaded.update(RESTAURANTS)
+    assert reloaded.source == "loaded"
+    assert _names(reloaded.search("lounge music", k=1)) == ["Lounge 88"]
+
+
+def test_fit_returns_a_new_encoder():
+    template = TfidfSvdEncoder(dim=4)
+    fitted = template.fit([r["description"] for r in RESTAURANTS])
+    assert fitted is not template and template.components is None
+    assert fitted.encode(["sushi"]).shape == (1, 4)
+
+
+def test_catalog_change_rebuilds_in_background(tmp_path):
+    index = VectorIndex(_Catalog(RESTAURANTS[:1]), str(tmp_path), TfidfSvdEncoder(dim=4))
+    assert index.refresh()  # first build is inline
+    index.catalog.snapshot = SimpleNamespace(version="v2", restaurants=RESTAURANTS)
+    index.search("sushi")   # starts the rebuild, answers from the current state
+    for _ in range(200):
+        if len(index) == len(RESTAURANTS):
+            break
+        time.sleep(0.01)
+    assert _names(index.search("sushi", k=1)) == ["Sushi Bar"]
+
+
+def test_hybrid_search_keeps_keyword_hits():
+    assert _names(hybrid_search("authentic italian pasta", k=3))[0] == "Fresca Trattoria"
+    assert hybrid_search("thanks!", k=3) == []
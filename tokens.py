@@ -0,0 +1,27 @@
+from typing import Dict, List
+
+# tiktoken is optional: without it we fall back to a ~4 chars/token estimate
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return max(1, (len(text) + 3) // 4)
+
+
+def count_message_tokens(messages: List[Dict]) -> int:
+    """Approximate prompt tokens for a chat payload (~4 tokens overhead per message)."""
+    total = 0
+    for msg in messages:
+        content = msg.get("content", "")
+        if isinstance(content, list):  # vision content block: count the text parts only
+            content = " ".join(p.get("text", "") for p in content if p.get("type") == "text")
+        total += 4 + count_tokens(content)
+    return total + 2
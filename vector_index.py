@@ -0,0 +1,344 @@
+import os
+import json
+import math
+import shutil
+import hashlib
+import threading
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from search_index import get_restaurant_index, normalize_text, tokenize
+
+# -----------------------------------------
+# Vector index settings (override via .env)
+# -----------------------------------------
+VECTOR_INDEX = os.getenv("VECTOR_INDEX", "1") == "1"  # 0: curated picks use BM25 only
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "vector_index")
+# sentence-transformers model (e.g. all-MiniLM-L6-v2); empty = TF-IDF + SVD, no extra dependency
+EMBED_MODEL = os.getenv("EMBED_MODEL", "")
+VECTOR_DIM = int(os.getenv("VECTOR_DIM", "64"))          # SVD components (TF-IDF encoder)
+VECTOR_VOCAB = int(os.getenv("VECTOR_VOCAB", "4096"))    # TF-IDF features kept (highest df first)
+VECTOR_FIT_SAMPLE = int(os.getenv("VECTOR_FIT_SAMPLE", "2000"))  # documents the SVD is fitted on
+VECTOR_WEIGHT = float(os.getenv("VECTOR_WEIGHT", "0.5"))  # share of the cosine in hybrid scores
+VECTOR_MIN_SCORE = float(os.getenv("VECTOR_MIN_SCORE", "0.25"))  # cosine a vector-only pick needs
+
+
+def document_text(r: dict) -> str:
+    """What a restaurant is embedded as: name, cuisine, vibe description, dishes."""
+    menu = " ".join(item["name"] for item in r.get("menu") or ())
+    return " ".join(x for x in (r.get("name"), r.get("category"), r.get("description"), menu) if x)
+
+
+# =========================================
+# Encoders
+# =========================================
+class TfidfSvdEncoder:
+    """
+    Latent semantic vectors: TF-IDF over words, bigrams and 4-letter
+    word prefixes ("pricey" / "pricier", "date" / "dates"), reduced with
+    a truncated (randomized) SVD fitted on the catalog. Pure numpy, CPU only.
+
+    Large catalogs are fitted on an evenly spaced sample (fit_sample
+    documents), which bounds the dense fit matrix; every document is
+    still encoded. fit() and load() return a new encoder, so one that is
+    in use is never modified.
+    """
+
+    def __init__(self, dim: int = VECTOR_DIM, vocab_size: int = VECTOR_VOCAB, fit_sample: int = VECTOR_FIT_SAMPLE):
+        self.dim = dim
+        self.vocab_size = vocab_size
+        self.fit_sample = fit_sample
+        self.vocab: Dict[str, int] = {}
+        self.idf: Optional[np.ndarray] = None
+        self.components: Optional[np.ndarray] = None  # (features, dim)
+
+    @property
+    def signature(self) -> str:
+        return f"tfidf-svd-v2:{self.dim}:{self.vocab_size}:{self.fit_sample}"  # bump when _features changes
+
+    @staticmethod
+    def _features(text: str) -> Counter:
+        terms = tokenize(text)
+        feats = Counter(terms)
+        feats.update(f"~{word[:4]}" for word in terms if len(word) >= 4 and "_" not in word)
+        return feats
+
+    def _weights(self, feats: Counter) -> Tuple[np.ndarray, np.ndarray]:
+        """(columns, l2-normalized sublinear tf-idf weights) of the known features."""
+        cols, weights = [], []
+        for term, tf in feats.items():
+            col = self.vocab.get(term)
+            if col is not None:
+                cols.append(col)
+                weights.append((1 + math.log(tf)) * self.idf[col])
+        cols, weights = np.asarray(cols, dtype=np.int64), np.asarray(weights, dtype=np.float32)
+        norm = np.linalg.norm(weights)
+        return cols, (weights / norm if norm else weights)
+
+    def _blank(self) -> "TfidfSvdEncoder":
+        return TfidfSvdEncoder(self.dim, self.vocab_size, self.fit_sample)
+
+    def fit(self, texts: List[str]) -> "TfidfSvdEncoder":
+        texts = texts[::max(1, len(texts) // self.fit_sample)]
+        docs = [self._features(t) for t in texts]
+        df = Counter(term for feats in docs for term in feats)
+        kept = sorted(df, key=lambda t: (-df[t], t))[:self.vocab_size]
+        enc = self._blank()
+        enc.vocab = {t: i for i, t in enumerate(kept)}
+        n = len(texts)
+        enc.idf = np.array([math.log((1 + n) / (1 + df[t])) + 1 for t in enc.vocab], dtype=np.float32)
+
+        matrix = np.zeros((n, len(enc.vocab)), dtype=np.float32)
+        for row, feats in enumerate(docs):
+            cols, weights = enc._weights(feats)
+            matrix[row, cols] = weights
+        enc.components = np.ascontiguousarray(enc._top_components(matrix).T)
+        return enc
+
+    def _top_components(self, matrix: np.ndarray, oversample: int = 10, power_iters: int = 2) -> np.ndarray:
+        """Top right singular vectors by randomized SVD (only `dim` of them are needed)."""
+        k = min(self.dim, *matrix.shape)
+        omega = np.random.default_rng(0).standard_normal((matrix.shape[1], k + oversample)).astype(np.float32)
+        basis, _ = np.linalg.qr(matrix @ omega)
+        for _ in range(power_iters):
+            basis, _ = np.linalg.qr(matrix @ (matrix.T @ basis))
+        _, _, vt = np.linalg.svd(basis.T @ matrix, full_matrices=False)
+        return vt[:k]
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.components.shape[1]), dtype=np.float32)
+        for row, text in enumerate(texts):
+            cols, weights = self._weights(self._features(text))
+            if len(cols):
+                out[row] = weights @ self.components[cols]
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.where(norms == 0, 1, norms)
+
+    def save(self, directory: str):
+        np.save(os.path.join(directory, "idf.npy"), self.idf)
+        np.save(os.path.join(directory, "components.npy"), self.components)
+        with open(os.path.join(directory, "vocab.json"), "w", encoding="utf-8") as f:
+            json.dump(list(self.vocab), f)
+
+    def load(self, directory: str) -> "TfidfSvdEncoder":
+        enc = self._blank()
+        enc.idf = np.load(os.path.join(directory, "idf.npy"))
+        enc.components = np.load(os.path.join(directory, "components.npy"), mmap_mode="r")
+        with open(os.path.join(directory, "vocab.json"), encoding="utf-8") as f:
+            enc.vocab = {t: i for i, t in enumerate(json.load(f))}
+        return enc
+
+
+class SentenceEncoder:
+    """Small CPU sentence-transformers model; needs `pip install sentence-transformers`."""
+
+    def __init__(self, model_name: str = EMBED_MODEL):
+        from sentence_transformers import SentenceTransformer  # optional dependency
+
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    @property
+    def signature(self) -> str:
+        return f"st:{self.model_name}"
+
+    def fit(self, texts: List[str]) -> "SentenceEncoder":
+        return self  # pretrained
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.model.encode(texts, normalize_embeddings=True), dtype=np.float32)
+
+    def save(self, directory: str):
+        pass
+
+    def load(self, directory: str) -> "SentenceEncoder":
+        return self
+
+
+def create_encoder():
+    return SentenceEncoder() if EMBED_MODEL else TfidfSvdEncoder()
+
+
+# =========================================
+# Index
+# =========================================
+class VectorState(NamedTuple):
+    """What searches read: swapped as a whole after each rebuild, never mutated."""
+    docs: Tuple[dict, ...]
+    vectors: Optional[np.ndarray]  # (docs, dim), l2-normalized rows
+    encoder: object                # fitted encoder the vectors came from
+
+
+class VectorIndex:
+    """
+    Cosine top-k over restaurant embeddings.
+
+    Embeddings are computed once per catalog content + encoder and saved
+    under VECTOR_INDEX_DIR/<key>/; later starts memory-map them instead of
+    re-encoding. Follows the catalog version like RestaurantIndex (rebuilds
+    in a background thread), but re-fits as a whole (the SVD depends on
+    every document).
+    """
+
+    def __init__(self, catalog=None, directory: str = VECTOR_INDEX_DIR, encoder=None):
+        self.catalog = catalog  # None: fed only through update()
+        self.directory = directory
+        self.encoder = encoder or create_encoder()  # unfitted template; fitted copies live in _state
+        self.source = None  # "built" | "loaded"
+        self._state = VectorState((), None, self.encoder)
+        self._catalog_version = None
+        self._lock = threading.Lock()
+
+    def _key(self, texts: List[str]) -> str:
+        digest = hashlib.sha1(self.encoder.signature.encode("utf-8"))
+        for text in texts:
+            digest.update(b"\0" + text.encode("utf-8"))
+        return digest.hexdigest()[:16]
+
+    def _load(self, path: str, names: List[str]) -> Optional[Tuple[np.ndarray, object]]:
+        try:
+            with open(os.path.join(path, "names.json"), encoding="utf-8") as f:
+                if json.load(f) != names:
+                    return None
+            encoder = self.encoder.load(path)
+            vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        return vectors, encoder
+
+    def _save(self, path: str, names: List[str], vectors: np.ndarray, encoder):
+        tmp = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+        os.makedirs(tmp, exist_ok=True)
+        np.save(os.path.join(tmp, "vectors.npy"), np.asarray(vectors))
+        encoder.save(tmp)
+        with open(os.path.join(tmp, "names.json"), "w", encoding="utf-8") as f:
+            json.dump(names, f)
+        try:
+            os.replace(tmp, path)
+        except OSError:  # another worker saved the same key first
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        for entry in os.listdir(self.directory):  # older catalog versions
+            if entry != os.path.basename(path):
+                shutil.rmtree(os.path.join(self.directory, entry), ignore_errors=True)
+
+    def update(self, restaurants: List[dict]):
+        with self._lock:
+            self._apply(restaurants)
+
+    def _apply(self, restaurants: List[dict]):
+        texts = [document_text(r) for r in restaurants]
+        names = [r.get("name", "") for r in restaurants]
+        path = os.path.join(self.directory, self._key(texts))
+        loaded = self._load(path, names)
+        if loaded is not None:
+            vectors, encoder = loaded
+            self.source = "loaded"
+        else:
+            encoder = self.encoder.fit(texts)
+            vectors = encoder.encode(texts)
+            self.source = "built"
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                self._save(path, names, vectors, encoder)
+            except OSError as e:
+                print(f"[vector_index] not persisted: {e}")
+        self._state = VectorState(tuple(restaurants), vectors, encoder)
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Re-embeds if the catalog version changed: in a background thread
+        (searches keep the current state meanwhile) unless `force` is set
+        or nothing is indexed yet. Returns True on an inline update.
+        """
+        if self.catalog is None:
+            return False
+        if force:
+            self.catalog.refresh(force=True)
+        snapshot = self.catalog.current()
+        if snapshot.version == self._catalog_version:
+            return False
+        if force or self._catalog_version is None:
+            return self._reindex(snapshot)
+        if not self._lock.locked():
+            threading.Thread(target=self._reindex, args=(snapshot,), daemon=True).start()
+        return False
+
+    def _reindex(self, snapshot) -> bool:
+        with self._lock:  # one rebuild at a time
+            if snapshot.version == self._catalog_version:
+                return False
+            self._apply(list(snapshot.restaurants))
+            self._catalog_version = snapshot.version
+            return True
+
+    def search(self, query: str, k: int = 3) -> List[Tuple[dict, float]]:
+        """Top-k restaurants by cosine similarity as (restaurant, score)."""
+        self.refresh()
+        state = self._state  # read once: a concurrent rebuild swaps it whole
+        if not state.docs or not normalize_text(query).strip():
+            return []
+        q = state.encoder.encode([query])[0]
+        if not q.any():
+            return []
+        scores = state.vectors @ q
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(state.docs[i], float(scores[i])) for i in top]
+
+    @property
+    def docs(self) -> Tuple[dict, ...]:
+        return self._state.docs
+
+    @property
+    def vectors(self) -> Optional[np.ndarray]:
+        return self._state.vectors
+
+    def __len__(self):
+        return len(self._state.docs)
+
+
+# -----------------------------------------
+# Shared index over the shared catalog
+# -----------------------------------------
+_index: Optional[VectorIndex] = None
+
+
+def get_vector_index() -> VectorIndex:
+    global _index
+    if _index is None:
+        from catalog import get_catalog
+
+        _index = VectorIndex(get_catalog())
+        _index.refresh()
+    return _index
+
+
+def hybrid_search(query: str, k: int = 3) -> List[Tuple[dict, float]]:
+    """
+    BM25 and vector picks fused into one ranking: BM25 scores scaled to
+    [0, 1] by the best hit, blended with the cosine (VECTOR_WEIGHT).
+    Keyword hits are always kept; vibe-only matches ("cozy lounge",
+    "cheap eats") need VECTOR_MIN_SCORE.
+    """
+    keyword = get_restaurant_index().search(query, k=k * 2)
+    if not VECTOR_INDEX:
+        return keyword[:k]
+
+    semantic = get_vector_index().search(query, k=k * 2)
+    best = max((score for _, score in keyword), default=0.0) or 1.0
+    fused: Dict[str, list] = {}
+    for r, score in keyword:
+        fused[r["name"]] = [r, (1 - VECTOR_WEIGHT) * score / best]
+    for r, cosine in semantic:
+        entry = fused.get(r["name"])
+        if entry is not None:
+            entry[1] += VECTOR_WEIGHT * max(cosine, 0.0)
+        elif cosine >= VECTOR_MIN_SCORE:
+            fused[r["name"]] = [r, VECTOR_WEIGHT * cosine]
+
+    ranked = sorted(fused.values(), key=lambda e: -e[1])[:k]
+    return [(r, score) for r, score in ranked]